@@ -0,0 +1,110 @@
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.api.auth import verify_api_token
+from app.utils.logger import logger
+
+settings = get_settings()
+
+router = APIRouter(prefix="/admin")
+
+
+class TrackKeywordsRequest(BaseModel):
+    """順位の定期追跡への登録リクエスト"""
+    keywords: List[str] = Field(..., min_length=1, description="追跡するキーワードのリスト")
+    interval_hours: Optional[int] = Field(None, ge=1, description="再取得の間隔（時間、既定: TRACKING_DEFAULT_INTERVAL_HOURS）")
+
+
+async def _get_rank_tracker(request: Request):
+    """
+    アプリケーションに登録された順位追跡を取得する
+    （未作成の場合はSheetsのクライアントなどの作成に時間がかかり、作成中のロックも待つため、イベントループを止めないようにスレッドで取得する）
+    """
+    line_handler = getattr(request.app.state, "line_handler", None)
+    if line_handler is None:
+        raise HTTPException(status_code=500, detail="Handler not initialized")
+    try:
+        rank_tracker = await run_in_threadpool(lambda: line_handler.rank_tracker)
+    except Exception as e:
+        logger.error(f"Failed to initialize rank tracking: {str(e)}")
+        raise HTTPException(status_code=503, detail="Rank tracking is not available")
+    if rank_tracker is None:
+        raise HTTPException(status_code=404, detail="Rank tracking is disabled")
+    return rank_tracker
+
+
+@router.post("/sheets/compact")
+async def compact_sheets(
+    request: Request,
+    older_than_days: int = 30,
+    dry_run: bool = True,
+    authorization: str = Header("")
+):
+    """
+    古いキーワード別シートをアーカイブシートに統合して削除する（既定はdry_run）
+    """
+    verify_api_token(authorization)
+    # gspreadなどの読み込みを起動時に行わないように、使うときに読み込む
+    from app.services.sheets_compaction import compact_keyword_sheets
+
+    line_handler = getattr(request.app.state, "line_handler", None)
+    if line_handler is None:
+        raise HTTPException(status_code=500, detail="Handler not initialized")
+
+    try:
+        # Sheetsのクライアントを未作成の場合は作成に時間がかかるため、スレッドで取得する
+        return await run_in_threadpool(
+            lambda: compact_keyword_sheets(line_handler.sheets_service, older_than_days, dry_run)
+        )
+    except Exception as e:
+        logger.error(f"Sheet compaction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Sheet compaction failed")
+
+
+@router.get("/tracking")
+async def list_tracked_keywords(request: Request, authorization: str = Header("")):
+    """
+    追跡中のキーワードの一覧を返す
+    """
+    verify_api_token(authorization)
+    rank_tracker = await _get_rank_tracker(request)
+    return {"keywords": await run_in_threadpool(rank_tracker.tracked)}
+
+
+@router.post("/tracking")
+async def track_keywords(payload: TrackKeywordsRequest, request: Request, authorization: str = Header("")):
+    """
+    キーワードを順位の定期追跡に登録する
+    """
+    verify_api_token(authorization)
+    rank_tracker = await _get_rank_tracker(request)
+    keywords = [keyword.strip() for keyword in payload.keywords if keyword.strip()]
+    interval_hours = payload.interval_hours or settings.TRACKING_DEFAULT_INTERVAL_HOURS
+    added = await run_in_threadpool(rank_tracker.add, keywords, interval_hours * 3600)
+    return {"added": added, "updated": len(keywords) - added}
+
+
+@router.delete("/tracking")
+async def untrack_keywords(request: Request, keyword: List[str] = Query(...), authorization: str = Header("")):
+    """
+    キーワードを順位の定期追跡から外す
+    """
+    verify_api_token(authorization)
+    rank_tracker = await _get_rank_tracker(request)
+    return {"removed": await run_in_threadpool(rank_tracker.remove, keyword)}
+
+
+@router.post("/tracking/run")
+async def run_tracking(request: Request, authorization: str = Header("")):
+    """
+    期限の来たキーワードの再取得をすぐに実行する
+    """
+    verify_api_token(authorization)
+    rank_tracker = await _get_rank_tracker(request)
+    try:
+        return await run_in_threadpool(rank_tracker.run_due)
+    except Exception as e:
+        logger.error(f"Rank tracking run failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Rank tracking run failed")
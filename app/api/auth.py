@@ -0,0 +1,20 @@
+import secrets
+from fastapi import HTTPException
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def verify_api_token(authorization: str) -> None:
+    """
+    内部API用のトークンを検証する
+
+    Args:
+        authorization (str): Authorizationヘッダーの値（Bearer形式）
+    """
+    if not settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=503, detail="Internal API is not configured")
+
+    token = authorization[7:] if authorization.startswith("Bearer ") else ""
+    if not secrets.compare_digest(token, settings.INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid API token")
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from app.config import get_settings
+from app.api.auth import verify_api_token
+from app.utils.logger import logger
+
+settings = get_settings()
+
+router = APIRouter()
+
+
+class BatchAnalyzeRequest(BaseModel):
+    """一括分析APIのリクエスト"""
+    keywords: List[str] = Field(..., min_length=1, description="検索キーワードのリスト")
+    gl: Optional[str] = Field(None, description="検索対象の国（既定: jp）")
+    hl: Optional[str] = Field(None, description="検索結果の言語（既定: ja）")
+    num: Optional[int] = Field(None, ge=1, le=100, description="取得件数（既定: 20）")
+    device: Optional[str] = Field(None, description="desktop / mobile（既定: desktop）")
+    force_refresh: bool = Field(False, description="キャッシュを使わずに再取得する")
+    pages: int = Field(1, ge=1, description="取得するページ数（2以上で各ページを並行取得して1つの結果にまとめる）")
+    write_to_sheets: bool = Field(False, description="結果をスプレッドシートにも書き込む")
+
+
+@router.post("/analyze/batch")
+async def analyze_batch(
+    payload: BatchAnalyzeRequest,
+    request: Request,
+    authorization: str = Header("")
+):
+    """
+    複数キーワードを検索し、完了したものから順にNDJSON形式で返す
+    """
+    verify_api_token(authorization)
+
+    line_handler = getattr(request.app.state, "line_handler", None)
+    if line_handler is None:
+        raise HTTPException(status_code=500, detail="Handler not initialized")
+
+    keywords = [keyword.strip() for keyword in payload.keywords if keyword.strip()]
+    if len(keywords) > settings.BATCH_MAX_KEYWORDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many keywords: {len(keywords)} (max {settings.BATCH_MAX_KEYWORDS})"
+        )
+
+    logger.info(f"Started batch analysis of {len(keywords)} keywords")
+    return StreamingResponse(
+        _stream_results(line_handler, keywords, payload),
+        media_type="application/x-ndjson"
+    )
+
+
+async def _stream_results(line_handler, keywords: List[str], payload: BatchAnalyzeRequest) -> AsyncIterator[bytes]:
+    """
+    ワーカー数を制限してキーワードを処理し、完了した順に1行ずつ結果を返す
+
+    Args:
+        line_handler: 検索・書き込みサービスを持つLineHandler
+        keywords (List[str]): 検索キーワード
+        payload (BatchAnalyzeRequest): リクエスト内容
+    """
+    started = time.perf_counter()
+    pending: "asyncio.Queue[Optional[tuple]]" = asyncio.Queue()
+    for index, keyword in enumerate(keywords):
+        pending.put_nowait((index, keyword))
+
+    # 結果は完了したものからすぐに送り出し、メモリに溜め込まない
+    results: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=settings.BATCH_MAX_CONCURRENCY * 2)
+
+    async def worker() -> None:
+        while True:
+            try:
+                index, keyword = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            record = await _analyze_keyword(line_handler, index, keyword, payload)
+            await results.put(record)
+
+    workers = [
+        asyncio.create_task(worker())
+        for _ in range(min(settings.BATCH_MAX_CONCURRENCY, len(keywords)))
+    ]
+
+    succeeded = 0
+    try:
+        for _ in range(len(keywords)):
+            record = await results.get()
+            if record["status"] == "ok":
+                succeeded += 1
+            yield _to_ndjson(record)
+
+        yield _to_ndjson({
+            "status": "done",
+            "total": len(keywords),
+            "succeeded": succeeded,
+            "failed": len(keywords) - succeeded,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+        logger.info(f"Finished batch analysis: {succeeded}/{len(keywords)} succeeded")
+    finally:
+        # クライアントが切断した場合も残りの処理を止める
+        for task in workers:
+            task.cancel()
+
+
+async def _analyze_keyword(line_handler, index: int, keyword: str, payload: BatchAnalyzeRequest) -> Dict[str, Any]:
+    """
+    1件のキーワードを検索し、結果またはエラー情報のレコードを返す
+
+    Args:
+        line_handler: 検索・書き込みサービスを持つLineHandler
+        index (int): リクエスト内でのキーワードの位置
+        keyword (str): 検索キーワード
+        payload (BatchAnalyzeRequest): リクエスト内容
+
+    Returns:
+        Dict[str, Any]: NDJSONの1行に出力するレコード
+    """
+    started = time.perf_counter()
+    options = {"gl": payload.gl, "hl": payload.hl, "num": payload.num, "device": payload.device}
+    try:
+        zenserp_service = line_handler.zenserp_service
+        search_result = await zenserp_service.search_async(
+            keyword,
+            force_refresh=payload.force_refresh,
+            options=options,
+            pages=payload.pages
+        )
+        # APIの利用者向けに、強調スニペットなどの中身も含めて返す
+        data = zenserp_service.extract_search_data(search_result, keep_sections=True)
+
+        record = {"index": index, "keyword": keyword, "status": "ok", "data": data.to_dict()}
+        if payload.write_to_sheets:
+            write_future = await asyncio.to_thread(line_handler.write_results, keyword, data)
+            record["spreadsheet_url"] = await asyncio.wrap_future(write_future)
+    except Exception as e:
+        logger.error(f"Batch analysis failed for keyword {keyword}: {str(e)}")
+        record = {"index": index, "keyword": keyword, "status": "error", "error": str(e)}
+
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+def _to_ndjson(record: Dict[str, Any]) -> bytes:
+    """レコードをNDJSONの1行に変換する"""
+    return (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
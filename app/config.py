@@ -10,17 +10,158 @@ class Settings(BaseSettings):
     # LINE Messaging API設定
     LINE_CHANNEL_ACCESS_TOKEN: str
     LINE_CHANNEL_SECRET: str
+    LINE_API_ENDPOINT: str = "https://api.line.me"   # 返信・プッシュ送信先（ベンチマークではローカルの代替サーバーを指定）
+    WEBHOOK_DEDUP_ENABLED: bool = True           # 再送された同じWebhookイベントを読み飛ばす
+    WEBHOOK_DEDUP_TTL_SECONDS: float = 3600.0    # イベントIDを記録しておく秒数
+    WEBHOOK_DEDUP_MAX_ENTRIES: int = 10000       # 記録しておくイベントIDの最大件数
+    REPLY_DEADLINE_SECONDS: float = 3.0          # 結果をreplyで返すために返信トークンを保持する秒数（超えた場合は処理中メッセージを返信し、結果はプッシュで送信する。0で常にプッシュ）
 
     # Zenserp API設定
     ZENSERP_API_KEY: str
+    ZENSERP_BASE_URL: str = "https://app.zenserp.com/api/v2/search"   # 検索APIのURL（ベンチマークではローカルの代替サーバーを指定）
+
+    # Zenserp APIのレート制限・利用枠設定
+    ZENSERP_RATE_PER_SECOND: float = 1.0    # 1秒あたりのリクエスト数
+    ZENSERP_BURST: int = 2                  # 連続して送信できるリクエスト数
+    ZENSERP_RATE_LIMIT_DB_PATH: str = ""    # レート制限の状態の保存先（指定すると同じファイルを使う全プロセスで共有する。空文字でプロセスごと）
+    ZENSERP_MONTHLY_QUOTA: int = 0          # 月間のリクエスト上限（0で無制限）
+    ZENSERP_QUOTA_STATE_PATH: str = "data/zenserp_quota.json"
+    ZENSERP_MAX_RETRIES_ON_429: int = 2     # 429を受け取った場合の再試行回数
+    ZENSERP_429_BACKOFF_SECONDS: float = 2.0  # Retry-Afterがない場合の待機秒数（再試行ごとに倍増）
+
+    # Zenserp APIのHTTP接続設定
+    ZENSERP_POOL_SIZE: int = 10             # 保持する接続の最大数
+    ZENSERP_CONNECT_TIMEOUT: float = 5.0    # 接続タイムアウト（秒）
+    ZENSERP_READ_TIMEOUT: float = 30.0      # 読み込みタイムアウト（秒）
+    ZENSERP_DEEP_PAGES: int = 5             # 深掘りモードで取得するページ数（1ページあたりの件数はnum）
+    ZENSERP_DEEP_MAX_PAGES: int = 10        # 1回の検索で取得できる最大ページ数
+    ZENSERP_DEEP_CONCURRENCY: int = 5       # ページを並行取得する数（レート制限は全体で共有）
+    ZENSERP_KEEPALIVE_EXPIRY: float = 60.0  # アイドル接続を保持する秒数
+
+    # 外部サービス（Zenserp・Google Sheets）の障害対策
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5      # 連続してこの回数失敗（タイムアウト・接続エラー・5xx・遅延）したら呼び出しを遮断する
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 30.0     # 遮断してから回復の確認のために1件だけ呼び出すまでの秒数
+    UPSTREAM_RETRY_BASE_SECONDS: float = 0.5        # 再試行までの待機秒数（再試行ごとに倍増し、ばらつかせる。Retry-Afterがあればそれに従う）
+    UPSTREAM_RETRY_MAX_SECONDS: float = 10.0        # 再試行までの最大待機秒数（Retry-Afterがこれを超える場合はその場で再試行しない）
+    ZENSERP_MAX_RETRIES_ON_ERROR: int = 1           # タイムアウト・接続エラー・5xxの場合の再試行回数
+    ZENSERP_SLOW_CALL_SECONDS: float = 10.0         # この秒数を超えた応答は遮断の判定で失敗として数える（0で数えない）
+    ZENSERP_HEDGE_AFTER_SECONDS: float = 0.0        # この秒数以内に応答がなければ同じリクエストをもう1つ送り、先に返った結果を使う（0で無効。月間利用枠を余分に消費する）
+    SHEETS_MAX_RETRIES: int = 2                     # 429・503の場合の再試行回数（読み込みはタイムアウト・接続エラー・5xxでも再試行する）
+    SHEETS_SLOW_CALL_SECONDS: float = 10.0          # この秒数を超えた応答は遮断の判定で失敗として数える（0で数えない）
+    SHEETS_CONNECT_TIMEOUT: float = 5.0             # Google Sheets APIの接続タイムアウト（秒）
+    SHEETS_READ_TIMEOUT: float = 30.0               # Google Sheets APIの読み込みタイムアウト（秒）
 
     # Google Sheets設定
     GOOGLE_SHEETS_CREDENTIALS_FILE: str
     GOOGLE_SHEETS_SPREADSHEET_ID: str
+    SHEETS_CREDENTIAL_REFRESH_MARGIN_SECONDS: int = 300   # 有効期限の何秒前にトークンを更新するか
+    SHEETS_CREDENTIAL_CHECK_INTERVAL_SECONDS: int = 60    # 有効期限を確認する間隔（秒）
+
+    # スプレッドシートの保存方式
+    # per_keyword: キーワードごとにシートを作成する
+    # rolling: 日付ごとの結果シート（例: results_20240101）に追記する
+    SHEETS_STORAGE_MODE: str = "per_keyword"
+    SHEETS_ROLLING_SHEET_PREFIX: str = "results"         # ローリング結果シート名の接頭辞
+    SHEETS_ROLLING_PARTITION: str = "daily"              # daily / monthly
+    SHEETS_ARCHIVE_SHEET_PREFIX: str = "archive"         # 古いキーワード別シートの統合先シート名の接頭辞
+
+    # スプレッドシートの書き込み方式
+    # direct: ジョブごとにすぐ書き込む
+    # write_behind: 複数ジョブの行をバッファに溜め、ローリング結果シートにまとめて追記する
+    SHEETS_WRITE_MODE: str = "direct"
+    SHEETS_FLUSH_INTERVAL_SECONDS: float = 5.0           # バッファを書き込む間隔（秒）
+    SHEETS_FLUSH_MAX_ROWS: int = 500                     # この行数に達したら間隔を待たずに書き込む
+    SHEETS_BUFFER_MAX_ROWS: int = 5000                   # バッファに溜められる最大行数
+    SHEETS_BUFFER_PUT_TIMEOUT_SECONDS: float = 30.0      # バッファが満杯の場合に空きを待つ最大秒数
+    SHEETS_MAX_ORGANIC_ROWS: int = 100                   # 1キーワードあたりに書き込む通常検索結果の最大件数
 
     # アプリケーション設定
     APP_ENV: str = "development"
     LOG_LEVEL: str = "INFO"
+    # ログの形式（text: 従来のテキスト形式 / json: 1行1件のJSON。webhookEventId・ジョブID・キーワードを項目として含む）
+    LOG_FORMAT: str = "text"
+    LOG_ASYNC: bool = True                # 標準出力への書き込みをバックグラウンドのスレッドで行う
+    LOG_QUEUE_MAX_SIZE: int = 10000       # 出力待ちのログの最大件数（超えた分は破棄する）
+    LOG_INFO_SAMPLE_RATE: float = 1.0     # 件数の多いINFOログ（キャッシュヒット・検索の開始/成功など）を出力する割合
+    # 起動方式
+    # eager: 起動時に外部サービスのクライアントなどをすべて作成してからリクエストを受け付ける（失敗した場合は起動を中止する）
+    # background: すぐにリクエストを受け付け、バックグラウンドで並行して作成する（作成前に使う場合はその場で作成する）
+    STARTUP_MODE: str = "eager"
+
+    # ジョブ処理設定
+    JOB_WORKER_CONCURRENCY: int = 4   # 同時に処理するキーワードジョブ数
+    JOB_QUEUE_MAX_SIZE: int = 100     # 待機できるジョブの最大数
+    # ジョブキューの保存方式
+    # memory: プロセス内のキュー（再起動すると待機中・実行中のジョブは失われる）
+    # sqlite: ローカルのSQLiteに保存する（再起動後に再開し、同じファイルを使う複数のプロセスで処理を分担する）
+    JOB_QUEUE_BACKEND: str = "memory"
+    JOB_QUEUE_DB_PATH: str = "data/job_queue.sqlite3"
+    JOB_LEASE_SECONDS: float = 60.0                 # 実行中のジョブのリース期間（この間に延長されなければ他のワーカーが再実行する）
+    JOB_MAX_ATTEMPTS: int = 3                       # 一時的なエラー・停止による再試行を含めた最大実行回数
+    JOB_RETRY_BASE_SECONDS: float = 5.0             # 再試行までの待機秒数（再試行ごとに倍増）
+    JOB_RETRY_MAX_SECONDS: float = 300.0            # 再試行までの最大待機秒数
+    JOB_QUEUE_POLL_INTERVAL_SECONDS: float = 0.5    # 実行待ちのジョブを確認する間隔（他のプロセスが追加したジョブの検知）
+    JOB_QUEUE_RETENTION_SECONDS: float = 86400.0    # 完了・失敗したジョブ（重複排除の記録）を残す秒数
+
+    # ユーザー・グループごとの受け付け制御（上限を超えたメッセージはキューに入れずにすぐに返信する）
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_RATE_PER_MINUTE: float = 10.0             # 1分あたりに受け付けるキーワード数（0の場合は制限しない）
+    ADMISSION_BURST: int = 20                           # 連続して受け付けられるキーワード数（一括モードはキーワード数を消費し、この値を上限とする）
+    ADMISSION_MAX_IN_FLIGHT: int = 3                    # 受け付け済みで処理が終わっていないメッセージの最大数（0の場合は制限しない）
+    ADMISSION_MAX_TRACKED_KEYS: int = 10000             # 状態を保持するユーザー・グループの最大数
+    ADMISSION_IN_FLIGHT_TIMEOUT_SECONDS: float = 900.0  # 終了を記録できなかったメッセージを処理中とみなさなくなるまでの秒数
+
+    # 内部ツール向けAPI設定
+    INTERNAL_API_TOKEN: str = ""        # /analyze/batch のBearerトークン（空の場合はAPIを無効化）
+    BATCH_MAX_KEYWORDS: int = 1000      # 1リクエストで受け付ける最大キーワード数
+    BATCH_MAX_CONCURRENCY: int = 8      # 同時に実行する検索数
+
+    # 一括モード設定（改行・カンマ区切りで複数キーワードを送信した場合）
+    BULK_MAX_KEYWORDS: int = 200            # 1メッセージで受け付ける最大キーワード数
+    BULK_MAX_CONCURRENCY: int = 4           # 同時に実行する検索数
+    BULK_PROGRESS_STEP_PERCENT: int = 25    # 進捗を通知する間隔（%）
+    BULK_SHEET_LAYOUT: str = "single"       # single: 1シートにまとめる / per_keyword: キーワードごとにシートを作成
+
+    # 同一キーワードの同時リクエストをまとめる設定
+    COALESCE_ENABLED: bool = True
+    COALESCE_WINDOW_SECONDS: float = 30.0     # 完了後に結果を共有し続ける秒数
+    COALESCE_KEY_NORMALIZATION: str = "full"  # キーの正規化方式（full / whitespace / exact）
+
+    # 検索履歴ストア設定（取得した検索結果をローカルのSQLiteに蓄積する）
+    HISTORY_ENABLED: bool = True
+    HISTORY_DB_PATH: str = "data/serp_history.sqlite3"
+    HISTORY_STORE_RAW: bool = True              # Zenserp APIの生データも圧縮して保存する
+    HISTORY_BATCH_SIZE: int = 100               # 1回のトランザクションで書き込む最大件数
+    HISTORY_FLUSH_INTERVAL_SECONDS: float = 2.0 # 書き込みをまとめる間隔（秒）
+    HISTORY_QUEUE_MAX_SIZE: int = 1000          # 書き込み待ちの最大件数（超えた分は破棄）
+
+    # キーワード横断分析の設定（検索履歴ストアの結果を使う）
+    ANALYTICS_DEFAULT_DAYS: int = 30               # 分析対象とする期間（日）
+    ANALYTICS_REPLY_TOP_N: int = 10                # LINEで返信する上位件数
+    ANALYTICS_EXPORT_MAX_ROWS: int = 5000          # スプレッドシートに書き出す最大行数
+    ANALYTICS_OVERLAP_METHOD: str = "jaccard"      # jaccard / rank_weighted
+    ANALYTICS_OVERLAP_LEVEL: str = "url"           # 重なりを比べる単位（url / domain）
+    ANALYTICS_MAX_DOCUMENT_FREQUENCY: float = 0.5  # この割合を超えるキーワードに出現するURL・ドメインは重なりの計算から除く
+    ANALYTICS_CLUSTER_THRESHOLD: float = 0.3       # クラスタとしてつなぐ重なりスコアの下限
+
+    # 順位の定期追跡の設定
+    TRACKING_ENABLED: bool = True
+    TRACKING_DB_PATH: str = "data/rank_tracking.sqlite3"
+    TRACKING_SHEET_NAME: str = "rank_changes"           # 変化を追記するシート名
+    TRACKING_DEFAULT_INTERVAL_HOURS: int = 168          # 再取得の間隔（時間）
+    TRACKING_CHECK_INTERVAL_SECONDS: float = 60.0       # 期限の来たキーワードを確認する間隔（秒）
+    TRACKING_MAX_KEYWORDS_PER_RUN: int = 50             # 1回の確認で再取得する最大件数
+    TRACKING_MAX_CONCURRENCY: int = 2                   # 再取得の同時実行数
+    TRACKING_QUOTA_RESERVE: int = 100                   # 手動の検索のために残しておく月間利用枠
+    TRACKING_RETRY_DELAY_SECONDS: float = 3600.0        # 再取得に失敗した場合に再試行するまでの秒数
+    TRACKING_PAGES: int = 1                             # 再取得するページ数（2以上で深掘りモード）
+
+    # 検索結果キャッシュ設定
+    SERP_CACHE_ENABLED: bool = True
+    SERP_CACHE_TTL_SECONDS: int = 86400                  # キャッシュの有効期間（秒）
+    SERP_CACHE_MEMORY_MAX_ENTRIES: int = 256             # メモリに保持する最大件数
+    SERP_CACHE_DB_PATH: str = "data/serp_cache.sqlite3"  # 空文字でディスクキャッシュを無効化
+    SERP_CACHE_DB_MAX_BYTES: int = 50 * 1024 * 1024      # ディスクキャッシュの最大サイズ（バイト）
 
     class Config:
         env_file = ".env"
@@ -1,24 +1,182 @@
-from linebot import LineBotApi, WebhookHandler
+from linebot import WebhookHandler
 from linebot.exceptions import InvalidSignatureError, LineBotApiError
 from linebot.models import MessageEvent, TextMessage, TextSendMessage
 from app.config import get_settings
-from app.utils.logger import logger
-from app.services.zenserp_service import ZenserpService
-from app.services.sheets_service import SheetsService
+from app.utils.logger import SAMPLED, log_context, logger
+from app.utils.metrics import timed
+from app.utils.lazy import get_if_initialized, lazy_property
+from app.line.line_api import InstrumentedLineBotApi
+from app.line.reply_scheduler import PendingReply, ReplyScheduler
+from app.services.job_dispatcher import JobDispatcher
+from app.services.durable_job_queue import ENQUEUED, REJECTED, DurableJobDispatcher, Job, RetryableJobError
+from app.services.resilience import CircuitOpenError, is_transient_error
+from app.services.admission import REASON_RATE, get_admission_controller, requester_keys
+from app.services.rate_limiter import QuotaExceededError
+from app.services.single_flight import SingleFlight
+from app.services.event_deduplicator import EventDeduplicator
+from app.utils.keywords import normalize_keyword
+from app.line.message_parser import ParsedMessage, parse_message, split_keywords
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+import contextvars
+import time
+
+if TYPE_CHECKING:
+    from app.services.zenserp_service import ZenserpService
+    from app.services.sheets_service import SheetsService
+    from app.services.sheets_write_buffer import SheetsWriteBuffer
+    from app.services.history_store import HistoryStore
+    from app.services.serp_analytics import SerpAnalytics
+    from app.services.rank_tracker import RankTracker
+    from app.services.serp_records import SearchData
 
 settings = get_settings()
 
+# 永続化するジョブキューでのメッセージ処理ジョブの種類
+LINE_MESSAGE_JOB = "line_message"
+
 class LineHandler:
     """LINE Messaging APIのハンドラークラス"""
 
-    def __init__(self):
-        self.line_bot_api = LineBotApi(settings.LINE_CHANNEL_ACCESS_TOKEN)
+    def __init__(self, dispatcher: Optional[Union[JobDispatcher, DurableJobDispatcher]] = None):
+        self.line_bot_api = InstrumentedLineBotApi(
+            settings.LINE_CHANNEL_ACCESS_TOKEN,
+            endpoint=settings.LINE_API_ENDPOINT
+        )
         self.handler = WebhookHandler(settings.LINE_CHANNEL_SECRET)
-        self.zenserp_service = ZenserpService()
-        self.sheets_service = SheetsService()
+        # 署名検証の所要時間を記録する
+        signature_validator = self.handler.parser.signature_validator
+        signature_validator.validate = timed("signature_verification")(signature_validator.validate)
+        self.dispatcher = dispatcher
+        if isinstance(dispatcher, DurableJobDispatcher):
+            # キューに保存したイベントから処理を再開できるようにする
+            dispatcher.register(LINE_MESSAGE_JOB, self._run_message_job)
+        # 返信トークンを期限まで保持し、すぐに終わった結果はプッシュではなくreplyで返す
+        self.reply_scheduler = ReplyScheduler(self.line_bot_api, settings.REPLY_DEADLINE_SECONDS)
+        # LINEから再送された処理済みのイベントを読み飛ばす
+        self.event_deduplicator = EventDeduplicator(
+            ttl_seconds=settings.WEBHOOK_DEDUP_TTL_SECONDS,
+            max_entries=settings.WEBHOOK_DEDUP_MAX_ENTRIES
+        ) if settings.WEBHOOK_DEDUP_ENABLED else None
+        # 同じキーワードの同時リクエストを1回の検索・書き込みにまとめる
+        self.single_flight = SingleFlight(settings.COALESCE_WINDOW_SECONDS) if settings.COALESCE_ENABLED else None
+        # ユーザー・グループごとに頻度と同時処理数を制限し、上限を超えたメッセージはキューに入れない
+        self.admission = get_admission_controller()
+        # 外部サービスのクライアントなどの重いコンポーネントは初回の利用時（またはwarm_up）に作成する
         
         # イベントハンドラーを登録
-        self.handler.add(MessageEvent, message=TextMessage)(self.handle_message)
+        # SDKはselfを含めた引数の数で渡す値を決めるため、メソッドは引数1つの関数で包んで登録する
+        self.handler.add(MessageEvent, message=TextMessage)(lambda event: self.enqueue_message(event))
+
+    @lazy_property
+    def zenserp_service(self) -> "ZenserpService":
+        """Zenserp APIのクライアント"""
+        from app.services.zenserp_service import ZenserpService
+        service = ZenserpService()
+        if settings.HISTORY_ENABLED:
+            # APIから取得した検索結果をローカルの履歴ストアに蓄積する
+            service.fetch_listeners.append(
+                lambda keyword, params, data: self.history_store.record(keyword, params, data)
+            )
+        return service
+
+    @lazy_property
+    def sheets_service(self) -> "SheetsService":
+        """Google Sheets APIのクライアント"""
+        from app.services.sheets_service import SheetsService
+        return SheetsService()
+
+    @lazy_property
+    def history_store(self) -> Optional["HistoryStore"]:
+        """APIから取得した検索結果を蓄積するローカルの履歴ストア（書き込みは非同期）"""
+        if not settings.HISTORY_ENABLED:
+            return None
+        from app.services.history_store import HistoryStore
+        return HistoryStore(
+            db_path=settings.HISTORY_DB_PATH,
+            extractor=lambda data: self.zenserp_service.extract_search_data(data),
+            store_raw=settings.HISTORY_STORE_RAW,
+            batch_size=settings.HISTORY_BATCH_SIZE,
+            flush_interval_seconds=settings.HISTORY_FLUSH_INTERVAL_SECONDS,
+            queue_max_size=settings.HISTORY_QUEUE_MAX_SIZE
+        )
+
+    @lazy_property
+    def analytics(self) -> Optional["SerpAnalytics"]:
+        """検索履歴ストアの結果を使ったキーワード横断分析"""
+        if self.history_store is None:
+            return None
+        from app.services.serp_analytics import SerpAnalytics
+        return SerpAnalytics(self.history_store)
+
+    @lazy_property
+    def write_buffer(self) -> Optional["SheetsWriteBuffer"]:
+        """ライトビハインドの場合に複数ジョブの行をまとめて書き込むバッファ"""
+        if settings.SHEETS_WRITE_MODE != "write_behind":
+            return None
+        from app.services.sheets_write_buffer import SheetsWriteBuffer
+        return SheetsWriteBuffer(
+            self.sheets_service,
+            flush_interval_seconds=settings.SHEETS_FLUSH_INTERVAL_SECONDS,
+            flush_max_rows=settings.SHEETS_FLUSH_MAX_ROWS,
+            max_buffered_rows=settings.SHEETS_BUFFER_MAX_ROWS,
+            put_timeout_seconds=settings.SHEETS_BUFFER_PUT_TIMEOUT_SECONDS
+        )
+
+    @lazy_property
+    def rank_tracker(self) -> Optional["RankTracker"]:
+        """登録したキーワードを定期的に再取得し、順位の変化だけを記録する（作成と同時に開始する）"""
+        if not settings.TRACKING_ENABLED:
+            return None
+        from app.services.rank_tracker import RankTracker
+        tracker = RankTracker(
+            db_path=settings.TRACKING_DB_PATH,
+            # 定期の再取得はキャッシュを使わない（キャッシュの結果を新しい順位として記録しないようにする）
+            search=lambda keyword: self._search_keyword(keyword, force_refresh=True, pages=settings.TRACKING_PAGES),
+            sheets_service=self.sheets_service,
+            sheet_name=settings.TRACKING_SHEET_NAME,
+            notify=self._push_text,
+            check_interval_seconds=settings.TRACKING_CHECK_INTERVAL_SECONDS,
+            max_keywords_per_run=settings.TRACKING_MAX_KEYWORDS_PER_RUN,
+            max_concurrency=settings.TRACKING_MAX_CONCURRENCY,
+            quota_reserve=settings.TRACKING_QUOTA_RESERVE,
+            retry_delay_seconds=settings.TRACKING_RETRY_DELAY_SECONDS,
+            pages_per_keyword=settings.TRACKING_PAGES
+        )
+        tracker.start()
+        return tracker
+
+    def warm_up(self) -> Dict[str, Dict[str, Any]]:
+        """
+        重いコンポーネントを並行して作成し、Google Sheetsの認証とシート情報の取得を済ませておく
+        （失敗したコンポーネントは初回の利用時に再度作成を試みる）
+
+        Returns:
+            Dict[str, Dict[str, Any]]: コンポーネント名 -> 所要時間（秒）と成否
+        """
+        steps = {
+            "zenserp_service": lambda: self.zenserp_service,
+            "sheets_service": lambda: self.sheets_service.warm_up(),
+            "history_store": lambda: self.history_store,
+            "analytics": lambda: self.analytics,
+            "write_buffer": lambda: self.write_buffer,
+            "rank_tracker": lambda: self.rank_tracker,
+        }
+
+        def run(name: str) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                steps[name]()
+                error = None
+            except Exception as e:
+                logger.error(f"Failed to warm up {name}: {str(e)}")
+                error = str(e)
+            return {"seconds": round(time.perf_counter() - started, 3), "error": error}
+
+        with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="warm-up") as executor:
+            report = dict(zip(steps, executor.map(run, steps)))
+        logger.info(f"Warm-up finished: {report}")
+        return report
 
     def handle_webhook(self, body: str, signature: str) -> None:
         """
@@ -34,61 +192,566 @@ class LineHandler:
             logger.error("Invalid signature")
             raise
 
-    def handle_message(self, event) -> None:
+    def enqueue_message(self, event) -> None:
+        """
+        メッセージイベントをジョブとしてキューに追加する
+        （ディスパッチャーが未設定の場合はその場で処理する）
+
+        Args:
+            event: LINE Messaging APIのイベントオブジェクト
+        """
+        # 処理済みのイベントの再送は検索などの処理を始める前に読み飛ばす
+        event_id = getattr(event, "webhook_event_id", None)
+        if self.event_deduplicator is not None and event_id:
+            delivery_context = getattr(event, "delivery_context", None)
+            is_redelivery = bool(getattr(delivery_context, "is_redelivery", False))
+            if not self.event_deduplicator.check_and_record(event_id, is_redelivery):
+                return
+
+        keys = requester_keys(event.source)
+        # グループ・トークルームはその単位、個別のトークはユーザー単位で順番を回す
+        fair_key = keys[0] if keys else ""
+        ticket: Optional[str] = None
+        if self.admission is not None:
+            # 上限を超えたメッセージはワーカーで処理する前にすぐに返信して打ち切る
+            decision = self.admission.admit(keys, cost=self._admission_cost(event.message.text), ticket=event_id or None)
+            if not decision.admitted:
+                if self.event_deduplicator is not None and event_id:
+                    self.event_deduplicator.forget(event_id)
+                if decision.reason == REASON_RATE:
+                    text = f"⚠️ 短時間のリクエストが多すぎます。{max(1, round(decision.retry_after))}秒ほど待ってから再度お試しください。"
+                else:
+                    text = "⚠️ 処理中のリクエストが多すぎます。前のリクエストの結果が届いてから再度お試しください。"
+                self._reply_rejection(event, text)
+                return
+            ticket = decision.ticket
+
+        if self.dispatcher is None:
+            self._handle_admitted_message(event, ticket)
+            return
+
+        if isinstance(self.dispatcher, DurableJobDispatcher):
+            # イベントIDで重複排除するため、他のプロセスが受け付けた再送も読み飛ばす（duplicateも受け付け済みとみなす）
+            result = self.dispatcher.enqueue(
+                LINE_MESSAGE_JOB,
+                event.as_json_dict(),
+                dedupe_key=event_id or None,
+                name=event.message.text[:50],
+                fair_key=fair_key
+            )
+            accepted = result != REJECTED
+            if result != ENQUEUED or not event_id:
+                # このプロセスで処理しない（またはイベントIDで終了を記録できない）ジョブは処理中に数えない
+                self._release_admission(ticket)
+        else:
+            accepted = self.dispatcher.submit(
+                self._handle_admitted_message, event, ticket, name=event.message.text[:50], key=fair_key
+            )
+            if not accepted:
+                self._release_admission(ticket)
+        if accepted:
+            return
+
+        # 受け付けなかったイベントは再送されたときに処理できるように記録を取り消す
+        if self.event_deduplicator is not None and event_id:
+            self.event_deduplicator.forget(event_id)
+
+        # キューが満杯の場合はすぐに返信して処理を打ち切る
+        self._reply_rejection(event, "⚠️ ただいま混み合っています。しばらく時間をおいてから再度お試しください。")
+
+    def _admission_cost(self, text: str) -> int:
+        """
+        受け付け制御で消費するトークン数を返す（一括モードはキーワード数、それ以外は1）
+
+        Args:
+            text (str): メッセージ本文
+
+        Returns:
+            int: 消費するトークン数
+        """
+        parsed = parse_message(text)
+        if parsed.command is None and parsed.is_bulk:
+            return min(len(parsed.keywords), settings.BULK_MAX_KEYWORDS)
+        return 1
+
+    def _reply_rejection(self, event, text: str) -> None:
+        """
+        受け付けなかったメッセージにすぐに返信する
+
+        Args:
+            event: LINE Messaging APIのイベントオブジェクト
+            text (str): 返信するメッセージ
+        """
+        try:
+            self.line_bot_api.reply_message(event.reply_token, TextSendMessage(text=text))
+        except LineBotApiError as e:
+            logger.error(f"Failed to send busy message: {str(e)}")
+
+    def _release_admission(self, ticket: Optional[str]) -> None:
+        """受け付け制御に処理が終わったことを記録する"""
+        if self.admission is not None:
+            self.admission.release(ticket)
+
+    def _handle_admitted_message(self, event, ticket: Optional[str]) -> None:
+        """
+        受け付けたメッセージイベントを処理し、終わったら受け付け制御の処理中から外す
+
+        Args:
+            event: LINE Messaging APIのイベントオブジェクト
+            ticket (Optional[str]): 受け付け制御の処理の識別子
+        """
+        try:
+            with log_context(event_id=getattr(event, "webhook_event_id", None)):
+                self.handle_message(event)
+        finally:
+            self._release_admission(ticket)
+
+    def _run_message_job(self, payload: Dict[str, Any], job: Job) -> None:
+        """
+        永続化するジョブキューから取り出したメッセージイベントを処理する
+
+        Args:
+            payload (Dict[str, Any]): Webhookのイベント（JSON）
+            job (Job): 実行回数などのジョブの情報
+        """
+        event = MessageEvent.new_from_json_dict(payload)
+        if job.attempts > 1:
+            logger.info(f"Resuming message job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+        try:
+            with log_context(event_id=getattr(event, "webhook_event_id", None), job_id=job.id):
+                self.handle_message(event, attempt=job.attempts, final_attempt=job.is_final_attempt)
+        finally:
+            # 受け付けたプロセスではイベントIDで処理中として記録している（他のプロセスでは何もしない）
+            self._release_admission(getattr(event, "webhook_event_id", None))
+
+    @timed("handle_message")
+    def handle_message(self, event, attempt: int = 1, final_attempt: bool = True) -> None:
         """
         メッセージイベントを処理する
 
         Args:
             event: LINE Messaging APIのイベントオブジェクト
+            attempt (int): 実行回数（2回目以降は返信トークンが使用済み・期限切れのため結果をプッシュで送信する）
+            final_attempt (bool): Falseの場合、一時的なエラーはRetryableJobErrorを送出してジョブを再試行する
         """
+        pending: Optional[PendingReply] = None
         try:
-            # キーワードを取得
-            keyword = event.message.text.strip()
-            logger.info(f"Received keyword: {keyword}")
+            # キーワードとオプションを取得
+            parsed = parse_message(event.message.text)
+            keyword = parsed.keyword
+            logger.info(f"Received keyword: {keyword} (force_refresh={parsed.force_refresh}, deep={parsed.deep})")
+            pages = settings.ZENSERP_DEEP_PAGES if parsed.deep else 1
+
+            if parsed.command is not None:
+                self.handle_command(event, parsed)
+                return
+
+            if parsed.is_bulk:
+                self.handle_bulk_message(event, parsed)
+                return
 
             if not keyword:
-                self.line_bot_api.reply_message(
+                self._reply_text(event, "キーワードを入力してください。")
+                return
+
+            # 返信トークンを保持し、期限内に終わらなければ処理開始メッセージを返信する
+            if attempt == 1:
+                pending = self.reply_scheduler.hold(
                     event.reply_token,
-                    TextSendMessage(text="キーワードを入力してください。")
+                    event.source.user_id,
+                    interim_text=f"「{keyword}」の検索結果を取得中です。しばらくお待ちください...",
+                    received_at=event.timestamp / 1000 if event.timestamp else None
                 )
-                return
 
-            # 処理開始メッセージ
-            self.line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text=f"「{keyword}」の検索結果を取得中です。しばらくお待ちください...")
-            )
+            # 検索とスプレッドシートへの書き込みを実行（同じキーワードの同時リクエストは結果を共有）
+            if self.single_flight is not None:
+                coalesce_key = normalize_keyword(keyword, settings.COALESCE_KEY_NORMALIZATION)
+                if pages > 1:
+                    coalesce_key += f"#pages={pages}"
+                if parsed.force_refresh:
+                    # 再取得の指定は、共有期間内に完了した通常のリクエストの結果を使わずにAPIから取得させる
+                    coalesce_key += "#refresh"
+                write_future, shared = self.single_flight.do(
+                    coalesce_key,
+                    lambda: self._process_keyword(keyword, parsed.force_refresh, pages)
+                )
+                if shared:
+                    logger.info("Shared result of concurrent request for keyword: %s", keyword, extra=SAMPLED)
+            else:
+                write_future = self._process_keyword(keyword, parsed.force_refresh, pages)
 
-            # 検索を実行
-            search_result = self.zenserp_service.search(keyword)
-            search_data = self.zenserp_service.extract_search_data(search_result)
-
-            # スプレッドシートに書き込み
-            spreadsheet_url = self.sheets_service.write_search_results(keyword, search_data)
-
-            # 結果をLINEにプッシュメッセージで送信
-            reply_message = f"✅ 検索結果を記録しました！\n\n🔍 キーワード: {keyword}\n📊 スプレッドシート: {spreadsheet_url}"
-            
-            # プッシュメッセージとして送信
-            user_id = event.source.user_id
-            self.line_bot_api.push_message(
-                user_id,
-                TextSendMessage(text=reply_message)
+            if settings.JOB_QUEUE_BACKEND == "sqlite" and not write_future.done():
+                # 永続化するジョブキューでは、ライトビハインドの書き込みが確定するまでジョブを完了にしない
+                # （書き込みに失敗した場合はジョブを再試行し、停止した場合はバッファの行を次の起動で書き込み直す）
+                error = write_future.exception()
+                if error is not None and not final_attempt and is_transient_error(error):
+                    raise error
+
+            # 書き込みが確定した時点で結果をLINEに送信する
+            write_future.add_done_callback(
+                lambda future: self._notify_result(pending, event.source.user_id, keyword, future)
             )
-            
-            logger.info(f"Successfully processed keyword: {keyword}")
 
         except LineBotApiError as e:
             logger.error(f"LINE Bot API Error: {str(e)}")
+        except QuotaExceededError as e:
+            # 利用枠の超過はユーザーにそのまま理由を伝える
+            try:
+                self._deliver(pending, event.source.user_id, f"⚠️ {str(e)}")
+            except Exception as push_error:
+                logger.error(f"Failed to send quota message: {str(push_error)}")
         except Exception as e:
+            if not final_attempt and is_transient_error(e):
+                # 一時的なエラーはジョブを再試行する（保持している返信トークンで処理中メッセージを返信し、結果は再試行後にプッシュで送信する）
+                if pending is not None:
+                    self.reply_scheduler.expire(pending)
+                raise RetryableJobError(str(e)) from e
             logger.error(f"Error handling message: {str(e)}")
             # エラーメッセージを返信
-            try:
+            self._send_error_message(event.source.user_id, pending, e)
+
+    def _reply_text(self, event, text: str) -> None:
+        """
+        テキストメッセージを返信する（再開したジョブなどで返信トークンが使えない場合はプッシュで送信する）
+
+        Args:
+            event: LINE Messaging APIのイベントオブジェクト
+            text (str): 送信するメッセージ
+        """
+        try:
+            self.line_bot_api.reply_message(event.reply_token, TextSendMessage(text=text))
+        except LineBotApiError as e:
+            logger.warning(f"Failed to reply, falling back to push: {str(e)}")
+            self.line_bot_api.push_message(event.source.user_id, TextSendMessage(text=text))
+
+    def _deliver(self, pending: Optional[PendingReply], user_id: str, text: str) -> str:
+        """
+        結果を送信する（返信トークンを保持している場合はreply、それ以外はプッシュ）
+
+        Args:
+            pending (Optional[PendingReply]): 保持している返信トークン（保持する前のエラーの場合はNone）
+            user_id (str): プッシュ送信の送信先
+            text (str): 送信するメッセージ
+
+        Returns:
+            str: 送信方法（reply / push）
+        """
+        if pending is not None:
+            return self.reply_scheduler.resolve(pending, text)
+        self.line_bot_api.push_message(user_id, TextSendMessage(text=text))
+        return "push"
+
+    def _notify_result(self, pending: Optional[PendingReply], user_id: str, keyword: str, write_future: Future) -> None:
+        """
+        スプレッドシートへの書き込み結果を送信する（期限内に終わった場合はreply、それ以外はプッシュ）
+
+        Args:
+            pending (Optional[PendingReply]): 保持している返信トークン（再開したジョブの場合はNone）
+            user_id (str): プッシュ送信の送信先
+            keyword (str): 検索キーワード
+            write_future (Future): スプレッドシートのURLが設定されるFuture
+        """
+        error = write_future.exception()
+        if error is not None:
+            logger.error(f"Error writing results for keyword {keyword}: {str(error)}")
+            self._send_error_message(user_id, pending, error)
+            return
+
+        # 結果をLINEに送信
+        spreadsheet_url = write_future.result()
+        reply_message = f"✅ 検索結果を記録しました！\n\n🔍 キーワード: {keyword}\n📊 スプレッドシート: {spreadsheet_url}"
+        try:
+            outcome = self._deliver(pending, user_id, reply_message)
+            logger.info(f"Successfully processed keyword: {keyword} (delivered by {outcome})")
+        except LineBotApiError as e:
+            logger.error(f"LINE Bot API Error: {str(e)}")
+
+    def _send_error_message(
+        self,
+        user_id: str,
+        pending: Optional[PendingReply] = None,
+        error: Optional[BaseException] = None
+    ) -> None:
+        """
+        処理中にエラーが発生したことを送信する（返信トークンを保持している場合はreply、それ以外はプッシュ）
+
+        Args:
+            user_id (str): プッシュ送信の送信先
+            pending (Optional[PendingReply]): 保持している返信トークン
+            error (Optional[BaseException]): 発生した例外（外部サービスが遮断中の場合は、いつ再試行すればよいかを伝える）
+        """
+        try:
+            if isinstance(error, CircuitOpenError):
+                error_message = f"⚠️ {str(error)}"
+            else:
                 error_message = "❌ 申し訳ありません。処理中にエラーが発生しました。\n\n以下をご確認ください：\n・キーワードが正しく入力されているか\n・しばらく時間をおいてから再度お試しください"
-                user_id = event.source.user_id
-                self.line_bot_api.push_message(
-                    user_id,
-                    TextSendMessage(text=error_message)
+            self._deliver(pending, user_id, error_message)
+        except Exception as push_error:
+            logger.error(f"Failed to send error message: {str(push_error)}")
+
+    def handle_bulk_message(self, event, parsed: ParsedMessage) -> None:
+        """
+        複数キーワードを含むメッセージを処理する（検索を並行実行し、結果を1つのスプレッドシートにまとめる）
+
+        Args:
+            event: LINE Messaging APIのイベントオブジェクト
+            parsed (ParsedMessage): 解析済みのメッセージ
+        """
+        keywords = parsed.keywords
+        user_id = event.source.user_id
+        pages = settings.ZENSERP_DEEP_PAGES if parsed.deep else 1
+
+        if len(keywords) > settings.BULK_MAX_KEYWORDS:
+            self._reply_text(event, f"⚠️ 一度に送信できるキーワードは{settings.BULK_MAX_KEYWORDS}件までです（{len(keywords)}件）。")
+            return
+
+        self._reply_text(event, f"{len(keywords)}件のキーワードの検索結果を取得中です。しばらくお待ちください...")
+        logger.info(f"Started bulk processing of {len(keywords)} keywords")
+
+        results: List[Tuple[str, "SearchData"]] = []
+        errors: List[Tuple[str, str]] = []
+        step = max(1, len(keywords) * settings.BULK_PROGRESS_STEP_PERCENT // 100)
+        next_report = step
+
+        # Zenserpへの同時リクエストは共有のレート制限で抑えられるため、ここでは並行数のみ制限する
+        with ThreadPoolExecutor(max_workers=settings.BULK_MAX_CONCURRENCY, thread_name_prefix="bulk-search") as executor:
+            futures = {
+                # ログの識別子（webhookEventIdなど）を引き継ぐ
+                executor.submit(contextvars.copy_context().run, self._search_keyword, keyword, parsed.force_refresh, pages): keyword
+                for keyword in keywords
+            }
+            for future in as_completed(futures):
+                keyword = futures[future]
+                try:
+                    results.append((keyword, future.result()))
+                except Exception as e:
+                    logger.error(f"Bulk search failed for keyword {keyword}: {str(e)}")
+                    errors.append((keyword, str(e)))
+
+                # 一定件数ごとに進捗を通知する（最後の1件は完了通知で代える）
+                done = len(results) + len(errors)
+                if done >= next_report and done < len(keywords):
+                    next_report += step
+                    self._push_text(user_id, f"⏳ 進捗: {done}/{len(keywords)}件 完了")
+
+        # 送信された順に並べ直してから書き込む
+        order = {keyword: i for i, keyword in enumerate(keywords)}
+        results.sort(key=lambda item: order[item[0]])
+        errors.sort(key=lambda item: order[item[0]])
+
+        # 行データを作成できなかったキーワードも失敗として数える
+        spreadsheet_url, errors = self.sheets_service.write_bulk_results(
+            results,
+            errors,
+            per_keyword_tabs=settings.BULK_SHEET_LAYOUT == "per_keyword"
+        )
+        succeeded = len(keywords) - len(errors)
+
+        summary = f"✅ {len(keywords)}件の検索結果を記録しました！\n\n成功: {succeeded}件"
+        if errors:
+            summary += f" / 失敗: {len(errors)}件"
+        summary += f"\n📊 スプレッドシート: {spreadsheet_url}"
+        self._push_text(user_id, summary)
+        logger.info(f"Successfully processed bulk message: {succeeded} succeeded, {len(errors)} failed")
+
+    def handle_command(self, event, parsed: ParsedMessage) -> None:
+        """
+        コマンドを処理する
+
+        Args:
+            event: LINE Messaging APIのイベントオブジェクト
+            parsed (ParsedMessage): 解析済みのメッセージ
+        """
+        if parsed.command in ("track", "untrack", "tracked"):
+            self.handle_tracking_command(event, parsed)
+        else:
+            self.handle_analytics_command(event, parsed)
+
+    def handle_tracking_command(self, event, parsed: ParsedMessage) -> None:
+        """
+        順位の定期追跡のコマンド（登録・解除・一覧）を処理する
+
+        Args:
+            event: LINE Messaging APIのイベントオブジェクト
+            parsed (ParsedMessage): 解析済みのメッセージ
+        """
+        if self.rank_tracker is None:
+            text = "⚠️ 順位の定期追跡が無効になっています。"
+        elif parsed.command == "tracked":
+            tracked = self.rank_tracker.tracked()
+            if tracked:
+                lines = [f"・{item['keyword']}（{item['interval_seconds'] // 3600}時間ごと）" for item in tracked[:settings.ANALYTICS_REPLY_TOP_N]]
+                if len(tracked) > settings.ANALYTICS_REPLY_TOP_N:
+                    lines.append(f"…ほか{len(tracked) - settings.ANALYTICS_REPLY_TOP_N}件")
+                text = f"📋 追跡中のキーワード（{len(tracked)}件）\n\n" + "\n".join(lines)
+            else:
+                text = "追跡中のキーワードはありません。"
+        else:
+            keywords = split_keywords(parsed.command_args)
+            if not keywords:
+                text = "キーワードを入力してください。"
+            elif parsed.command == "track":
+                self.rank_tracker.add(
+                    keywords,
+                    settings.TRACKING_DEFAULT_INTERVAL_HOURS * 3600,
+                    user_id=event.source.user_id
                 )
-            except Exception as push_error:
-                logger.error(f"Failed to send error message: {str(push_error)}")
+                text = (
+                    f"✅ {len(keywords)}件のキーワードを追跡に登録しました。\n"
+                    f"{settings.TRACKING_DEFAULT_INTERVAL_HOURS}時間ごとに再取得し、順位の変化があればお知らせします。"
+                )
+            else:
+                removed = self.rank_tracker.remove(keywords)
+                text = f"✅ {removed}件のキーワードの追跡を解除しました。"
+
+        self._reply_text(event, text)
+
+    def handle_analytics_command(self, event, parsed: ParsedMessage) -> None:
+        """
+        分析コマンドを処理する（上位の結果をLINEに送信し、全体をスプレッドシートに書き出す）
+
+        Args:
+            event: LINE Messaging APIのイベントオブジェクト
+            parsed (ParsedMessage): 解析済みのメッセージ
+        """
+        if self.analytics is None:
+            self._reply_text(event, "⚠️ 検索履歴の保存が無効になっているため、分析できません。")
+            return
+
+        self._reply_text(event, "蓄積した検索結果を分析中です。しばらくお待ちください...")
+
+        user_id = event.source.user_id
+        try:
+            title, name, rows = self._build_analytics_table(parsed.command, parsed.command_args)
+            if len(rows) <= 1:
+                self._push_text(user_id, f"📈 {title}\n\n分析できる検索結果がありません。先にキーワードを検索してください。")
+                return
+
+            spreadsheet_url = self.sheets_service.write_table(name, rows)
+            lines = [" / ".join(row) for row in rows[1:settings.ANALYTICS_REPLY_TOP_N + 1]]
+            summary = f"📈 {title}\n\n" + "\n".join(lines)
+            if len(rows) - 1 > settings.ANALYTICS_REPLY_TOP_N:
+                summary += f"\n…ほか{len(rows) - 1 - settings.ANALYTICS_REPLY_TOP_N}件"
+            summary += f"\n\n📊 スプレッドシート: {spreadsheet_url}"
+            self._push_text(user_id, summary)
+            logger.info(f"Successfully processed analytics command: {parsed.command}")
+        except Exception as e:
+            logger.error(f"Error handling analytics command {parsed.command}: {str(e)}")
+            self._send_error_message(user_id)
+
+    def _build_analytics_table(self, command: str, args: str) -> Tuple[str, str, List[List[str]]]:
+        """
+        分析コマンドの結果の表を作成する
+
+        Args:
+            command (str): share / overlap / cluster
+            args (str): コマンドの引数
+
+        Returns:
+            Tuple[str, str, List[List[str]]]: 見出し、シート名の接頭辞、ヘッダー行を含む行データ
+        """
+        days = settings.ANALYTICS_DEFAULT_DAYS
+        max_rows = settings.ANALYTICS_EXPORT_MAX_ROWS
+
+        if command == "share":
+            # 引数は対象期間（日）
+            if args.isdigit():
+                days = int(args)
+            rows = self.analytics.share_table(days, max_rows)
+            return f"ドメインのシェア（直近{days}日）", "share", rows
+
+        if command == "overlap":
+            # 引数は対象のキーワード（改行・カンマ区切り、省略時はすべて）
+            keywords = split_keywords(args) or None
+            rows = self.analytics.overlap_table(
+                days,
+                max_rows,
+                method=settings.ANALYTICS_OVERLAP_METHOD,
+                by=settings.ANALYTICS_OVERLAP_LEVEL,
+                max_document_frequency=settings.ANALYTICS_MAX_DOCUMENT_FREQUENCY,
+                keywords=keywords
+            )
+            return f"検索結果の重なりが大きいキーワード（直近{days}日）", "overlap", rows
+
+        # 引数はクラスタとしてつなぐスコアの下限
+        try:
+            threshold = float(args) if args else settings.ANALYTICS_CLUSTER_THRESHOLD
+        except ValueError:
+            threshold = settings.ANALYTICS_CLUSTER_THRESHOLD
+        rows = self.analytics.cluster_table(
+            days,
+            threshold=threshold,
+            method=settings.ANALYTICS_OVERLAP_METHOD,
+            by=settings.ANALYTICS_OVERLAP_LEVEL,
+            max_document_frequency=settings.ANALYTICS_MAX_DOCUMENT_FREQUENCY,
+            max_rows=max_rows
+        )
+        return f"キーワードのクラスタ（スコア{threshold}以上）", "cluster", rows
+
+    def _search_keyword(self, keyword: str, force_refresh: bool = False, pages: int = 1) -> "SearchData":
+        """キーワードを検索し、抽出済みのデータを返す（pagesが2以上の場合は複数ページをまとめて取得）"""
+        with log_context(keyword=keyword):
+            search_result = self.zenserp_service.search(keyword, force_refresh=force_refresh, pages=pages)
+            return self.zenserp_service.extract_search_data(search_result)
+
+    def _push_text(self, user_id: str, text: str) -> None:
+        """テキストメッセージをプッシュ送信する（送信失敗は処理を止めない）"""
+        try:
+            self.line_bot_api.push_message(user_id, TextSendMessage(text=text))
+        except LineBotApiError as e:
+            logger.error(f"Failed to push message: {str(e)}")
+
+    def _process_keyword(self, keyword: str, force_refresh: bool = False, pages: int = 1) -> Future:
+        """
+        キーワードを検索し、結果をスプレッドシートに書き込む
+
+        Args:
+            keyword (str): 検索キーワード
+            force_refresh (bool): キャッシュを使わずに再取得するかどうか
+            pages (int): 取得するページ数
+
+        Returns:
+            Future: 書き込みが確定するとスプレッドシートのURLが設定されるFuture
+        """
+        # 検索を実行
+        search_data = self._search_keyword(keyword, force_refresh, pages)
+
+        # スプレッドシートに書き込み
+        return self.write_results(keyword, search_data)
+
+    def write_results(self, keyword: str, search_data: "SearchData") -> Future:
+        """
+        抽出済みの検索結果をスプレッドシートに書き込む
+        （ライトビハインドの場合はバッファに追加し、書き込みの確定を待たずに返る）
+
+        Args:
+            keyword (str): 検索キーワード
+            search_data (SearchData): 抽出済みの検索結果データ
+
+        Returns:
+            Future: 書き込みが確定するとスプレッドシートのURLが設定されるFuture
+        """
+        if self.write_buffer is not None:
+            # 共有の結果シートに追記するため、ヘッダー行は除く
+            rows = self.sheets_service.build_rows(keyword, search_data)[1:]
+            return self.write_buffer.submit(rows)
+
+        write_future: Future = Future()
+        write_future.set_result(self.sheets_service.write_search_results(keyword, search_data))
+        return write_future
+
+    def close(self) -> None:
+        """バッファに残っている書き込みを確定させ、バックグラウンド処理を停止する（作成していないものは何もしない）"""
+        self.reply_scheduler.close()
+        rank_tracker = get_if_initialized(self, "rank_tracker")
+        if rank_tracker is not None:
+            rank_tracker.close()
+        write_buffer = get_if_initialized(self, "write_buffer")
+        if write_buffer is not None:
+            write_buffer.close(timeout=30)
+        history_store = get_if_initialized(self, "history_store")
+        if history_store is not None:
+            history_store.close(timeout=10)
+        sheets_service = get_if_initialized(self, "sheets_service")
+        if sheets_service is not None:
+            sheets_service.close()
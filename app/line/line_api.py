@@ -0,0 +1,21 @@
+from linebot import LineBotApi
+from app.utils.metrics import stage
+
+
+class InstrumentedLineBotApi(LineBotApi):
+    """返信・プッシュ送信の所要時間とエラーをメトリクスに記録するLineBotApi"""
+
+    def reply_message(self, reply_token, messages, notification_disabled=False, timeout=None):
+        with stage("line_reply", upstream="line"):
+            return super().reply_message(reply_token, messages, notification_disabled=notification_disabled, timeout=timeout)
+
+    def push_message(self, to, messages, retry_key=None, notification_disabled=False, custom_aggregation_units=None, timeout=None):
+        with stage("line_push", upstream="line"):
+            return super().push_message(
+                to,
+                messages,
+                retry_key=retry_key,
+                notification_disabled=notification_disabled,
+                custom_aggregation_units=custom_aggregation_units,
+                timeout=timeout
+            )
@@ -0,0 +1,113 @@
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Optional
+from app.utils.keywords import normalize_keyword
+
+# キャッシュを使わずに再取得するためのオプション（例：「!更新 キーワード」）
+REFRESH_OPTIONS = {"refresh", "更新", "再取得"}
+
+# 複数ページを取得して下位の順位まで調べるためのオプション（例：「!深掘り キーワード」）
+DEEP_OPTIONS = {"deep", "深掘り"}
+
+# コマンド（例：「!シェア 30」「!追跡 キーワード」）の別名とコマンド名の対応
+COMMANDS = {
+    # 蓄積した検索結果の分析
+    "share": "share",
+    "シェア": "share",
+    "overlap": "overlap",
+    "重複": "overlap",
+    "cluster": "cluster",
+    "クラスタ": "cluster",
+    # 順位の定期追跡
+    "track": "track",
+    "追跡": "track",
+    "untrack": "untrack",
+    "追跡解除": "untrack",
+    "tracked": "tracked",
+    "追跡一覧": "tracked",
+}
+
+# 一括モードでキーワードを区切る文字（改行・カンマ）
+_KEYWORD_SEPARATOR_RE = re.compile(r"[\r\n,，]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@dataclass
+class ParsedMessage:
+    """LINEメッセージから取り出したキーワードとオプション"""
+    keyword: str
+    force_refresh: bool = False
+    # 深掘りモードの場合はTrue（取得するページ数は設定値）
+    deep: bool = False
+    # 改行またはカンマで区切られたキーワード（重複は除く）
+    keywords: List[str] = field(default_factory=list)
+    # コマンドの場合はコマンド名とそれ以降の本文
+    command: Optional[str] = None
+    command_args: str = ""
+
+    @property
+    def is_bulk(self) -> bool:
+        """複数のキーワードを含む一括モードのメッセージかどうか"""
+        return len(self.keywords) > 1
+
+
+def parse_message(text: str) -> ParsedMessage:
+    """
+    メッセージ本文を解析し、先頭の「!」で始まるオプションとキーワードに分ける
+    （コマンドの場合は以降の本文をコマンドの引数とする）
+
+    Args:
+        text (str): メッセージ本文
+
+    Returns:
+        ParsedMessage: 解析結果
+    """
+    parsed = ParsedMessage(keyword="")
+    body = text.strip()
+
+    while body:
+        parts = _WHITESPACE_RE.split(body, maxsplit=1)
+        head, rest = parts[0], parts[1] if len(parts) > 1 else ""
+        # 全角の「！」も受け付ける
+        option = unicodedata.normalize("NFKC", head)
+        if not option.startswith("!"):
+            break
+        name = option[1:].lower()
+        if name in REFRESH_OPTIONS:
+            parsed.force_refresh = True
+        elif name in DEEP_OPTIONS:
+            parsed.deep = True
+        elif name in COMMANDS:
+            parsed.command = COMMANDS[name]
+            parsed.command_args = rest.strip()
+            return parsed
+        else:
+            break
+        body = rest.strip()
+
+    parsed.keywords = split_keywords(body)
+    parsed.keyword = parsed.keywords[0] if len(parsed.keywords) == 1 else body
+    return parsed
+
+
+def split_keywords(text: str) -> List[str]:
+    """
+    改行またはカンマで区切られたキーワードを分割する（正規化後に重複するものは除く）
+
+    Args:
+        text (str): キーワードを含む文字列
+
+    Returns:
+        List[str]: キーワードのリスト
+    """
+    keywords = []
+    seen = set()
+    for keyword in _KEYWORD_SEPARATOR_RE.split(text):
+        keyword = keyword.strip()
+        key = normalize_keyword(keyword)
+        if not keyword or key in seen:
+            continue
+        seen.add(key)
+        keywords.append(keyword)
+    return keywords
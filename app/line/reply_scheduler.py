@@ -0,0 +1,175 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from linebot import LineBotApi
+from linebot.exceptions import LineBotApiError
+from linebot.models import TextSendMessage
+from app.utils.logger import logger
+from app.utils.metrics import REPLY_DELIVERIES
+
+# 返信トークンの状態
+HELD = "held"          # 保持中（まだ何も返信していない）
+REPLIED = "replied"    # 結果を返信に使った
+INTERIM = "interim"    # 期限切れのため処理中メッセージを返信した（結果はプッシュで送信する）
+
+
+class PendingReply:
+    """1件のメッセージの返信トークンと、結果を送るまでの状態"""
+    __slots__ = ("reply_token", "user_id", "interim_text", "state", "interim_done")
+
+    def __init__(self, reply_token: str, user_id: str, interim_text: str):
+        self.reply_token = reply_token
+        self.user_id = user_id
+        self.interim_text = interim_text
+        self.state = HELD
+        # 処理中メッセージの送信が終わったか（結果のプッシュが先に届かないようにする）
+        self.interim_done = threading.Event()
+
+
+class ReplyScheduler:
+    """
+    返信トークンを期限まで保持し、期限内に結果が出た場合は結果をreplyで返し、
+    間に合わなかった場合は処理中メッセージをreplyで返して結果をプッシュで送信するクラス
+    （キャッシュヒットなどすぐ終わる処理でプッシュ送信の回数を消費しないようにする）
+    """
+
+    def __init__(self, line_bot_api: LineBotApi, deadline_seconds: float):
+        self.line_bot_api = line_bot_api
+        self.deadline_seconds = deadline_seconds
+        # (期限（monotonic）, 登録順, PendingReply) のヒープ
+        self._heap: List[Tuple[float, int, PendingReply]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._stats = {
+            "held": 0,
+            "replied": 0,
+            "pushed": 0,
+            "interim_replies": 0,
+            "reply_failures": 0
+        }
+
+    def hold(self, reply_token: str, user_id: str, interim_text: str, received_at: Optional[float] = None) -> PendingReply:
+        """
+        返信トークンを保持する（期限を過ぎると処理中メッセージを返信する）
+
+        Args:
+            reply_token (str): 返信トークン
+            user_id (str): 期限を過ぎた場合の結果の送信先
+            interim_text (str): 期限を過ぎた場合に返信する処理中メッセージ
+            received_at (Optional[float]): イベントの発生時刻（UNIX時間、キューでの待ち時間も期限に含める）
+
+        Returns:
+            PendingReply: resolveで結果を送信するためのハンドル
+        """
+        pending = PendingReply(reply_token, user_id, interim_text)
+        elapsed = max(0.0, time.time() - received_at) if received_at else 0.0
+        remaining = self.deadline_seconds - elapsed
+
+        with self._condition:
+            self._stats["held"] += 1
+            if remaining > 0:
+                heapq.heappush(self._heap, (time.monotonic() + remaining, next(self._sequence), pending))
+                self._ensure_thread()
+                self._condition.notify()
+                return pending
+
+        # 期限を過ぎている（または期限0の）場合はすぐに処理中メッセージを返信する
+        self._expire(pending)
+        return pending
+
+    def resolve(self, pending: PendingReply, text: str) -> str:
+        """
+        結果を送信する（返信トークンを保持している場合はreply、期限切れの場合はプッシュ）
+
+        Args:
+            pending (PendingReply): holdで取得したハンドル
+            text (str): 送信する結果のメッセージ
+
+        Returns:
+            str: 送信方法（reply / push）
+
+        Raises:
+            LineBotApiError: プッシュ送信に失敗した場合
+        """
+        with self._condition:
+            claimed = pending.state == HELD
+            if claimed:
+                pending.state = REPLIED
+
+        if claimed:
+            try:
+                self.line_bot_api.reply_message(pending.reply_token, TextSendMessage(text=text))
+                self._record("reply")
+                return "reply"
+            except LineBotApiError as e:
+                # 返信トークンが無効になっていた場合などはプッシュで送信する
+                logger.warning(f"Failed to reply with result, falling back to push: {str(e)}")
+                with self._condition:
+                    self._stats["reply_failures"] += 1
+        else:
+            pending.interim_done.wait(timeout=10)
+
+        self.line_bot_api.push_message(pending.user_id, TextSendMessage(text=text))
+        self._record("push")
+        return "push"
+
+    def expire(self, pending: PendingReply) -> None:
+        """期限を待たずに処理中メッセージを返信する（結果の送信が遅れることが分かった場合）"""
+        self._expire(pending)
+
+    def _record(self, outcome: str) -> None:
+        REPLY_DELIVERIES.inc(outcome)
+        with self._condition:
+            self._stats["replied" if outcome == "reply" else "pushed"] += 1
+
+    def _ensure_thread(self) -> None:
+        """期限を監視するスレッドを起動する（ロック取得済みで呼ぶこと）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="reply-scheduler", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        """期限を過ぎた返信トークンで処理中メッセージを返信する"""
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._heap and self._heap[0][0] <= time.monotonic():
+                        break
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, pending = heapq.heappop(self._heap)
+            self._expire(pending)
+
+    def _expire(self, pending: PendingReply) -> None:
+        """まだ結果を返信していない場合は処理中メッセージを返信する"""
+        with self._condition:
+            if pending.state != HELD:
+                return
+            pending.state = INTERIM
+            self._stats["interim_replies"] += 1
+        try:
+            self.line_bot_api.reply_message(pending.reply_token, TextSendMessage(text=pending.interim_text))
+        except LineBotApiError as e:
+            logger.error(f"Failed to send interim reply: {str(e)}")
+        finally:
+            pending.interim_done.set()
+
+    def close(self) -> None:
+        """期限の監視を停止する"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """返信方法ごとの件数を返す"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats["waiting"] = sum(1 for _, _, pending in self._heap if pending.state == HELD)
+        stats["deadline_seconds"] = self.deadline_seconds
+        return stats
@@ -1,7 +1,24 @@
+import time
+
+# 起動時間の内訳を記録するため、他のモジュールより先に計測を始める
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
 from app.line.handler import LineHandler
-from app.utils.logger import logger
+from app.api.batch import router as batch_router
+from app.api.admin import router as admin_router
+from app.services.job_dispatcher import JobDispatcher
+from app.services.durable_job_queue import DurableJobDispatcher, DurableJobQueue
+from app.services.serp_cache import get_serp_cache
+from app.services.rate_limiter import get_quota_budget, get_rate_limiter
+from app.services.resilience import CLOSED, circuit_breaker_stats
+from app.utils.lazy import get_if_initialized
+from app.utils.logger import logger, logger_stats
+from app.utils.metrics import register_collector, render_metrics, upstream_health
+import threading
 import traceback
 
 # FastAPIアプリケーションの設定
@@ -11,20 +28,97 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# 内部ツール向けの一括分析API・管理API
+app.include_router(batch_router)
+app.include_router(admin_router)
+
 # グローバルなハンドラーインスタンス
 line_handler = None
+job_dispatcher = None
+
+# 起動時間の内訳（/healthで確認する）
+startup_report = {
+    "mode": None,
+    "import_seconds": None,
+    "startup_seconds": None,
+    "warm_up_seconds": None,
+    "warm_up": None,
+    "ready": False
+}
+
+def _warm_up() -> None:
+    """重いコンポーネントを作成し、所要時間を起動時間の内訳に記録する"""
+    started = time.perf_counter()
+    report = line_handler.warm_up()
+    startup_report["warm_up"] = report
+    startup_report["warm_up_seconds"] = round(time.perf_counter() - started, 3)
+    startup_report["ready"] = all(step["error"] is None for step in report.values())
+    logger.info(f"Warm-up completed in {startup_report['warm_up_seconds']}s (ready={startup_report['ready']})")
 
 @app.on_event("startup")
 async def startup_event():
     """アプリケーション起動時の処理"""
-    global line_handler
+    global line_handler, job_dispatcher
     try:
-        line_handler = LineHandler()
-        logger.info("Application started successfully")
+        started = time.perf_counter()
+        settings = get_settings()
+        if settings.JOB_QUEUE_BACKEND == "sqlite":
+            # 再起動後も待機中・実行中のジョブを再開し、同じファイルを使う他のワーカープロセスと処理を分担する
+            job_dispatcher = DurableJobDispatcher(
+                DurableJobQueue(
+                    settings.JOB_QUEUE_DB_PATH,
+                    lease_seconds=settings.JOB_LEASE_SECONDS,
+                    max_attempts=settings.JOB_MAX_ATTEMPTS,
+                    retry_base_seconds=settings.JOB_RETRY_BASE_SECONDS,
+                    retry_max_seconds=settings.JOB_RETRY_MAX_SECONDS,
+                    retention_seconds=settings.JOB_QUEUE_RETENTION_SECONDS
+                ),
+                max_workers=settings.JOB_WORKER_CONCURRENCY,
+                max_queue_size=settings.JOB_QUEUE_MAX_SIZE,
+                poll_interval_seconds=settings.JOB_QUEUE_POLL_INTERVAL_SECONDS
+            )
+        else:
+            job_dispatcher = JobDispatcher(
+                max_workers=settings.JOB_WORKER_CONCURRENCY,
+                max_queue_size=settings.JOB_QUEUE_MAX_SIZE
+            )
+        line_handler = LineHandler(dispatcher=job_dispatcher)
+        app.state.line_handler = line_handler
+        # 再開するジョブを処理できるように、ハンドラーを登録してからワーカーを起動する
+        job_dispatcher.start()
+
+        startup_report["mode"] = settings.STARTUP_MODE
+        if settings.STARTUP_MODE == "background":
+            # Webhookの署名検証とジョブの投入に必要なものだけ作成し、残りはポートを開いた後に並行して作成する
+            threading.Thread(target=_warm_up, name="startup-warm-up", daemon=True).start()
+        else:
+            await run_in_threadpool(_warm_up)
+            if not startup_report["ready"]:
+                failed = [name for name, step in startup_report["warm_up"].items() if step["error"] is not None]
+                raise RuntimeError(f"Failed to initialize components: {', '.join(failed)}")
+
+        startup_report["startup_seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"Application started successfully (mode={settings.STARTUP_MODE}, "
+            f"import={startup_report['import_seconds']}s, startup={startup_report['startup_seconds']}s)"
+        )
     except Exception as e:
         logger.error(f"Failed to initialize application: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """アプリケーション終了時の処理"""
+    if job_dispatcher is not None:
+        # キューに残っているジョブを処理してから終了する（sqliteの場合は実行中のジョブの完了を待ち、残りは次の起動で再開する）
+        await run_in_threadpool(job_dispatcher.shutdown, 25)
+    if line_handler is not None:
+        # バッファに残っている行を書き込んでから終了する
+        await run_in_threadpool(line_handler.close)
+        zenserp_service = get_if_initialized(line_handler, "zenserp_service")
+        if zenserp_service is not None:
+            await zenserp_service.aclose()
+
 @app.post("/webhook")
 async def webhook(request: Request):
     """
@@ -39,11 +133,11 @@ async def webhook(request: Request):
             logger.warning("Missing X-Line-Signature header")
             raise HTTPException(status_code=400, detail="Missing signature")
 
-        # Webhookを処理
+        # Webhookを処理（署名検証とジョブ投入のみ行い、検索処理はワーカーで実行する）
         if line_handler is None:
             raise HTTPException(status_code=500, detail="Handler not initialized")
             
-        line_handler.handle_webhook(body.decode(), signature)
+        await run_in_threadpool(line_handler.handle_webhook, body.decode(), signature)
 
         return JSONResponse(content={"status": "success"})
 
@@ -65,31 +159,105 @@ async def root():
         "version": "1.0.0"
     }
 
+def _collect_component_metrics():
+    """各コンポーネントの統計情報をメトリクスとして返す"""
+    metrics = []
+    if job_dispatcher is not None:
+        stats = job_dispatcher.stats()
+        metrics.append(("keyword_analyze_job_queue_depth", "gauge", "Number of jobs waiting in the queue.", stats["queue_length"]))
+        metrics.append(("keyword_analyze_job_workers_active", "gauge", "Number of workers currently running a job.", stats["active_workers"]))
+        if stats["backend"] == "sqlite":
+            metrics.append(("keyword_analyze_job_retries_total", "counter", "Durable jobs scheduled for retry after a transient error.", stats["retried"]))
+            metrics.append(("keyword_analyze_job_dead_letters", "gauge", "Durable jobs that exhausted their attempts and are kept for inspection.", stats["dead_letters"]))
+    if line_handler is not None and line_handler.event_deduplicator is not None:
+        stats = line_handler.event_deduplicator.stats()
+        metrics.append(("keyword_analyze_webhook_duplicates_skipped_total", "counter", "Redelivered webhook events skipped as duplicates.", stats["skipped_duplicates"]))
+        metrics.append(("keyword_analyze_webhook_redeliveries_total", "counter", "Webhook events flagged as redeliveries by LINE.", stats["redeliveries"]))
+    serp_cache = get_serp_cache()
+    if serp_cache is not None:
+        stats = serp_cache.stats()
+        metrics.append(("keyword_analyze_serp_cache_hits_total", "counter", "SERP cache hits (memory and disk).", stats["memory_hits"] + stats["disk_hits"]))
+        metrics.append(("keyword_analyze_serp_cache_misses_total", "counter", "SERP cache misses.", stats["misses"]))
+    quota = get_quota_budget().stats()
+    metrics.append(("keyword_analyze_zenserp_quota_used", "gauge", "Zenserp requests used this month.", quota["used"]))
+    logging_stats = logger_stats()
+    if logging_stats["async"]:
+        metrics.append(("keyword_analyze_log_records_dropped_total", "counter", "Log records dropped because the log queue was full.", logging_stats["dropped"]))
+    return metrics
+
+
+register_collector(_collect_component_metrics)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheusのテキスト形式でメトリクスを返す
+    """
+    # 統計情報の収集はファイルロック・SQLiteの読み込みを伴うため、イベントループを止めないようにスレッドで行う
+    return PlainTextResponse(await run_in_threadpool(render_metrics), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _collect_health_status():
+    """各コンポーネントの状態と統計情報を収集する（未作成のコンポーネントは作成せずにNoneを返す）"""
+    def component(name):
+        return get_if_initialized(line_handler, name) if line_handler is not None else None
+
+    sheets_service = component("sheets_service")
+    write_buffer = component("write_buffer")
+    history_store = component("history_store")
+    rank_tracker = component("rank_tracker")
+    circuit_breakers = circuit_breaker_stats()
+    health_status = {
+        "status": "healthy",
+        "components": {
+            "line_handler": line_handler is not None,
+            "job_dispatcher": job_dispatcher is not None and job_dispatcher.stats()["running"],
+            # 実際のAPI呼び出しは避け、サーキットブレーカーが遮断していないかで判定する
+            "zenserp_service": circuit_breakers["zenserp"]["state"] == CLOSED,
+            "sheets_service": circuit_breakers["sheets"]["state"] == CLOSED
+        },
+        "circuit_breakers": circuit_breakers,
+        "startup": startup_report,
+        "upstreams": {name: upstream_health(name) for name in ("zenserp", "sheets", "line")},
+        "jobs": job_dispatcher.stats() if job_dispatcher is not None else None,
+        "reply_scheduler": line_handler.reply_scheduler.stats() if line_handler is not None else None,
+        "webhook_dedup": line_handler.event_deduplicator.stats() if line_handler is not None and line_handler.event_deduplicator is not None else None,
+        "admission": line_handler.admission.stats() if line_handler is not None and line_handler.admission is not None else None,
+        "coalescing": line_handler.single_flight.stats() if line_handler is not None and line_handler.single_flight is not None else None,
+        "sheets": sheets_service.cache_stats() if sheets_service is not None else None,
+        "sheets_write_buffer": write_buffer.stats() if write_buffer is not None else None,
+        "history_store": history_store.stats() if history_store is not None else None,
+        "rank_tracking": rank_tracker.stats() if rank_tracker is not None else None,
+        "serp_cache": get_serp_cache().stats() if get_serp_cache() is not None else None,
+        "zenserp_rate_limit": get_rate_limiter().stats(),
+        "zenserp_quota": get_quota_budget().stats(),
+        "logging": logger_stats()
+    }
+    
+    # いずれかのコンポーネントが失敗している場合
+    if not all(health_status["components"].values()):
+        health_status["status"] = "unhealthy"
+        
+    return health_status
+
+
 @app.get("/health")
 async def health_check():
     """
     詳細なヘルスチェックエンドポイント
     """
     try:
-        # 各コンポーネントの状態確認
-        health_status = {
-            "status": "healthy",
-            "components": {
-                "line_handler": line_handler is not None,
-                "zenserp_service": True,  # 実際のAPI呼び出しは避ける
-                "sheets_service": True    # 実際のAPI呼び出しは避ける
-            }
-        }
-        
-        # いずれかのコンポーネントが失敗している場合
-        if not all(health_status["components"].values()):
-            health_status["status"] = "unhealthy"
-            
-        return health_status
-        
+        # 月間利用枠（ファイルロック）・永続化するジョブキュー（SQLite）などの読み込みで
+        # イベントループを止めないように、状態の収集はスレッドで行う
+        return await run_in_threadpool(_collect_health_status)
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         return {
             "status": "unhealthy", 
             "error": str(e)
         }
+
+
+# アプリケーションの読み込みにかかった時間（このモジュールが読み込むライブラリを含む）
+startup_report["import_seconds"] = round(time.perf_counter() - _import_started, 3)
@@ -0,0 +1,203 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import get_settings
+from app.services.rate_limiter import TokenBucket
+from app.utils.logger import logger
+from app.utils.metrics import ADMISSION_REJECTIONS
+
+# 受け付けなかった理由
+REASON_RATE = "rate"                # 短時間のリクエストが多すぎる（トークンバケットの残量不足）
+REASON_CONCURRENCY = "concurrency"  # 受け付け済みで処理が終わっていないリクエストが多すぎる
+
+
+def requester_keys(source: Any) -> List[str]:
+    """
+    Webhookイベントの送信元から受け付け制御のキーを作成する
+    （グループ・トークルームの場合はその単位のキーを先頭にし、送信したユーザーのキーを続ける）
+
+    Args:
+        source: LINE Messaging APIのイベントの送信元（event.source）
+
+    Returns:
+        List[str]: 「group:ID」「room:ID」「user:ID」形式のキー（先頭のキーを公平なスケジューリングの単位とする）
+    """
+    keys: List[str] = []
+    group_id = getattr(source, "group_id", None)
+    room_id = getattr(source, "room_id", None)
+    if group_id:
+        keys.append(f"group:{group_id}")
+    elif room_id:
+        keys.append(f"room:{room_id}")
+    user_id = getattr(source, "user_id", None)
+    if user_id:
+        keys.append(f"user:{user_id}")
+    return keys
+
+
+@dataclass
+class AdmissionDecision:
+    """受け付け判定の結果"""
+    admitted: bool
+    # 受け付けた場合の処理の識別子（処理が終わったらreleaseに渡す）
+    ticket: Optional[str] = None
+    # 受け付けなかった理由（rate / concurrency）
+    reason: Optional[str] = None
+    # 再度受け付けられるようになるまでの目安の秒数（rateの場合）
+    retry_after: float = 0.0
+
+
+class _KeyState:
+    """キーごとのトークンバケットと処理中のリクエスト"""
+    __slots__ = ("bucket", "in_flight")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        # 処理の識別子 -> 受け付けた時刻
+        self.in_flight: Dict[str, float] = {}
+
+
+class AdmissionController:
+    """
+    ユーザー・グループごとにリクエストの頻度と同時処理数を制限し、
+    上限を超えたリクエストをワーカーで処理する前に受け付けないためのクラス
+    （1人のユーザーが一括モードなどで送り続けても、他のユーザーの待ち時間や検索APIの利用枠を使い切らないようにする）
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int,
+        max_in_flight: int,
+        max_tracked_keys: int = 10000,
+        in_flight_timeout_seconds: float = 900.0
+    ):
+        self.rate_per_minute = rate_per_minute
+        self.burst = max(1, burst)
+        self.max_in_flight = max_in_flight
+        self.max_tracked_keys = max(1, max_tracked_keys)
+        self.in_flight_timeout_seconds = in_flight_timeout_seconds
+        # キー -> 状態（最近使った順。上限を超えた場合は処理中のリクエストがない古いキーから破棄する）
+        self._keys: "OrderedDict[str, _KeyState]" = OrderedDict()
+        # 処理の識別子 -> 受け付けたキー
+        self._tickets: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"admitted": 0, "rejected_rate": 0, "rejected_concurrency": 0, "expired": 0, "evictions": 0}
+
+    def admit(self, keys: List[str], cost: float = 1.0, ticket: Optional[str] = None) -> AdmissionDecision:
+        """
+        リクエストを受け付けるかどうかを判定する
+        （すべてのキーで上限内の場合だけ、トークンを消費して処理中として記録する）
+
+        Args:
+            keys (List[str]): 受け付け制御のキー（requester_keysの結果）
+            cost (float): 消費するトークン数（一括モードはキーワード数。バーストを上限とする）
+            ticket (Optional[str]): 処理の識別子（省略した場合は新しく作成する）
+
+        Returns:
+            AdmissionDecision: 判定結果
+        """
+        ticket = ticket or uuid.uuid4().hex
+        cost = min(max(cost, 1.0), float(self.burst))
+        now = time.monotonic()
+        with self._lock:
+            states = [self._state(key, now) for key in keys]
+
+            if self.max_in_flight > 0 and any(len(state.in_flight) >= self.max_in_flight for state in states):
+                self._stats["rejected_concurrency"] += 1
+                return self._reject(keys, REASON_CONCURRENCY)
+
+            if self.rate_per_minute > 0:
+                retry_after = max((state.bucket.wait_time(cost) for state in states), default=0.0)
+                if retry_after > 0:
+                    self._stats["rejected_rate"] += 1
+                    return self._reject(keys, REASON_RATE, retry_after)
+                for state in states:
+                    state.bucket.try_acquire(cost)
+
+            for state in states:
+                state.in_flight[ticket] = now
+            self._tickets[ticket] = tuple(keys)
+            self._stats["admitted"] += 1
+            self._evict()
+        return AdmissionDecision(admitted=True, ticket=ticket)
+
+    def release(self, ticket: Optional[str]) -> None:
+        """
+        受け付けたリクエストの処理が終わったことを記録する（未登録の識別子は無視する）
+
+        Args:
+            ticket (Optional[str]): admitが返した処理の識別子
+        """
+        if not ticket:
+            return
+        with self._lock:
+            for key in self._tickets.pop(ticket, ()):
+                state = self._keys.get(key)
+                if state is not None:
+                    state.in_flight.pop(ticket, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """受け付け制御の状態を返す"""
+        with self._lock:
+            return {
+                "rate_per_minute": self.rate_per_minute,
+                "burst": self.burst,
+                "max_in_flight": self.max_in_flight,
+                "tracked_keys": len(self._keys),
+                "in_flight": len(self._tickets),
+                **self._stats
+            }
+
+    def _state(self, key: str, now: float) -> _KeyState:
+        """キーの状態を取得する（期限を過ぎた処理中の記録は破棄する。ロック取得済みで呼ぶこと）"""
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = _KeyState(TokenBucket(self.rate_per_minute / 60, self.burst))
+        else:
+            self._keys.move_to_end(key)
+        if self.in_flight_timeout_seconds > 0:
+            expired = [t for t, started in state.in_flight.items() if now - started >= self.in_flight_timeout_seconds]
+            for ticket in expired:
+                # 終了を記録できなかった処理（プロセス外で再実行されたジョブなど）で上限が埋まったままにならないようにする
+                for other in self._tickets.pop(ticket, ()):
+                    other_state = self._keys.get(other)
+                    if other_state is not None:
+                        other_state.in_flight.pop(ticket, None)
+                state.in_flight.pop(ticket, None)
+                self._stats["expired"] += 1
+        return state
+
+    def _evict(self) -> None:
+        """追跡するキーが上限を超えた場合に、処理中のリクエストがない古いキーから破棄する（ロック取得済みで呼ぶこと）"""
+        excess = len(self._keys) - self.max_tracked_keys
+        if excess <= 0:
+            return
+        for key in [key for key, state in self._keys.items() if not state.in_flight][:excess]:
+            del self._keys[key]
+            self._stats["evictions"] += 1
+
+    def _reject(self, keys: List[str], reason: str, retry_after: float = 0.0) -> AdmissionDecision:
+        """受け付けなかったことを記録する（ロック取得済みで呼ぶこと）"""
+        ADMISSION_REJECTIONS.inc(reason)
+        logger.warning(f"Admission rejected ({reason}) for {', '.join(keys)}")
+        return AdmissionDecision(admitted=False, reason=reason, retry_after=retry_after)
+
+
+@lru_cache()
+def get_admission_controller() -> Optional[AdmissionController]:
+    """プロセス全体で共有する受け付け制御を取得する（無効の場合はNone）"""
+    settings = get_settings()
+    if not settings.ADMISSION_ENABLED:
+        return None
+    return AdmissionController(
+        rate_per_minute=settings.ADMISSION_RATE_PER_MINUTE,
+        burst=settings.ADMISSION_BURST,
+        max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+        max_tracked_keys=settings.ADMISSION_MAX_TRACKED_KEYS,
+        in_flight_timeout_seconds=settings.ADMISSION_IN_FLIGHT_TIMEOUT_SECONDS
+    )
@@ -0,0 +1,692 @@
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+from app.utils.logger import logger
+
+# ジョブの状態
+QUEUED = "queued"    # 実行待ち（available_at以降に取り出せる）
+LEASED = "leased"    # ワーカーが実行中（lease_expires_atまでに完了・延長しなければ再度取り出せる）
+DONE = "done"        # 完了
+FAILED = "failed"    # 再試行の上限に達した（保持期間が過ぎるまで調査用に残す）
+
+# enqueueの結果
+ENQUEUED = "enqueued"
+DUPLICATE = "duplicate"
+REJECTED = "rejected"
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " kind TEXT NOT NULL,"
+    " name TEXT NOT NULL DEFAULT '',"
+    " payload TEXT NOT NULL,"
+    " dedupe_key TEXT UNIQUE,"
+    " status TEXT NOT NULL,"
+    " attempts INTEGER NOT NULL DEFAULT 0,"
+    " available_at REAL NOT NULL,"
+    " lease_owner TEXT,"
+    " lease_expires_at REAL,"
+    " last_error TEXT,"
+    " created_at REAL NOT NULL,"
+    " updated_at REAL NOT NULL,"
+    " fair_key TEXT NOT NULL DEFAULT '')",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status_available_at ON jobs (status, available_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status_lease_expires_at ON jobs (status, lease_expires_at)",
+    # キー（fair_key）ごとに最後にジョブを取り出した時刻（同じ条件のキーから順番に取り出すために使う）
+    "CREATE TABLE IF NOT EXISTS fair_lanes ("
+    " fair_key TEXT PRIMARY KEY,"
+    " last_claimed_at REAL NOT NULL)",
+]
+
+# 公平なスケジューリングの単位（fair_key）を追加する前に作成したデータベースの移行
+_MIGRATIONS = {
+    "fair_key": "ALTER TABLE jobs ADD COLUMN fair_key TEXT NOT NULL DEFAULT ''",
+}
+_FAIR_KEY_INDEX = "CREATE INDEX IF NOT EXISTS idx_jobs_fair_key_status ON jobs (fair_key, status, lease_expires_at)"
+
+
+class RetryableJobError(Exception):
+    """一時的なエラーでジョブを再試行する場合に送出する例外"""
+
+
+class Job:
+    """キューから取り出したジョブ"""
+    __slots__ = ("id", "kind", "name", "payload", "attempts", "max_attempts", "created_at")
+
+    def __init__(self, id: int, kind: str, name: str, payload: Dict[str, Any], attempts: int, max_attempts: int, created_at: float):
+        self.id = id
+        self.kind = kind
+        self.name = name
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.created_at = created_at
+
+    @property
+    def is_final_attempt(self) -> bool:
+        """失敗しても再試行しない最後の実行かどうか"""
+        return self.attempts >= self.max_attempts
+
+
+class DurableJobQueue:
+    """
+    ジョブをローカルのSQLiteに保存するキュー
+    （取り出したジョブには期限付きのリースを設定し、期限までに完了・延長されなかったジョブは
+    別のワーカー・プロセスが再度取り出す。取り出しはBEGIN IMMEDIATEで直列化するため、
+    同じデータベースを複数のプロセスで共有できる）
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+        retry_base_seconds: float = 5.0,
+        retry_max_seconds: float = 300.0,
+        retention_seconds: float = 86400.0
+    ):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.retention_seconds = retention_seconds
+        # スレッドごとに接続を持つ（1つの接続でトランザクションを共有しないようにする）
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._connect()
+        for statement in _SCHEMA:
+            db.execute(statement)
+        columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+        for column, statement in _MIGRATIONS.items():
+            if column not in columns:
+                db.execute(statement)
+        db.execute(_FAIR_KEY_INDEX)
+        logger.info(f"Durable job queue opened: {db_path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """このスレッドの接続を取得する（初回は接続を作成する）"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def _transaction(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """書き込みロックを取得してから関数を実行する（他のプロセスの取り出しと重ならないようにする）"""
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(db)
+            db.execute("COMMIT")
+            return result
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        dedupe_key: Optional[str] = None,
+        name: str = "",
+        max_queued: int = 0,
+        fair_key: str = ""
+    ) -> str:
+        """
+        ジョブを追加する
+
+        Args:
+            kind (str): ジョブの種類（実行する関数の登録名）
+            payload (Dict[str, Any]): ジョブの引数（JSONに変換できる値）
+            dedupe_key (Optional[str]): 重複排除のキー（同じキーのジョブが保持期間内にある場合は追加しない）
+            name (str): ログ出力用のジョブ名
+            max_queued (int): 実行待ちのジョブの上限（0で無制限）
+            fair_key (str): 公平に順番を回す単位（ユーザー・グループ）のキー
+
+        Returns:
+            str: enqueued / duplicate（同じキーのジョブがある） / rejected（実行待ちが上限に達している）
+        """
+        now = time.time()
+        data = json.dumps(payload, ensure_ascii=False)
+
+        def insert(db: sqlite3.Connection) -> str:
+            if dedupe_key is not None and db.execute("SELECT 1 FROM jobs WHERE dedupe_key = ?", (dedupe_key,)).fetchone():
+                return DUPLICATE
+            if max_queued > 0:
+                queued = db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+                if queued >= max_queued:
+                    return REJECTED
+            db.execute(
+                "INSERT INTO jobs (kind, name, payload, dedupe_key, status, available_at, created_at, updated_at, fair_key)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, name, data, dedupe_key, QUEUED, now, now, now, fair_key)
+            )
+            return ENQUEUED
+
+        return self._transaction(insert)
+
+    def claim(self, owner: str) -> Optional[Job]:
+        """
+        実行できるジョブを1件取り出してリースを設定する
+        （実行待ちのジョブと、リースの期限が切れたジョブが対象。期限切れのまま再試行の上限に達したジョブは失敗にする）
+        全プロセスで実行中のジョブが最も少ないキー（fair_key）のジョブを優先し、
+        同数の場合は最後に取り出してから最も時間が経ったキーの古いジョブから取り出す（キーごとに順番に取り出す）
+
+        Args:
+            owner (str): リースの所有者（ワーカーの識別子）
+
+        Returns:
+            Optional[Job]: 取り出したジョブ（実行できるジョブがない場合はNone）
+        """
+        def take(db: sqlite3.Connection) -> Optional[Job]:
+            now = time.time()
+            while True:
+                row = db.execute(
+                    "SELECT id, kind, name, payload, status, attempts, created_at, fair_key FROM jobs AS j"
+                    " WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at <= ?)"
+                    " ORDER BY (SELECT COUNT(*) FROM jobs AS a"
+                    "  WHERE a.fair_key = j.fair_key AND a.status = ? AND a.lease_expires_at > ?),"
+                    " COALESCE((SELECT last_claimed_at FROM fair_lanes AS f WHERE f.fair_key = j.fair_key), 0),"
+                    " available_at, id LIMIT 1",
+                    (QUEUED, now, LEASED, now, LEASED, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["status"] == LEASED and row["attempts"] >= self.max_attempts:
+                    # 実行中のプロセスが停止し続ける（ジョブが原因の可能性がある）場合は取り出さない
+                    db.execute(
+                        "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL,"
+                        " last_error = ?, updated_at = ? WHERE id = ?",
+                        (FAILED, "lease expired", now, row["id"])
+                    )
+                    logger.error(f"Job {row['id']} ({row['name']}) failed: lease expired after {row['attempts']} attempts")
+                    continue
+                if row["status"] == LEASED:
+                    logger.warning(f"Reclaiming job {row['id']} ({row['name']}) whose lease expired")
+                db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?,"
+                    " updated_at = ? WHERE id = ?",
+                    (LEASED, owner, now + self.lease_seconds, now, row["id"])
+                )
+                db.execute(
+                    "INSERT OR REPLACE INTO fair_lanes (fair_key, last_claimed_at) VALUES (?, ?)",
+                    (row["fair_key"], now)
+                )
+                return Job(
+                    row["id"], row["kind"], row["name"], json.loads(row["payload"]),
+                    row["attempts"] + 1, self.max_attempts, row["created_at"]
+                )
+
+        return self._transaction(take)
+
+    def extend(self, owner: str, job_ids: List[int]) -> int:
+        """
+        実行中のジョブのリースを延長する
+
+        Args:
+            owner (str): リースの所有者
+            job_ids (List[int]): 延長するジョブのID
+
+        Returns:
+            int: 延長できたジョブの数（期限が切れて他のワーカーに取り出されたジョブは含まない）
+        """
+        if not job_ids:
+            return 0
+        now = time.time()
+        placeholders = ",".join("?" * len(job_ids))
+        cursor = self._connect().execute(
+            f"UPDATE jobs SET lease_expires_at = ?, updated_at = ?"
+            f" WHERE status = ? AND lease_owner = ? AND id IN ({placeholders})",
+            (now + self.lease_seconds, now, LEASED, owner, *job_ids)
+        )
+        return cursor.rowcount
+
+    def complete(self, owner: str, job: Job) -> None:
+        """ジョブを完了にする（重複排除のキーは保持期間が過ぎるまで残す）"""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ?"
+            " WHERE id = ? AND lease_owner = ?",
+            (DONE, now, job.id, owner)
+        )
+
+    def fail(self, owner: str, job: Job, error: str, retry: bool = True) -> Optional[float]:
+        """
+        ジョブの失敗を記録する（再試行の上限に達していなければ、待機時間を置いて実行待ちに戻す）
+
+        Args:
+            owner (str): リースの所有者
+            job (Job): 失敗したジョブ
+            error (str): エラーの内容
+            retry (bool): 再試行するかどうか
+
+        Returns:
+            Optional[float]: 再試行までの秒数（再試行しない場合はNone）
+        """
+        now = time.time()
+        if retry and job.attempts < self.max_attempts:
+            # 指数バックオフに揺らぎを加え、複数のジョブが同時に再試行しないようにする
+            backoff = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (job.attempts - 1))
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+            self._connect().execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, lease_expires_at = NULL,"
+                " last_error = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                (QUEUED, now + delay, error, now, job.id, owner)
+            )
+            return delay
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL,"
+            " last_error = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+            (FAILED, error, now, job.id, owner)
+        )
+        return None
+
+    def release(self, owner: str, job_ids: Optional[List[int]] = None) -> int:
+        """
+        実行中のジョブをすぐに取り出せる状態に戻す（停止時に完了を待てなかったジョブを次の起動で再開する）
+        （ジョブが原因の失敗ではないため、実行回数は元に戻す）
+
+        Args:
+            owner (str): リースの所有者
+            job_ids (Optional[List[int]]): 戻すジョブのID（省略時は所有するすべてのジョブ）
+
+        Returns:
+            int: 戻したジョブの数
+        """
+        now = time.time()
+        query = (
+            "UPDATE jobs SET status = ?, available_at = ?, attempts = MAX(attempts - 1, 0),"
+            " lease_owner = NULL, lease_expires_at = NULL, updated_at = ? WHERE status = ? AND lease_owner = ?"
+        )
+        params: List[Any] = [QUEUED, now, now, LEASED, owner]
+        if job_ids is not None:
+            if not job_ids:
+                return 0
+            query += f" AND id IN ({','.join('?' * len(job_ids))})"
+            params.extend(job_ids)
+        return self._connect().execute(query, params).rowcount
+
+    def recover(self, is_alive: Callable[[str], bool]) -> int:
+        """
+        停止したワーカーが所有していたジョブを、リースの期限を待たずに取り出せる状態に戻す
+
+        Args:
+            is_alive (Callable[[str], bool]): リースの所有者が動作中かどうかを判定する関数
+
+        Returns:
+            int: 戻したジョブの数
+        """
+        owners = [
+            row["lease_owner"]
+            for row in self._connect().execute(
+                "SELECT DISTINCT lease_owner FROM jobs WHERE status = ? AND lease_owner IS NOT NULL", (LEASED,)
+            ).fetchall()
+        ]
+        recovered = 0
+        for owner in owners:
+            if not is_alive(owner):
+                # 停止したワーカーのジョブも実行回数に数える（停止の原因がジョブの可能性もあるため）
+                now = time.time()
+                recovered += self._connect().execute(
+                    "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE status = ? AND lease_owner = ?",
+                    (now, now, LEASED, owner)
+                ).rowcount
+        return recovered
+
+    def purge(self) -> int:
+        """保持期間が過ぎた完了・失敗のジョブを削除する"""
+        cutoff = time.time() - self.retention_seconds
+        db = self._connect()
+        db.execute("DELETE FROM fair_lanes WHERE last_claimed_at < ?", (cutoff,))
+        return db.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (DONE, FAILED, cutoff)
+        ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとのジョブ数を返す（すべてのプロセスの合計）"""
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for row in self._connect().execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall():
+            counts[row["status"]] = row["count"]
+        return counts
+
+    def close(self) -> None:
+        """このスレッドの接続を閉じる"""
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def _process_token(pid: int) -> str:
+    """
+    プロセスの起動を識別する値（起動ごとのブートID:起動時刻）を返す
+    コンテナでは再起動後も同じホスト名・プロセスID（PID 1など）になることが多いため、プロセスIDと合わせて比較する
+
+    Args:
+        pid (int): プロセスID
+
+    Returns:
+        str: 識別する値（/procを読めない環境では空文字）
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()[:8]
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+        # 2番目の項目（コマンド名）は空白や括弧を含む場合があるため、最後の")"より後ろを分割する（22番目の項目が起動時刻）
+        start_time = stat[stat.rindex(")") + 2:].split()[19]
+        return f"{boot_id}-{start_time}"
+    except (OSError, ValueError, IndexError):
+        return ""
+
+
+def _owner_is_alive(owner: str) -> bool:
+    """
+    リースの所有者（ホスト名:プロセスID:起動の識別値:識別子）のプロセスが動作中かどうかを判定する
+    （別のホストの場合は判定できないためTrue。起動の識別値がない場合はプロセスIDの存在だけで判定する）
+    """
+    try:
+        parts = owner.split(":")
+        host, pid = parts[0], int(parts[1])
+        # 以前の形式（ホスト名:プロセスID:識別子）は起動の識別値を持たない
+        token = parts[2] if len(parts) >= 4 else ""
+        if host != socket.gethostname():
+            return True
+        os.kill(pid, 0)
+        if token:
+            current = _process_token(pid)
+            # 同じプロセスIDでも起動し直したプロセスの場合は停止したとみなす
+            if current and current != token:
+                return False
+        return True
+    except ProcessLookupError:
+        return False
+    except (ValueError, IndexError, PermissionError, OSError):
+        return True
+
+
+class DurableJobDispatcher:
+    """
+    DurableJobQueueのジョブをバックグラウンドのワーカープールで実行するクラス
+    （JobDispatcherと異なり、再起動をまたいでジョブが残り、複数のプロセスで同じキューを処理できる）
+    """
+
+    def __init__(
+        self,
+        queue: DurableJobQueue,
+        max_workers: int,
+        max_queue_size: int,
+        poll_interval_seconds: float = 0.5
+    ):
+        self.queue = queue
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(1, max_queue_size)
+        self.poll_interval_seconds = poll_interval_seconds
+        # リースの所有者（プロセスごとに一意）
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{_process_token(os.getpid())}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Callable[[Dict[str, Any], Job], None]] = {}
+        self._workers: List[threading.Thread] = []
+        self._heartbeat: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # 実行中のジョブの完了を待つ間もリースを延長するため、ワーカーとは別に停止する
+        self._heartbeat_stop = threading.Event()
+        self._lock = threading.Lock()
+        # 実行中のジョブ（リースを延長する対象）
+        self._running_jobs: Dict[int, Job] = {}
+        # 実行中のジョブ -> 実行しているワーカースレッド
+        self._job_workers: Dict[int, threading.Thread] = {}
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._retried = 0
+        self._rejected = 0
+        self._duplicates = 0
+        self._released = 0
+        self._recovered = 0
+        self._busy_seconds = 0.0
+        self._started_at: Optional[float] = None
+        self._running = False
+
+    def register(self, kind: str, func: Callable[[Dict[str, Any], Job], None]) -> None:
+        """
+        ジョブの種類ごとに実行する関数を登録する（startの前に登録すること）
+
+        Args:
+            kind (str): ジョブの種類
+            func (Callable): ジョブの引数とJobを受け取る関数（RetryableJobErrorを送出すると再試行する）
+        """
+        self._handlers[kind] = func
+
+    def start(self) -> None:
+        """停止したプロセスのジョブを取り出せる状態に戻し、ワーカースレッドを起動する"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._started_at = time.monotonic()
+
+        self._recovered = self.queue.recover(_owner_is_alive)
+        counts = self.queue.counts()
+        if self._recovered or counts[QUEUED] or counts[LEASED]:
+            logger.info(
+                f"Resuming durable jobs: {counts[QUEUED]} queued, {counts[LEASED]} leased "
+                f"({self._recovered} recovered from stopped workers)"
+            )
+
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"keyword-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-lease-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+        logger.info(
+            f"Durable job dispatcher started with {self.max_workers} workers "
+            f"(owner: {self.owner}, lease: {self.queue.lease_seconds}s, db: {self.queue.db_path})"
+        )
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        dedupe_key: Optional[str] = None,
+        name: str = "",
+        fair_key: str = ""
+    ) -> str:
+        """
+        ジョブをキューに追加する
+
+        Args:
+            kind (str): ジョブの種類
+            payload (Dict[str, Any]): ジョブの引数（JSONに変換できる値）
+            dedupe_key (Optional[str]): 重複排除のキー（すべてのプロセスで共有する）
+            name (str): ログ出力用のジョブ名
+            fair_key (str): 公平に順番を回す単位（ユーザー・グループ）のキー
+
+        Returns:
+            str: enqueued / duplicate / rejected（停止中・実行待ちが上限に達している・保存に失敗した）
+        """
+        if not self._running:
+            logger.warning(f"Job dispatcher is not running, rejected job: {name}")
+            with self._lock:
+                self._rejected += 1
+            return REJECTED
+
+        try:
+            result = self.queue.enqueue(
+                kind, payload, dedupe_key=dedupe_key, name=name, max_queued=self.max_queue_size, fair_key=fair_key
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to enqueue job ({name}): {str(e)}")
+            result = REJECTED
+
+        with self._lock:
+            if result == ENQUEUED:
+                self._submitted += 1
+            elif result == DUPLICATE:
+                self._duplicates += 1
+            else:
+                self._rejected += 1
+        if result == ENQUEUED:
+            self._wake.set()
+        elif result == DUPLICATE:
+            logger.info(f"Skipped duplicate job: {dedupe_key}")
+        else:
+            logger.warning(f"Job queue is full, rejected job: {name}")
+        return result
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        ワーカーを停止する（実行中のジョブの完了を待ち、待ちきれなかったジョブと実行待ちのジョブは次の起動で再開する）
+        待ちきれなかったジョブはスレッドがまだ実行しているため、リースを解放せずに期限切れを待って再開する
+        （解放すると他のプロセスが同じジョブを並行して実行し、プッシュやシートへの書き込みが二重になる）
+
+        Args:
+            timeout (Optional[float]): すべてのワーカーの終了を待つ最大秒数（全体で1つの期限とする）
+        """
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+
+        self._stop.set()
+        self._wake.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(None if deadline is None else max(deadline - time.monotonic(), 0.0))
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+
+        with self._lock:
+            unfinished = dict(self._job_workers)
+        # ワーカーが止まっているのに完了を記録できなかったジョブだけを、期限を待たずに再開できるようにする
+        stopped = [job_id for job_id, worker in unfinished.items() if not worker.is_alive()]
+        if stopped:
+            self._released = self.queue.release(self.owner, stopped)
+            with self._lock:
+                for job_id in stopped:
+                    self._running_jobs.pop(job_id, None)
+                    self._job_workers.pop(job_id, None)
+            logger.warning(f"Released {self._released} unfinished jobs for resumption")
+        still_running = len(unfinished) - len(stopped)
+        if still_running:
+            # 実行中のジョブのリースはプロセスが終了するまで延長し続ける（終了後は期限切れで他のプロセスが再開する）
+            logger.warning(f"{still_running} jobs are still running after the shutdown timeout; their leases will expire if the process exits")
+        else:
+            self._heartbeat_stop.set()
+        logger.info("Durable job dispatcher stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        """キューとワーカーの状態を返す（queue_lengthなどはすべてのプロセスの合計）"""
+        try:
+            counts = self.queue.counts()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to count durable jobs: {str(e)}")
+            counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+            capacity = elapsed * self.max_workers
+            active = len(self._running_jobs)
+            return {
+                "backend": "sqlite",
+                "owner": self.owner,
+                "running": self._running,
+                "workers": self.max_workers,
+                "active_workers": active,
+                "utilization": round(active / self.max_workers, 3),
+                "average_utilization": round(self._busy_seconds / capacity, 3) if capacity else 0.0,
+                "queue_length": counts[QUEUED],
+                "queue_max_size": self.max_queue_size,
+                "leased": counts[LEASED],
+                "dead_letters": counts[FAILED],
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "retried": self._retried,
+                "rejected": self._rejected,
+                "duplicates": self._duplicates,
+                "released": self._released,
+                "recovered": self._recovered,
+                "lease_seconds": self.queue.lease_seconds,
+                "max_attempts": self.queue.max_attempts
+            }
+
+    def _worker_loop(self) -> None:
+        """キューからジョブを取り出して実行する（ジョブがない場合は追加されるか一定時間が経つまで待つ）"""
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.owner)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to claim job: {str(e)}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval_seconds)
+                self._wake.clear()
+                continue
+            self._run(job)
+        self.queue.close()
+
+    def _run(self, job: Job) -> None:
+        """ジョブを実行し、結果をキューに記録する"""
+        with self._lock:
+            self._running_jobs[job.id] = job
+            self._job_workers[job.id] = threading.current_thread()
+        started = time.monotonic()
+        try:
+            handler = self._handlers.get(job.kind)
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            handler(job.payload, job)
+            self.queue.complete(self.owner, job)
+            with self._lock:
+                self._completed += 1
+        except RetryableJobError as e:
+            delay = self.queue.fail(self.owner, job, str(e), retry=True)
+            with self._lock:
+                if delay is None:
+                    self._failed += 1
+                else:
+                    self._retried += 1
+            if delay is None:
+                logger.error(f"Job failed after {job.attempts} attempts ({job.name}): {str(e)}")
+            else:
+                logger.warning(f"Job will be retried in {delay:.1f}s (attempt {job.attempts}/{job.max_attempts}, {job.name}): {str(e)}")
+        except Exception as e:
+            logger.error(f"Job failed ({job.name}): {str(e)}")
+            self.queue.fail(self.owner, job, str(e), retry=False)
+            with self._lock:
+                self._failed += 1
+        finally:
+            with self._lock:
+                self._running_jobs.pop(job.id, None)
+                self._job_workers.pop(job.id, None)
+                self._busy_seconds += time.monotonic() - started
+                finished_after_shutdown = not self._running and not self._running_jobs
+            if finished_after_shutdown:
+                # 停止後に最後のジョブが終わった場合はリースの延長も止める
+                self._heartbeat_stop.set()
+
+    def _heartbeat_loop(self) -> None:
+        """実行中のジョブのリースを延長し、保持期間が過ぎたジョブを削除する"""
+        interval = max(self.queue.lease_seconds / 3, 0.1)
+        while not self._heartbeat_stop.wait(interval):
+            with self._lock:
+                job_ids = list(self._running_jobs)
+            try:
+                self.queue.extend(self.owner, job_ids)
+                self.queue.purge()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to extend job leases: {str(e)}")
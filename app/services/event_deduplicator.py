@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+from app.utils.logger import logger
+
+
+class EventDeduplicator:
+    """
+    処理済みのWebhookイベントID（webhookEventId）を一定時間記録し、
+    再送された同じイベントを重い処理の前に読み飛ばすためのクラス
+    （件数の上限を超えた場合は古いものから破棄する）
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        # イベントID -> 記録した時刻（古い順）
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "accepted": 0,
+            "skipped_duplicates": 0,
+            "redeliveries": 0,
+            "redeliveries_accepted": 0,
+            "evictions": 0
+        }
+
+    def check_and_record(self, event_id: str, is_redelivery: bool = False) -> bool:
+        """
+        イベントIDを記録し、初めて受け取ったイベントかどうかを返す
+
+        Args:
+            event_id (str): webhookEventId
+            is_redelivery (bool): LINEプラットフォームからの再送かどうか（deliveryContext.isRedelivery）
+
+        Returns:
+            bool: 初めて受け取ったイベントの場合はTrue、処理済みのイベントの場合はFalse
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            if is_redelivery:
+                self._stats["redeliveries"] += 1
+
+            if event_id in self._seen:
+                self._stats["skipped_duplicates"] += 1
+                logger.info(f"Skipped duplicate webhook event: {event_id} (redelivery={is_redelivery})")
+                return False
+
+            self._seen[event_id] = now
+            self._stats["accepted"] += 1
+            if is_redelivery:
+                # 再起動などで記録が残っていない再送は処理する
+                self._stats["redeliveries_accepted"] += 1
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+                self._stats["evictions"] += 1
+            return True
+
+    def forget(self, event_id: str) -> None:
+        """
+        イベントIDの記録を取り消す（受け付けられなかったイベントを再送時に処理できるようにする）
+
+        Args:
+            event_id (str): webhookEventId
+        """
+        with self._lock:
+            self._seen.pop(event_id, None)
+
+    def _purge(self, now: float) -> None:
+        """有効期限が切れた記録を古い順に破棄する（ロック取得済みで呼ぶこと）"""
+        while self._seen:
+            event_id, recorded_at = next(iter(self._seen.items()))
+            if now - recorded_at < self.ttl_seconds:
+                break
+            self._seen.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """重複排除の状態を返す"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["tracked_events"] = len(self._seen)
+            stats["ttl_seconds"] = self.ttl_seconds
+            stats["max_entries"] = self.max_entries
+        return stats
@@ -0,0 +1,327 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+from app.services.serp_records import SearchData
+from app.utils import json_codec
+from app.utils.keywords import normalize_keyword
+from app.utils.logger import logger
+from app.utils.urls import extract_domain
+
+# 検索結果の種別と、抽出済みデータ内のキーの対応
+ITEM_TYPES = {
+    "organic": "organic_results",
+    "video": "videos",
+    "ad": "ads",
+}
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS serp_results ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " keyword TEXT NOT NULL,"
+    " normalized_keyword TEXT NOT NULL,"
+    " fetched_at REAL NOT NULL,"
+    " params TEXT NOT NULL,"
+    " raw BLOB,"
+    " extracted TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_serp_results_keyword ON serp_results (normalized_keyword, fetched_at)",
+    "CREATE INDEX IF NOT EXISTS idx_serp_results_fetched_at ON serp_results (fetched_at)",
+    "CREATE TABLE IF NOT EXISTS serp_items ("
+    " result_id INTEGER NOT NULL REFERENCES serp_results (id),"
+    " normalized_keyword TEXT NOT NULL,"
+    " fetched_at REAL NOT NULL,"
+    " result_type TEXT NOT NULL,"
+    " position INTEGER NOT NULL,"
+    " domain TEXT NOT NULL,"
+    " url TEXT NOT NULL,"
+    " title TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_serp_items_result ON serp_items (result_id)",
+    "CREATE INDEX IF NOT EXISTS idx_serp_items_keyword ON serp_items (normalized_keyword, fetched_at)",
+    "CREATE INDEX IF NOT EXISTS idx_serp_items_type ON serp_items (result_type, fetched_at)",
+    "CREATE INDEX IF NOT EXISTS idx_serp_items_domain ON serp_items (domain, fetched_at)",
+]
+
+
+class HistoryStore:
+    """
+    Zenserpから取得した検索結果（生データと抽出済みデータ）をローカルのSQLiteに蓄積するクラス
+    （書き込みはバックグラウンドスレッドでまとめて行い、呼び出し元を待たせない）
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        extractor: Callable[[Dict[str, Any]], SearchData],
+        store_raw: bool = True,
+        batch_size: int = 100,
+        flush_interval_seconds: float = 2.0,
+        queue_max_size: int = 1000
+    ):
+        self.db_path = db_path
+        self.extractor = extractor
+        self.store_raw = store_raw
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_seconds = flush_interval_seconds
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_max_size)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"recorded": 0, "dropped": 0, "failed": 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._connection()
+        for statement in _SCHEMA:
+            db.execute(statement)
+
+        self._writer = threading.Thread(target=self._writer_loop, name="history-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"SERP history store opened: {db_path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """スレッドごとのSQLite接続を取得する"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def record(self, keyword: str, params: Dict[str, Any], raw: Dict[str, Any]) -> None:
+        """
+        検索結果を書き込み待ちのキューに追加する（キューが満杯の場合は破棄してすぐに戻る）
+
+        Args:
+            keyword (str): 検索キーワード
+            params (Dict[str, Any]): 検索パラメータ
+            raw (Dict[str, Any]): Zenserp APIの検索結果
+        """
+        try:
+            self._queue.put_nowait((keyword, params, raw, time.time()))
+        except queue.Full:
+            logger.warning(f"History queue is full, dropped result for keyword: {keyword}")
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+
+    def _writer_loop(self) -> None:
+        """キューに溜まった検索結果をまとめて書き込む"""
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: List[tuple]) -> None:
+        """
+        検索結果を1つのトランザクションで書き込む
+
+        Args:
+            batch (List[tuple]): キーワード・検索パラメータ・検索結果・取得日時の組
+        """
+        db = self._connection()
+        try:
+            db.execute("BEGIN")
+            for keyword, params, raw, fetched_at in batch:
+                # 抽出処理もこのスレッドで行い、リクエスト処理の負荷を増やさない
+                extracted = self.extractor(raw)
+                normalized = normalize_keyword(keyword)
+                raw_blob = zlib.compress(json_codec.dumps_bytes(raw)) if self.store_raw else None
+                cursor = db.execute(
+                    "INSERT INTO serp_results (keyword, normalized_keyword, fetched_at, params, raw, extracted)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        keyword,
+                        normalized,
+                        fetched_at,
+                        json.dumps(params, ensure_ascii=False, sort_keys=True),
+                        raw_blob,
+                        json_codec.dumps(extracted.to_dict())
+                    )
+                )
+                db.executemany(
+                    "INSERT INTO serp_items (result_id, normalized_keyword, fetched_at, result_type, position, domain, url, title)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._item_rows(cursor.lastrowid, normalized, fetched_at, extracted)
+                )
+            db.execute("COMMIT")
+            with self._stats_lock:
+                self._stats["recorded"] += len(batch)
+        except Exception as e:
+            db.execute("ROLLBACK")
+            logger.error(f"Failed to write {len(batch)} results to history store: {str(e)}")
+            with self._stats_lock:
+                self._stats["failed"] += len(batch)
+
+    def _item_rows(self, result_id: int, normalized: str, fetched_at: float, extracted: SearchData) -> List[tuple]:
+        """抽出済みデータから検索結果1件ごとの行を作成する（順位は1始まり）"""
+        rows = []
+        for result_type, key in ITEM_TYPES.items():
+            for rank, item in enumerate(extracted.get(key) or [], start=1):
+                url = item.get("url", "")
+                rows.append((
+                    result_id,
+                    normalized,
+                    fetched_at,
+                    result_type,
+                    # 複数ページをまとめた結果は絶対順位を持つ
+                    item.get("position") or rank,
+                    extract_domain(url),
+                    url,
+                    item.get("title", "")
+                ))
+        return rows
+
+    def latest_result(self, keyword: str, include_raw: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        キーワードの最新の検索結果を取得する
+
+        Args:
+            keyword (str): 検索キーワード（正規化して検索する）
+            include_raw (bool): Zenserp APIの生データも含めるかどうか
+
+        Returns:
+            Optional[Dict[str, Any]]: 検索結果（存在しない場合はNone）
+        """
+        row = self._connection().execute(
+            "SELECT * FROM serp_results WHERE normalized_keyword = ? ORDER BY fetched_at DESC LIMIT 1",
+            (normalize_keyword(keyword),)
+        ).fetchone()
+        return self._row_to_result(row, include_raw) if row is not None else None
+
+    def results_between(
+        self,
+        start: float,
+        end: float,
+        keyword: Optional[str] = None,
+        include_raw: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        指定期間に取得した検索結果を古い順に取得する
+
+        Args:
+            start (float): 期間の開始（UNIX時間、この時刻を含む）
+            end (float): 期間の終了（UNIX時間、この時刻を含まない）
+            keyword (Optional[str]): 指定した場合はそのキーワードだけに絞り込む
+            include_raw (bool): Zenserp APIの生データも含めるかどうか
+
+        Returns:
+            List[Dict[str, Any]]: 検索結果
+        """
+        query = "SELECT * FROM serp_results WHERE fetched_at >= ? AND fetched_at < ?"
+        args: List[Any] = [start, end]
+        if keyword is not None:
+            query += " AND normalized_keyword = ?"
+            args.append(normalize_keyword(keyword))
+        query += " ORDER BY fetched_at"
+        return [self._row_to_result(row, include_raw) for row in self._connection().execute(query, args)]
+
+    def items_between(
+        self,
+        start: float,
+        end: float,
+        result_type: Optional[str] = None,
+        domain: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        指定期間の検索結果1件ごとの行（順位・ドメイン・URL）を取得する
+
+        Args:
+            start (float): 期間の開始（UNIX時間、この時刻を含む）
+            end (float): 期間の終了（UNIX時間、この時刻を含まない）
+            result_type (Optional[str]): organic / video / ad で絞り込む
+            domain (Optional[str]): ドメインで絞り込む
+
+        Returns:
+            List[Dict[str, Any]]: 検索結果1件ごとの行
+        """
+        query = (
+            "SELECT result_id, normalized_keyword, fetched_at, result_type, position, domain, url, title"
+            " FROM serp_items WHERE fetched_at >= ? AND fetched_at < ?"
+        )
+        args: List[Any] = [start, end]
+        if result_type is not None:
+            query += " AND result_type = ?"
+            args.append(result_type)
+        if domain is not None:
+            query += " AND domain = ?"
+            args.append(domain.lower())
+        return [dict(row) for row in self._connection().execute(query, args)]
+
+    def latest_items(
+        self,
+        start: float,
+        end: float,
+        result_type: str = "organic",
+        keywords: Optional[List[str]] = None
+    ) -> List[tuple]:
+        """
+        指定期間内の各キーワードの最新の検索結果について、1件ごとの行を取得する
+
+        Args:
+            start (float): 期間の開始（UNIX時間、この時刻を含む）
+            end (float): 期間の終了（UNIX時間、この時刻を含まない）
+            result_type (str): organic / video / ad
+            keywords (Optional[List[str]]): 指定した場合はそのキーワードだけに絞り込む
+
+        Returns:
+            List[tuple]: (正規化キーワード, 順位, ドメイン, URL) の組
+        """
+        query = (
+            "SELECT i.normalized_keyword, i.position, i.domain, i.url FROM serp_items i"
+            " JOIN (SELECT MAX(id) AS id FROM serp_results WHERE fetched_at >= ? AND fetched_at < ?"
+        )
+        args: List[Any] = [start, end]
+        if keywords:
+            normalized = [normalize_keyword(keyword) for keyword in keywords]
+            query += f" AND normalized_keyword IN ({', '.join('?' * len(normalized))})"
+            args.extend(normalized)
+        query += " GROUP BY normalized_keyword) latest ON i.result_id = latest.id WHERE i.result_type = ?"
+        args.append(result_type)
+        return [tuple(row) for row in self._connection().execute(query, args)]
+
+    def _row_to_result(self, row: sqlite3.Row, include_raw: bool) -> Dict[str, Any]:
+        """serp_resultsの行を辞書に変換する"""
+        result = {
+            "id": row["id"],
+            "keyword": row["keyword"],
+            "fetched_at": row["fetched_at"],
+            "params": json.loads(row["params"]),
+            "extracted": json_codec.loads(row["extracted"])
+        }
+        if include_raw:
+            result["raw"] = json_codec.loads(zlib.decompress(row["raw"])) if row["raw"] is not None else None
+        return result
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        キューに残っている検索結果を書き込んでから停止する
+
+        Args:
+            timeout (Optional[float]): 書き込み完了を待つ最大秒数
+        """
+        self._queue.put(None)
+        self._writer.join(timeout)
+        logger.info("SERP history store stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        """書き込み件数などの統計情報を返す"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
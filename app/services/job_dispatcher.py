@@ -0,0 +1,184 @@
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+from app.utils.logger import logger
+
+
+class JobDispatcher:
+    """
+    キーワード処理ジョブをバックグラウンドのワーカープールで実行するクラス
+    （キー（ユーザー・グループ）ごとに待ち行列を分け、実行中のジョブが少ないキーから順番に取り出す）
+    """
+
+    def __init__(self, max_workers: int, max_queue_size: int):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(1, max_queue_size)
+        # キー -> 実行待ちのジョブ（キーを指定しないジョブは同じキー""にまとめる）
+        self._lanes: Dict[str, Deque[tuple]] = {}
+        # キー -> 実行中のジョブ数
+        self._lane_active: Dict[str, int] = {}
+        # キー -> 最後にジョブを取り出した順番（待機中・実行中のジョブがあるキーだけ保持する）
+        self._lane_served: Dict[str, int] = {}
+        self._queued = 0
+        self._sequence = itertools.count(1)
+        self._dispatch_sequence = itertools.count(1)
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+        self._started_at: Optional[float] = None
+        self._running = False
+
+    def start(self) -> None:
+        """ワーカースレッドを起動する"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._started_at = time.monotonic()
+
+        for i in range(self.max_workers):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"keyword-worker-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+        logger.info(f"Job dispatcher started with {self.max_workers} workers (queue size: {self.max_queue_size})")
+
+    def submit(self, func: Callable[..., Any], *args: Any, name: str = "", key: str = "") -> bool:
+        """
+        ジョブをキューに追加する
+
+        Args:
+            func (Callable): 実行する関数
+            *args: 関数に渡す引数
+            name (str): ログ出力用のジョブ名
+            key (str): 公平に順番を回す単位（ユーザー・グループ）のキー
+
+        Returns:
+            bool: キューに追加できた場合はTrue、キューが満杯または停止中の場合はFalse
+        """
+        with self._lock:
+            if not self._running:
+                logger.warning(f"Job dispatcher is not running, rejected job: {name}")
+                self._rejected += 1
+                return False
+            if self._queued >= self.max_queue_size:
+                logger.warning(f"Job queue is full, rejected job: {name}")
+                self._rejected += 1
+                return False
+
+            self._lanes.setdefault(key, deque()).append((next(self._sequence), func, args, name))
+            self._queued += 1
+            self._submitted += 1
+            self._not_empty.notify()
+        return True
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        ワーカーを停止する（キューに残っているジョブは処理してから停止する）
+
+        Args:
+            timeout (Optional[float]): 各ワーカーの終了を待つ最大秒数
+        """
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            # 待機中のワーカーを起こし、残りのジョブがなくなったら終了させる
+            self._not_empty.notify_all()
+
+        for worker in self._workers:
+            worker.join(timeout)
+
+        self._workers.clear()
+        logger.info("Job dispatcher stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        """キューとワーカーの状態を返す"""
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+            capacity = elapsed * self.max_workers
+            return {
+                "backend": "memory",
+                "running": self._running,
+                "workers": self.max_workers,
+                "active_workers": self._active,
+                "utilization": round(self._active / self.max_workers, 3),
+                "average_utilization": round(self._busy_seconds / capacity, 3) if capacity else 0.0,
+                "queue_length": self._queued,
+                "queue_max_size": self.max_queue_size,
+                "lanes": len(self._lanes),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected
+            }
+
+    def _next_job(self) -> Optional[tuple]:
+        """
+        次に実行するジョブを取り出す（ジョブがない場合は追加されるまで待つ）
+        実行中のジョブが最も少ないキーを選び、同数の場合は最後に取り出してから最も時間が経ったキーを優先する
+
+        Returns:
+            Optional[tuple]: (キー, 関数, 引数, ジョブ名)。停止後にジョブがなくなった場合はNone
+        """
+        with self._not_empty:
+            while not self._queued:
+                if not self._running:
+                    return None
+                self._not_empty.wait()
+
+            key = min(
+                self._lanes,
+                key=lambda k: (self._lane_active.get(k, 0), self._lane_served.get(k, 0), self._lanes[k][0][0])
+            )
+            lane = self._lanes[key]
+            _, func, args, name = lane.popleft()
+            if not lane:
+                del self._lanes[key]
+            self._queued -= 1
+            self._lane_active[key] = self._lane_active.get(key, 0) + 1
+            self._lane_served[key] = next(self._dispatch_sequence)
+            self._active += 1
+            return key, func, args, name
+
+    def _worker_loop(self) -> None:
+        """キューからジョブを取り出して実行する"""
+        while True:
+            item = self._next_job()
+            if item is None:
+                break
+
+            key, func, args, name = item
+            started = time.monotonic()
+
+            try:
+                func(*args)
+                with self._lock:
+                    self._completed += 1
+            except Exception as e:
+                logger.error(f"Job failed ({name}): {str(e)}")
+                with self._lock:
+                    self._failed += 1
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._busy_seconds += time.monotonic() - started
+                    remaining = self._lane_active[key] - 1
+                    if remaining:
+                        self._lane_active[key] = remaining
+                    else:
+                        del self._lane_active[key]
+                        if key not in self._lanes:
+                            del self._lane_served[key]
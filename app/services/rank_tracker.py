@@ -0,0 +1,407 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.services.rate_limiter import QuotaExceededError, get_quota_budget
+from app.services.serp_records import SearchData
+from app.utils.keywords import normalize_keyword
+from app.utils.logger import logger
+from app.utils.urls import normalize_url
+
+# 順位変化シートのヘッダー行
+TRACKING_HEADERS = ["実行日時", "キーワード", "変化の種類", "URL・項目", "前回順位", "今回順位", "変化"]
+
+# 出現の有無を比較するSERP機能（抽出済みデータのキーと表示名）
+SERP_FEATURES = {
+    "featured_snippets": "強調スニペット",
+    "knowledge_panel": "ナレッジパネル",
+    "local_pack": "ローカルパック",
+    "related_questions": "関連する質問",
+    "videos": "動画",
+    "ads": "広告",
+    "rich_results": "リッチリザルト",
+}
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS tracked_keywords ("
+    " normalized_keyword TEXT PRIMARY KEY,"
+    " keyword TEXT NOT NULL,"
+    " interval_seconds INTEGER NOT NULL,"
+    " user_id TEXT,"
+    " created_at REAL NOT NULL,"
+    " next_run_at REAL NOT NULL,"
+    " last_run_at REAL,"
+    " snapshot TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_tracked_keywords_next_run_at ON tracked_keywords (next_run_at)",
+]
+
+
+def build_snapshot(search_data: SearchData) -> Dict[str, Any]:
+    """
+    差分の比較に使う部分だけを抽出済みの検索結果から取り出す
+
+    Args:
+        search_data (SearchData): 抽出済みの検索結果データ
+
+    Returns:
+        Dict[str, Any]: 自然検索のURL（順位順）と出現しているSERP機能
+    """
+    urls = []
+    seen = set()
+    for result in search_data.get("organic_results") or []:
+        url = result.get("url", "")
+        key = normalize_url(url)
+        if not url or key in seen:
+            continue
+        seen.add(key)
+        urls.append(url)
+    features = sorted(key for key in SERP_FEATURES if search_data.has_feature(key))
+    return {"organic": urls, "features": features}
+
+
+def diff_snapshots(previous: Dict[str, Any], current: Dict[str, Any]) -> List[Tuple[str, str, str, str, str]]:
+    """
+    前回と今回の検索結果の差分を求める
+
+    Args:
+        previous (Dict[str, Any]): 前回のスナップショット
+        current (Dict[str, Any]): 今回のスナップショット
+
+    Returns:
+        List[Tuple[str, str, str, str, str]]: 変化の種類、URL・項目、前回順位、今回順位、変化
+    """
+    previous_ranks = {normalize_url(url): rank for rank, url in enumerate(previous.get("organic", []), start=1)}
+    current_ranks = {normalize_url(url): rank for rank, url in enumerate(current.get("organic", []), start=1)}
+
+    deltas = []
+    for rank, url in enumerate(current.get("organic", []), start=1):
+        old_rank = previous_ranks.get(normalize_url(url))
+        if old_rank is None:
+            deltas.append(("新規", url, "", str(rank), ""))
+        elif old_rank != rank:
+            kind = "上昇" if rank < old_rank else "下降"
+            deltas.append((kind, url, str(old_rank), str(rank), f"{old_rank - rank:+d}"))
+
+    for rank, url in enumerate(previous.get("organic", []), start=1):
+        if normalize_url(url) not in current_ranks:
+            deltas.append(("圏外", url, str(rank), "", ""))
+
+    previous_features = set(previous.get("features", []))
+    current_features = set(current.get("features", []))
+    for key in sorted(current_features - previous_features):
+        deltas.append(("機能出現", SERP_FEATURES[key], "", "", ""))
+    for key in sorted(previous_features - current_features):
+        deltas.append(("機能消失", SERP_FEATURES[key], "", "", ""))
+    return deltas
+
+
+def summarize_deltas(deltas: List[Tuple[str, str, str, str, str]]) -> str:
+    """差分の種類ごとの件数を1行の文字列にまとめる"""
+    counts: Dict[str, int] = {}
+    for delta in deltas:
+        counts[delta[0]] = counts.get(delta[0], 0) + 1
+    if not counts:
+        return "変化なし"
+    return " / ".join(f"{kind}{count}件" for kind, count in counts.items())
+
+
+class RankTracker:
+    """
+    登録したキーワードを一定間隔で再取得し、前回からの変化だけをスプレッドシートに追記するクラス
+    （スケジューラーはプロセス内のバックグラウンドスレッドで動作する。複数のプロセスで同じデータベースを共有した場合は、
+    期限の来たキーワードを取り出したプロセスだけが再取得する）
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        search: Callable[[str], SearchData],
+        sheets_service,
+        sheet_name: str,
+        notify: Optional[Callable[[str, str], None]] = None,
+        check_interval_seconds: float = 60.0,
+        max_keywords_per_run: int = 50,
+        max_concurrency: int = 2,
+        quota_reserve: int = 0,
+        retry_delay_seconds: float = 3600.0,
+        pages_per_keyword: int = 1
+    ):
+        self.search = search
+        self.sheets_service = sheets_service
+        self.sheet_name = sheet_name
+        self.notify = notify
+        self.check_interval_seconds = check_interval_seconds
+        self.max_keywords_per_run = max(1, max_keywords_per_run)
+        self.max_concurrency = max(1, max_concurrency)
+        self.quota_reserve = quota_reserve
+        self.retry_delay_seconds = retry_delay_seconds
+        # 1キーワードの再取得で使うAPIリクエスト数（複数ページを取得する場合はページ数）
+        self.pages_per_keyword = max(1, pages_per_keyword)
+        self.quota = get_quota_budget()
+
+        self._lock = threading.Lock()
+        # 手動実行とスケジューラーの実行が重ならないようにする
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"runs": 0, "refreshed": 0, "failed": 0, "delta_rows": 0, "skipped_for_quota": 0}
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.row_factory = sqlite3.Row
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        logger.info(f"Rank tracking registry opened: {db_path}")
+
+    def start(self) -> None:
+        """スケジューラーを開始する"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._scheduler_loop, name="rank-tracker", daemon=True)
+        self._thread.start()
+        logger.info(f"Rank tracking scheduler started (check interval: {self.check_interval_seconds}s)")
+
+    def _scheduler_loop(self) -> None:
+        """一定間隔で期限の来たキーワードを再取得する"""
+        while not self._stop.wait(self.check_interval_seconds):
+            try:
+                self.run_due()
+            except Exception as e:
+                logger.error(f"Rank tracking run failed: {str(e)}")
+
+    def add(self, keywords: List[str], interval_seconds: int, user_id: Optional[str] = None) -> int:
+        """
+        キーワードを追跡対象に登録する（登録済みの場合は間隔と通知先を更新する）
+
+        Args:
+            keywords (List[str]): キーワード
+            interval_seconds (int): 再取得の間隔（秒）
+            user_id (Optional[str]): 変化を通知するLINEユーザーID
+
+        Returns:
+            int: 新しく登録したキーワードの数
+        """
+        now = time.time()
+        added = 0
+        with self._lock:
+            for keyword in keywords:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO tracked_keywords"
+                    " (normalized_keyword, keyword, interval_seconds, user_id, created_at, next_run_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (normalize_keyword(keyword), keyword, interval_seconds, user_id, now, now)
+                )
+                if cursor.rowcount:
+                    added += 1
+                else:
+                    self._db.execute(
+                        "UPDATE tracked_keywords SET interval_seconds = ?, user_id = COALESCE(?, user_id)"
+                        " WHERE normalized_keyword = ?",
+                        (interval_seconds, user_id, normalize_keyword(keyword))
+                    )
+        logger.info(f"Tracking {len(keywords)} keywords ({added} new, interval: {interval_seconds}s)")
+        return added
+
+    def remove(self, keywords: List[str]) -> int:
+        """
+        キーワードを追跡対象から外す
+
+        Args:
+            keywords (List[str]): キーワード
+
+        Returns:
+            int: 外したキーワードの数
+        """
+        with self._lock:
+            removed = 0
+            for keyword in keywords:
+                cursor = self._db.execute(
+                    "DELETE FROM tracked_keywords WHERE normalized_keyword = ?",
+                    (normalize_keyword(keyword),)
+                )
+                removed += cursor.rowcount
+        logger.info(f"Stopped tracking {removed} keywords")
+        return removed
+
+    def tracked(self) -> List[Dict[str, Any]]:
+        """追跡中のキーワードの一覧を返す（次回の実行が近い順）"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT keyword, interval_seconds, user_id, next_run_at, last_run_at"
+                " FROM tracked_keywords ORDER BY next_run_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def run_due(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        期限の来たキーワードを再取得し、前回からの変化をスプレッドシートに追記する
+
+        Args:
+            now (Optional[float]): 基準時刻（UNIX時間、省略時は現在時刻）
+
+        Returns:
+            Dict[str, Any]: 実行結果
+        """
+        with self._run_lock:
+            now = time.time() if now is None else now
+            limit = self.max_keywords_per_run
+            # 月間の利用枠が残り少ない場合は、手動の検索のための分を残して実行数を抑える
+            remaining = self.quota.remaining()
+            if remaining is not None:
+                limit = min(limit, max(remaining - self.quota_reserve, 0) // self.pages_per_keyword)
+            due, total = self._claim_due(now, limit)
+            if total > len(due):
+                with self._lock:
+                    self._stats["skipped_for_quota"] += total - len(due)
+                logger.warning(f"Rank tracking limited by quota budget: {limit}/{total} due keywords")
+            if not due:
+                return {"refreshed": 0, "failed": 0, "delta_rows": 0}
+
+            logger.info(f"Refreshing {len(due)} tracked keywords")
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="rank-tracker") as executor:
+                outcomes = list(executor.map(self._refresh, due))
+
+            return self._record(now, due, outcomes)
+
+    def _claim_due(self, now: float, limit: int) -> Tuple[List[sqlite3.Row], int]:
+        """
+        期限の来たキーワードを取り出し、他のプロセスが同じキーワードを再取得しないように次回の実行時刻を先に進める
+        （uvicornのワーカーごとにスケジューラーが動作するため、書き込みロックを取得してから選んで更新する。
+        再取得の途中でプロセスが停止した場合は、失敗した場合と同じ時間が経ってから再取得する）
+
+        Args:
+            now (float): 基準時刻（UNIX時間）
+            limit (int): 取り出す上限（月間の利用枠で抑えた数）
+
+        Returns:
+            Tuple[List[sqlite3.Row], int]: 取り出したキーワードの行と、期限の来たキーワードの数
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                due = self._db.execute(
+                    "SELECT normalized_keyword, keyword, interval_seconds, user_id, snapshot"
+                    " FROM tracked_keywords WHERE next_run_at <= ? ORDER BY next_run_at LIMIT ?",
+                    (now, self.max_keywords_per_run)
+                ).fetchall()
+                claimed = due[:limit]
+                for row in claimed:
+                    self._db.execute(
+                        "UPDATE tracked_keywords SET next_run_at = ? WHERE normalized_keyword = ?",
+                        (now + min(self.retry_delay_seconds, row["interval_seconds"]), row["normalized_keyword"])
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return claimed, len(due)
+
+    def _refresh(self, row: sqlite3.Row) -> Optional[Dict[str, Any]]:
+        """キーワードを再取得してスナップショットを返す（失敗した場合はNone）"""
+        try:
+            search_data = self.search(row["keyword"])
+            # 一部のページが欠けた結果と比べると大量の「圏外」が出るため、失敗として扱う
+            if search_data.get("deep_serp", {}).get("partial"):
+                raise Exception("一部のページの取得に失敗しました")
+            return build_snapshot(search_data)
+        except QuotaExceededError as e:
+            logger.warning(f"Rank tracking skipped for keyword {row['keyword']}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Rank tracking failed for keyword {row['keyword']}: {str(e)}")
+        return None
+
+    def _record(
+        self,
+        now: float,
+        due: List[sqlite3.Row],
+        outcomes: List[Optional[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        変化と要約の行をまとめて1回で追記し、成功した場合のみスナップショットを更新する
+
+        Args:
+            now (float): 実行時刻（UNIX時間）
+            due (List[sqlite3.Row]): 再取得したキーワードの行
+            outcomes (List[Optional[Dict[str, Any]]]): 今回のスナップショット（失敗した場合はNone）
+
+        Returns:
+            Dict[str, Any]: 実行結果
+        """
+        run_at = datetime.datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        rows: List[List[str]] = []
+        summaries: Dict[str, List[str]] = {}
+        succeeded = []
+        failed = []
+
+        for row, snapshot in zip(due, outcomes):
+            if snapshot is None:
+                failed.append(row)
+                continue
+            succeeded.append((row, snapshot))
+            keyword = row["keyword"]
+            if row["snapshot"] is None:
+                summary = f"初回の順位を記録（{len(snapshot['organic'])}件）"
+                deltas = []
+            else:
+                deltas = diff_snapshots(json.loads(row["snapshot"]), snapshot)
+                summary = summarize_deltas(deltas)
+            rows.extend([run_at, keyword, *delta] for delta in deltas)
+            rows.append([run_at, keyword, "サマリー", "", "", "", summary])
+            if deltas and row["user_id"]:
+                summaries.setdefault(row["user_id"], []).append(f"・{keyword}: {summary}")
+
+        url = None
+        if rows:
+            try:
+                url = self.sheets_service.append_rows(rows, title=self.sheet_name, header=TRACKING_HEADERS)
+            except Exception as e:
+                # 書き込めなかった分は次回に前回のスナップショットとの差分として書き込む
+                logger.error(f"Failed to write rank tracking deltas: {str(e)}")
+                failed.extend(row for row, _ in succeeded)
+                succeeded = []
+
+        with self._lock:
+            for row, snapshot in succeeded:
+                self._db.execute(
+                    "UPDATE tracked_keywords SET snapshot = ?, last_run_at = ?, next_run_at = ?"
+                    " WHERE normalized_keyword = ?",
+                    (json.dumps(snapshot, ensure_ascii=False), now, now + row["interval_seconds"], row["normalized_keyword"])
+                )
+            for row in failed:
+                self._db.execute(
+                    "UPDATE tracked_keywords SET next_run_at = ? WHERE normalized_keyword = ?",
+                    (now + min(self.retry_delay_seconds, row["interval_seconds"]), row["normalized_keyword"])
+                )
+            self._stats["runs"] += 1
+            self._stats["refreshed"] += len(succeeded)
+            self._stats["failed"] += len(failed)
+            if succeeded:
+                self._stats["delta_rows"] += len(rows)
+
+        if url is not None and self.notify is not None:
+            for user_id, lines in summaries.items():
+                self.notify(user_id, "📈 順位の変化がありました\n\n" + "\n".join(lines) + f"\n\n📊 スプレッドシート: {url}")
+
+        logger.info(f"Rank tracking run finished: {len(succeeded)} refreshed, {len(failed)} failed, {len(rows)} rows written")
+        return {"refreshed": len(succeeded), "failed": len(failed), "delta_rows": len(rows) if succeeded else 0}
+
+    def close(self) -> None:
+        """スケジューラーを停止する"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        logger.info("Rank tracking scheduler stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        """スケジューラーの状態を返す"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["tracked_keywords"] = self._db.execute("SELECT COUNT(*) FROM tracked_keywords").fetchone()[0]
+        return stats
@@ -0,0 +1,345 @@
+import datetime
+import json
+from contextlib import contextmanager
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス間のロックを使わない
+    fcntl = None
+from app.config import get_settings
+from app.utils.logger import logger
+
+
+class QuotaExceededError(Exception):
+    """月間のAPI利用上限に達した場合の例外"""
+
+
+class TokenBucket:
+    """
+    プロセス内の全呼び出し元で共有するトークンバケット方式のレート制限
+    （429を受け取った場合はレートを一時的に下げて徐々に戻す）
+    """
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = max(rate_per_second, 0.001)
+        self.burst = max(1, burst)
+        self._current_rate = self.rate
+        self._tokens = float(self.burst)
+        self._updated_at = self._clock()
+        self._blocked_until = 0.0
+        self._lock = threading.RLock()
+        self._throttled = 0
+
+    @staticmethod
+    def _clock() -> float:
+        return time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        トークンを1つ予約し、実行までに待つべき秒数を返す（ブロックしない）
+
+        Returns:
+            float: 待機が必要な秒数（0の場合はすぐに実行してよい）
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self._current_rate
+            return max(wait, self._blocked_until - now, 0.0)
+
+    def acquire(self) -> None:
+        """トークンを1つ取得する（必要な時間だけ待機する）"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """
+        待たずに使えるトークンがあれば取得する（ヘッジなど、すぐに送れない場合は送らないリクエスト用）
+
+        Args:
+            tokens (float): 取得するトークン数
+
+        Returns:
+            bool: 取得できた場合はTrue
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if self._tokens < tokens or self._blocked_until > now:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """
+        トークンを取得できるまでの秒数を返す（トークンは消費しない）
+
+        Args:
+            tokens (float): 必要なトークン数
+
+        Returns:
+            float: 待機が必要な秒数（0の場合はすぐに取得できる）
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            shortage = min(tokens, float(self.burst)) - self._tokens
+            wait = shortage / self._current_rate if shortage > 0 else 0.0
+            return max(wait, self._blocked_until - now, 0.0)
+
+    def on_success(self) -> None:
+        """リクエスト成功時に、下げていたレートを少しずつ元に戻す"""
+        with self._lock:
+            if self._current_rate < self.rate:
+                self._current_rate = min(self.rate, self._current_rate + self.rate * 0.1)
+
+    def on_throttled(self, retry_after: float) -> None:
+        """
+        429を受け取った場合にレートを半分にし、指定秒数は新しいリクエストを止める
+
+        Args:
+            retry_after (float): 次のリクエストまで待つ秒数
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._current_rate = max(self.rate / 8, self._current_rate / 2)
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            self._throttled += 1
+
+    def _refill(self, now: float) -> None:
+        """経過時間に応じてトークンを補充する（ロック取得済みで呼ぶこと）"""
+        elapsed = now - self._updated_at
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self._current_rate)
+        self._updated_at = now
+
+    def stats(self) -> Dict[str, Any]:
+        """レート制限の状態を返す"""
+        with self._lock:
+            self._refill(self._clock())
+            return {
+                "rate_per_second": self.rate,
+                "current_rate_per_second": round(self._current_rate, 3),
+                "burst": self.burst,
+                "available_tokens": round(max(self._tokens, 0.0), 3),
+                "throttled": self._throttled
+            }
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    トークンの残量をローカルのSQLiteに保存し、同じデータベースを使う全プロセスで共有するトークンバケット
+    （複数のuvicornワーカーで起動しても、Zenserp APIへのリクエストの合計を設定したレートに抑える）
+    """
+
+    def __init__(self, rate_per_second: float, burst: int, db_path: str):
+        super().__init__(rate_per_second, burst)
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS token_bucket ("
+            " name TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " current_rate REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " blocked_until REAL NOT NULL,"
+            " throttled INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO token_bucket VALUES ('zenserp', ?, ?, ?, 0, 0)",
+            (self._tokens, self._current_rate, self._updated_at)
+        )
+        logger.info(f"Shared rate limit state opened: {db_path}")
+
+    @staticmethod
+    def _clock() -> float:
+        # プロセス間で比較できる時刻を使う
+        return time.time()
+
+    def _shared(self, func):
+        """保存済みの状態を読み込んでから処理し、結果を保存する（他のプロセスとは書き込みロックで直列化する）"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, current_rate, updated_at, blocked_until, throttled = self._db.execute(
+                    "SELECT tokens, current_rate, updated_at, blocked_until, throttled FROM token_bucket WHERE name = 'zenserp'"
+                ).fetchone()
+                self._tokens = tokens
+                self._current_rate = current_rate
+                self._updated_at = updated_at
+                self._blocked_until = blocked_until
+                self._throttled = throttled
+                result = func()
+                self._db.execute(
+                    "UPDATE token_bucket SET tokens = ?, current_rate = ?, updated_at = ?, blocked_until = ?, throttled = ?"
+                    " WHERE name = 'zenserp'",
+                    (self._tokens, self._current_rate, self._updated_at, self._blocked_until, self._throttled)
+                )
+                self._db.execute("COMMIT")
+                return result
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def reserve(self) -> float:
+        return self._shared(super().reserve)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        return self._shared(lambda: super(SharedTokenBucket, self).try_acquire(tokens))
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        return self._shared(lambda: super(SharedTokenBucket, self).wait_time(tokens))
+
+    def on_success(self) -> None:
+        self._shared(super().on_success)
+
+    def on_throttled(self, retry_after: float) -> None:
+        self._shared(lambda: super(SharedTokenBucket, self).on_throttled(retry_after))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._shared(super().stats)
+        stats["shared"] = True
+        return stats
+
+
+class QuotaBudget:
+    """月間のAPI利用回数を記録し、上限に達したら以降の呼び出しを拒否するクラス"""
+
+    def __init__(self, monthly_limit: int, state_path: str = ""):
+        self.monthly_limit = monthly_limit
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._month = self._current_month()
+        self._used = 0
+        self._load()
+
+    @staticmethod
+    def _current_month() -> str:
+        return datetime.datetime.now().strftime("%Y-%m")
+
+    def _load(self) -> None:
+        """保存済みの利用回数を読み込む"""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("month") == self._month:
+                self._used = int(state.get("used", 0))
+        except Exception as e:
+            logger.error(f"Failed to load quota state: {str(e)}")
+
+    def _save(self) -> None:
+        """利用回数をファイルに保存する（ロック取得済みで呼ぶこと）"""
+        if not self.state_path:
+            return
+        try:
+            directory = os.path.dirname(self.state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"month": self._month, "used": self._used}, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"Failed to save quota state: {str(e)}")
+
+    @contextmanager
+    def _shared_state(self) -> Iterator[None]:
+        """
+        他のプロセスと排他してから保存済みの利用回数を読み込み直す（ロック取得済みで呼ぶこと）
+        （複数のuvicornワーカーが同じファイルを上書きして利用回数を取りこぼさないようにする）
+        """
+        if not self.state_path or fcntl is None:
+            yield
+            return
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.state_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._roll_month()
+                self._load()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _roll_month(self) -> None:
+        """月が変わっていれば利用回数をリセットする（ロック取得済みで呼ぶこと）"""
+        month = self._current_month()
+        if month != self._month:
+            self._month = month
+            self._used = 0
+
+    def consume(self) -> None:
+        """
+        利用回数を1つ消費する
+
+        Raises:
+            QuotaExceededError: 月間の上限に達している場合
+        """
+        with self._lock, self._shared_state():
+            self._roll_month()
+            if self.monthly_limit > 0 and self._used >= self.monthly_limit:
+                logger.warning(f"Zenserp monthly quota exhausted ({self._used}/{self.monthly_limit})")
+                raise QuotaExceededError(
+                    f"今月の検索API利用上限（{self.monthly_limit}回）に達しました。来月まで新しい検索はできません。"
+                )
+            self._used += 1
+            self._save()
+
+    def refund(self) -> None:
+        """APIにカウントされなかった呼び出しの分を戻す"""
+        with self._lock, self._shared_state():
+            self._roll_month()
+            if self._used > 0:
+                self._used -= 1
+                self._save()
+
+    def remaining(self) -> Optional[int]:
+        """今月の残り回数を返す（上限なしの場合はNone）"""
+        with self._lock, self._shared_state():
+            self._roll_month()
+            if self.monthly_limit <= 0:
+                return None
+            return max(self.monthly_limit - self._used, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """利用状況を返す"""
+        remaining = self.remaining()
+        with self._lock:
+            return {
+                "month": self._month,
+                "used": self._used,
+                "monthly_limit": self.monthly_limit,
+                "remaining": remaining
+            }
+
+
+@lru_cache()
+def get_rate_limiter() -> TokenBucket:
+    """プロセス全体で共有するZenserp APIのレート制限を取得する（保存先を指定した場合は全プロセスで共有する）"""
+    settings = get_settings()
+    if settings.ZENSERP_RATE_LIMIT_DB_PATH:
+        return SharedTokenBucket(settings.ZENSERP_RATE_PER_SECOND, settings.ZENSERP_BURST, settings.ZENSERP_RATE_LIMIT_DB_PATH)
+    return TokenBucket(settings.ZENSERP_RATE_PER_SECOND, settings.ZENSERP_BURST)
+
+
+@lru_cache()
+def get_quota_budget() -> QuotaBudget:
+    """プロセス全体で共有するZenserp APIの月間利用枠を取得する"""
+    settings = get_settings()
+    return QuotaBudget(settings.ZENSERP_MONTHLY_QUOTA, settings.ZENSERP_QUOTA_STATE_PATH)
@@ -0,0 +1,412 @@
+import asyncio
+import contextvars
+import datetime
+import email.utils
+import math
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, TypeVar
+
+from app.config import get_settings
+from app.utils.logger import logger
+from app.utils.metrics import (
+    CIRCUIT_BREAKER_REJECTIONS,
+    CIRCUIT_BREAKER_STATE,
+    HEDGED_REQUESTS,
+    UPSTREAM_RETRIES,
+    classify_error
+)
+
+T = TypeVar("T")
+
+# サーキットブレーカーの状態
+CLOSED = "closed"          # 通常どおり呼び出す
+OPEN = "open"              # 呼び出さずにすぐ失敗させる
+HALF_OPEN = "half_open"    # 回復したかを確かめるため、1件だけ試しに呼び出す
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# 遮断の判定で失敗として数えるHTTPステータス・エラーの種類（429はレート制限で調整するため含めない）
+FAILURE_REASONS = frozenset({"timeout", "connection", "408", "500", "502", "503", "504"})
+
+# 一時的なエラーとみなすHTTPステータス・エラーの種類（再試行すれば成功する可能性がある）
+TRANSIENT_REASONS = FAILURE_REASONS | {"429"}
+
+# 外部サービスの名前とユーザー向けの表示名
+UPSTREAM_LABELS = {
+    "zenserp": "検索API",
+    "sheets": "Googleスプレッドシート",
+}
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが外部サービスの呼び出しを遮断している場合の例外"""
+
+    def __init__(self, upstream: str, retry_in: float):
+        label = UPSTREAM_LABELS.get(upstream, upstream)
+        super().__init__(
+            f"{label}が一時的に利用できません。{max(1, math.ceil(retry_in))}秒ほど経ってから再度お試しください。"
+        )
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    一時的なエラー（タイムアウト・接続エラー・429・5xx・遮断中）かどうかを判定する
+    （ユーザー向けのメッセージに変換された例外は、元の例外までたどって判定する）
+
+    Args:
+        error (BaseException): 発生した例外
+
+    Returns:
+        bool: 再試行すれば成功する可能性がある場合はTrue
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, CircuitOpenError) or classify_error(current) in TRANSIENT_REASONS:
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+class CircuitBreaker:
+    """
+    外部サービスごとのサーキットブレーカー
+    （連続して失敗・遅延した場合は一定時間呼び出しを遮断し、その後1件ずつ試して回復を確かめる）
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, slow_call_seconds: float = 0.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = max(reset_seconds, 0.0)
+        self.slow_call_seconds = slow_call_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._next_probe_at = 0.0
+        self._last_failure: Optional[str] = None
+        self._failures = 0
+        self._slow_calls = 0
+        self._rejected = 0
+        self._opened = 0
+        CIRCUIT_BREAKER_STATE.set(name, value=_STATE_VALUES[CLOSED])
+
+    @staticmethod
+    def _clock() -> float:
+        return time.monotonic()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def before_call(self) -> None:
+        """
+        呼び出してよいかを確認する（遮断中は呼び出さずに例外を送出する）
+
+        Raises:
+            CircuitOpenError: 遮断中、または回復の確認中に他の呼び出しが試行している場合
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = self._clock()
+            if self._state == OPEN:
+                if now < self._opened_at + self.reset_seconds:
+                    self._reject(self._opened_at + self.reset_seconds - now)
+                self._transition(HALF_OPEN)
+                self._next_probe_at = now
+            if now < self._next_probe_at:
+                self._reject(self._next_probe_at - now)
+            # 試す呼び出しは同時に1件だけにする（結果が記録されないまま期限が過ぎた場合は次の1件を許可する）
+            self._next_probe_at = now + self.reset_seconds
+
+    def allows_retry(self) -> bool:
+        """呼び出しに失敗した後、続けて再試行・ヘッジしてよいか（遮断中・回復の確認中は再試行しない）"""
+        with self._lock:
+            return self._state == CLOSED
+
+    def record(self, reason: Optional[str], elapsed: float) -> None:
+        """
+        呼び出しの結果を記録する
+
+        Args:
+            reason (Optional[str]): 失敗した場合はHTTPステータスまたはエラーの種類（classify_errorの値）、成功した場合はNone
+            elapsed (float): 呼び出しにかかった秒数（slow_call_secondsを超えた場合は失敗として数える）
+        """
+        failed = reason in FAILURE_REASONS
+        slow = not failed and self.slow_call_seconds > 0 and elapsed > self.slow_call_seconds
+        with self._lock:
+            if not (failed or slow):
+                # 認証エラーなどの4xxは外部サービス自体は応答しているため、成功として扱う
+                self._consecutive_failures = 0
+                if self._state == HALF_OPEN:
+                    self._transition(CLOSED)
+                return
+
+            self._failures += 1
+            self._consecutive_failures += 1
+            self._last_failure = reason if failed else "slow"
+            if slow:
+                self._slow_calls += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._opened_at = self._clock()
+                self._opened += 1
+                self._transition(OPEN)
+
+    def _reject(self, retry_in: float) -> None:
+        """呼び出しを遮断する（ロック取得済みで呼ぶこと）"""
+        self._rejected += 1
+        CIRCUIT_BREAKER_REJECTIONS.inc(self.name)
+        raise CircuitOpenError(self.name, retry_in)
+
+    def _transition(self, state: str) -> None:
+        """状態を変更する（ロック取得済みで呼ぶこと）"""
+        if state == self._state:
+            return
+        log = logger.info if state == CLOSED else logger.warning
+        log(
+            f"Circuit breaker for {self.name} changed from {self._state} to {state} "
+            f"(consecutive failures: {self._consecutive_failures}, last failure: {self._last_failure})"
+        )
+        self._state = state
+        CIRCUIT_BREAKER_STATE.set(self.name, value=_STATE_VALUES[state])
+
+    def stats(self) -> Dict[str, Any]:
+        """状態と統計情報を返す"""
+        with self._lock:
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = round(max(self._opened_at + self.reset_seconds - self._clock(), 0.0), 3)
+            return {
+                "state": self._state,
+                "retry_in_seconds": retry_in,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "last_failure": self._last_failure,
+                "failures": self._failures,
+                "slow_calls": self._slow_calls,
+                "slow_call_seconds": self.slow_call_seconds,
+                "rejected": self._rejected,
+                "opened": self._opened
+            }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-Afterヘッダーの値（秒数またはHTTP日付）を待機秒数に変換する
+
+    Args:
+        value (Optional[str]): Retry-Afterヘッダーの値
+
+    Returns:
+        Optional[float]: 待機秒数（ヘッダーがない・解釈できない場合はNone）
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_of(error: BaseException) -> Optional[float]:
+    """例外に含まれるレスポンスのRetry-Afterを待機秒数に変換する（ない場合はNone）"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    return parse_retry_after(headers.get("Retry-After")) if headers is not None else None
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float, retry_after: Optional[float] = None) -> Optional[float]:
+    """
+    再試行までの待機秒数を求める（再試行ごとに倍増させ、複数の呼び出し元が同時に再試行しないようにばらつかせる）
+
+    Args:
+        attempt (int): これまでの再試行回数
+        base_seconds (float): 最初の再試行までの待機秒数
+        max_seconds (float): 待機秒数の上限
+        retry_after (Optional[float]): 外部サービスが指定した待機秒数（Retry-After）
+
+    Returns:
+        Optional[float]: 待機秒数（Retry-Afterが上限を超える場合は、その場では再試行しないためNone）
+    """
+    backoff = min(max_seconds, base_seconds * 2 ** attempt)
+    jitter = backoff / 2 + random.uniform(0, backoff / 2)
+    if retry_after is None:
+        return jitter
+    if retry_after > max_seconds:
+        return None
+    return retry_after + random.uniform(0, backoff / 2)
+
+
+def call_with_retry(
+    breaker: CircuitBreaker,
+    func: Callable[[], T],
+    max_retries: int,
+    retry_reasons: Iterable[str] = TRANSIENT_REASONS
+) -> T:
+    """
+    サーキットブレーカーを通して外部サービスを呼び出し、一時的なエラーの場合は待機してから再試行する
+
+    Args:
+        breaker (CircuitBreaker): 外部サービスのサーキットブレーカー
+        func (Callable[[], T]): 呼び出す処理
+        max_retries (int): 最大の再試行回数
+        retry_reasons (Iterable[str]): 再試行するHTTPステータス・エラーの種類
+            （書き込みなど、再送すると二重に反映される可能性がある呼び出しでは、未処理だと分かるものだけを指定する）
+
+    Returns:
+        T: funcの戻り値
+
+    Raises:
+        CircuitOpenError: 遮断中の場合
+    """
+    settings = get_settings()
+    retry_reasons = frozenset(retry_reasons)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        started = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            reason = classify_error(e)
+            breaker.record(reason, time.perf_counter() - started)
+            if attempt >= max_retries or reason not in retry_reasons or not breaker.allows_retry():
+                raise
+            delay = backoff_delay(
+                attempt, settings.UPSTREAM_RETRY_BASE_SECONDS, settings.UPSTREAM_RETRY_MAX_SECONDS, retry_after_of(e)
+            )
+            if delay is None:
+                raise
+            UPSTREAM_RETRIES.inc(breaker.name, reason)
+            logger.warning(f"{breaker.name} call failed ({reason}), retrying in {delay:.1f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record(None, time.perf_counter() - started)
+        return result
+
+
+def hedged_call(
+    executor: Executor,
+    func: Callable[[], T],
+    hedge_after: float,
+    can_hedge: Callable[[], bool],
+    upstream: str
+) -> T:
+    """
+    funcを実行し、hedge_after秒以内に終わらなければ同じ呼び出しをもう1つ並行して実行し、先に成功した結果を返す
+    （遅れた方の呼び出しは中断できないため、バックグラウンドで終わるのを待たずに結果を捨てる）
+
+    Args:
+        executor (Executor): 呼び出しを実行するスレッドプール
+        func (Callable[[], T]): 呼び出す処理（何度実行しても結果が変わらないこと）
+        hedge_after (float): もう1つ呼び出すまでの秒数
+        can_hedge (Callable[[], bool]): もう1つ呼び出してよいか（レート制限・利用枠などを確保できた場合にTrue）
+        upstream (str): 外部サービスの名前（メトリクス用）
+
+    Returns:
+        T: 先に成功した呼び出しの結果
+    """
+    # ログの識別子（webhookEventId・キーワードなど）を引き継ぐ
+    primary = executor.submit(contextvars.copy_context().run, func)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done or not can_hedge():
+        return primary.result()
+
+    HEDGED_REQUESTS.inc(upstream, "launched")
+    hedge = executor.submit(contextvars.copy_context().run, func)
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    HEDGED_REQUESTS.inc(upstream, "won")
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+async def hedged_call_async(
+    func: Callable[[], Awaitable[T]],
+    hedge_after: float,
+    can_hedge: Callable[[], bool],
+    upstream: str
+) -> T:
+    """
+    hedged_callの非同期版（先に成功した結果を返し、もう一方の呼び出しはキャンセルする）
+
+    Args:
+        func (Callable[[], Awaitable[T]]): 呼び出すコルーチンを作成する関数
+        hedge_after (float): もう1つ呼び出すまでの秒数
+        can_hedge (Callable[[], bool]): もう1つ呼び出してよいか
+        upstream (str): 外部サービスの名前（メトリクス用）
+
+    Returns:
+        T: 先に成功した呼び出しの結果
+    """
+    primary = asyncio.ensure_future(func())
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done or not can_hedge():
+        return await primary
+
+    HEDGED_REQUESTS.inc(upstream, "launched")
+    hedge = asyncio.ensure_future(func())
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        HEDGED_REQUESTS.inc(upstream, "won")
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+@lru_cache()
+def get_circuit_breaker(upstream: str) -> CircuitBreaker:
+    """
+    プロセス全体で共有する外部サービスのサーキットブレーカーを取得する
+
+    Args:
+        upstream (str): 外部サービスの名前（zenserp / sheets）
+
+    Returns:
+        CircuitBreaker: サーキットブレーカー
+    """
+    settings = get_settings()
+    slow_call_seconds = {
+        "zenserp": settings.ZENSERP_SLOW_CALL_SECONDS,
+        "sheets": settings.SHEETS_SLOW_CALL_SECONDS,
+    }.get(upstream, 0.0)
+    return CircuitBreaker(
+        upstream,
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds=settings.CIRCUIT_BREAKER_RESET_SECONDS,
+        slow_call_seconds=slow_call_seconds
+    )
+
+
+def circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """外部サービスごとのサーキットブレーカーの状態を返す（/health用）"""
+    return {upstream: get_circuit_breaker(upstream).stats() for upstream in UPSTREAM_LABELS}
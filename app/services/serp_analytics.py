@@ -0,0 +1,301 @@
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from app.utils.logger import logger
+
+
+class SerpMatrix:
+    """
+    キーワード×ドメイン（またはURL）の疎行列
+    値は順位に応じた重み 1/log2(順位+1) の合計（同じドメインの複数の結果は合算）
+    """
+
+    def __init__(self, keywords: np.ndarray, columns: np.ndarray, weights: sparse.csr_matrix):
+        self.keywords = keywords
+        self.columns = columns
+        self.weights = weights
+
+    @classmethod
+    def from_items(cls, items: List[tuple], by: str = "domain") -> "SerpMatrix":
+        """
+        履歴ストアの行から疎行列を作成する
+
+        Args:
+            items (List[tuple]): (正規化キーワード, 順位, ドメイン, URL) の組
+            by (str): 列にする値（domain / url）
+
+        Returns:
+            SerpMatrix: 作成した行列
+        """
+        if not items:
+            return cls(np.array([], dtype=object), np.array([], dtype=object), sparse.csr_matrix((0, 0), dtype=np.float32))
+
+        keywords, positions, domains, urls = zip(*items)
+        values = np.array(urls if by == "url" else domains, dtype=object)
+        positions = np.asarray(positions, dtype=np.float32)
+
+        # ドメインが取れない行は除く
+        valid = values != ""
+        keyword_labels, row_index = np.unique(np.asarray(keywords, dtype=object)[valid], return_inverse=True)
+        column_labels, column_index = np.unique(values[valid], return_inverse=True)
+        weights = 1.0 / np.log2(positions[valid] + 1.0)
+
+        matrix = sparse.coo_matrix(
+            (weights, (row_index, column_index)),
+            shape=(len(keyword_labels), len(column_labels)),
+            dtype=np.float32
+        ).tocsr()
+        matrix.sum_duplicates()
+        return cls(keyword_labels, column_labels, matrix)
+
+
+def share_of_voice(matrix: SerpMatrix, top_n: int) -> List[Tuple[str, float, int]]:
+    """
+    ドメインごとのシェア（順位で重み付けした露出の割合）を求める
+
+    Args:
+        matrix (SerpMatrix): キーワード×ドメインの行列
+        top_n (int): 返す件数
+
+    Returns:
+        List[Tuple[str, float, int]]: ドメイン、シェア（0〜1）、出現キーワード数（シェアの大きい順）
+    """
+    if matrix.weights.nnz == 0:
+        return []
+    totals = np.asarray(matrix.weights.sum(axis=0)).ravel()
+    keyword_counts = matrix.weights.getnnz(axis=0)
+    shares = totals / totals.sum()
+    order = _top_indices(shares, top_n)
+    return [(str(matrix.columns[i]), float(shares[i]), int(keyword_counts[i])) for i in order]
+
+
+def pairwise_overlap(
+    matrix: SerpMatrix,
+    method: str = "jaccard",
+    min_score: float = 0.0,
+    top_n: Optional[int] = None,
+    max_document_frequency: float = 1.0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    キーワード同士の検索結果の重なりを疎行列の積でまとめて求める
+
+    Args:
+        matrix (SerpMatrix): キーワード×ドメイン（またはURL）の行列
+        method (str): jaccard（共通の割合）/ rank_weighted（順位で重み付けしたコサイン類似度）
+        min_score (float): この値より小さい組は除く
+        top_n (Optional[int]): 指定した場合はスコアの大きい順にこの件数だけ返す
+        max_document_frequency (float): この割合より多くのキーワードに出現する列は除く
+            （大手ポータルなどのどこにでも出る列があると組の数がキーワード数の2乗に近づくため）
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: キーワードAの番号、キーワードBの番号、スコア、共通数
+    """
+    weights = matrix.weights
+    n_keywords = weights.shape[0]
+    empty = (np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float32), np.array([], dtype=np.int64))
+    if n_keywords < 2 or weights.nnz == 0:
+        return empty
+
+    if max_document_frequency < 1.0:
+        document_frequency = weights.getnnz(axis=0)
+        keep = np.flatnonzero(document_frequency <= max(2, max_document_frequency * n_keywords))
+        weights = weights[:, keep]
+
+    presence = weights.copy()
+    presence.data = np.ones_like(presence.data)
+
+    # 共通の列数（上三角だけを使い、同じ組を2回数えない）
+    common = sparse.triu(presence @ presence.T, k=1).tocoo()
+    if common.nnz == 0:
+        return empty
+    rows, cols, common_counts = common.row, common.col, common.data
+
+    if method == "rank_weighted":
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        normalized = sparse.diags(1.0 / norms) @ weights
+        similarity = (normalized @ normalized.T).tocsr()
+        scores = np.asarray(similarity[rows, cols]).ravel()
+    else:
+        sizes = presence.getnnz(axis=1)
+        scores = common_counts / (sizes[rows] + sizes[cols] - common_counts)
+
+    keep = scores >= min_score
+    rows, cols, scores, common_counts = rows[keep], cols[keep], scores[keep], common_counts[keep]
+
+    if top_n is not None:
+        order = _top_indices(scores, top_n)
+        rows, cols, scores, common_counts = rows[order], cols[order], scores[order], common_counts[order]
+
+    return rows, cols, scores.astype(np.float32), common_counts.astype(np.int64)
+
+
+def cluster_keywords(
+    matrix: SerpMatrix,
+    threshold: float,
+    method: str = "jaccard",
+    max_document_frequency: float = 1.0
+) -> List[List[str]]:
+    """
+    重なりのスコアが閾値以上のキーワード同士をつないだグラフの連結成分をクラスタとする
+
+    Args:
+        matrix (SerpMatrix): キーワード×ドメイン（またはURL）の行列
+        threshold (float): つなぐ組のスコアの下限
+        method (str): jaccard / rank_weighted
+        max_document_frequency (float): pairwise_overlapと同じ
+
+    Returns:
+        List[List[str]]: 2件以上のキーワードを含むクラスタ（大きい順）
+    """
+    n_keywords = len(matrix.keywords)
+    rows, cols, _, _ = pairwise_overlap(
+        matrix,
+        method=method,
+        min_score=threshold,
+        max_document_frequency=max_document_frequency
+    )
+    if len(rows) == 0:
+        return []
+
+    adjacency = sparse.coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n_keywords, n_keywords))
+    _, labels = connected_components(adjacency, directed=False)
+
+    order = np.argsort(labels, kind="stable")
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    clusters = [
+        [str(keyword) for keyword in matrix.keywords[group]]
+        for group in np.split(order, boundaries)
+        if len(group) > 1
+    ]
+    return sorted(clusters, key=len, reverse=True)
+
+
+def _top_indices(values: np.ndarray, top_n: int) -> np.ndarray:
+    """値の大きい順に上位top_n件の位置を返す"""
+    if top_n >= len(values):
+        return np.argsort(-values, kind="stable")
+    candidates = np.argpartition(-values, top_n)[:top_n]
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+class SerpAnalytics:
+    """検索履歴ストアに蓄積した検索結果をキーワード横断で分析するクラス"""
+
+    def __init__(self, history_store):
+        self.history_store = history_store
+
+    def load_matrix(self, days: int, by: str = "domain", keywords: Optional[List[str]] = None) -> SerpMatrix:
+        """
+        直近days日間の各キーワードの最新の検索結果から行列を作成する
+
+        Args:
+            days (int): 対象期間（日）
+            by (str): domain / url
+            keywords (Optional[List[str]]): 指定した場合はそのキーワードだけを対象にする
+
+        Returns:
+            SerpMatrix: 作成した行列
+        """
+        started = time.perf_counter()
+        end = time.time()
+        items = self.history_store.latest_items(end - days * 86400, end + 1, keywords=keywords)
+        matrix = SerpMatrix.from_items(items, by=by)
+        logger.info(
+            f"Built {by} matrix: {matrix.weights.shape[0]} keywords x {matrix.weights.shape[1]} columns, "
+            f"{matrix.weights.nnz} entries in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return matrix
+
+    def share_table(self, days: int, top_n: int) -> List[List[str]]:
+        """
+        ドメインのシェアの表を作成する
+
+        Args:
+            days (int): 対象期間（日）
+            top_n (int): 最大件数
+
+        Returns:
+            List[List[str]]: ヘッダー行を含む行データ
+        """
+        matrix = self.load_matrix(days, by="domain")
+        rows = [["順位", "ドメイン", "シェア(%)", "出現キーワード数", "対象キーワード数"]]
+        for rank, (domain, share, count) in enumerate(share_of_voice(matrix, top_n), start=1):
+            rows.append([str(rank), domain, f"{share * 100:.2f}", str(count), str(len(matrix.keywords))])
+        return rows
+
+    def overlap_table(
+        self,
+        days: int,
+        top_n: int,
+        method: str,
+        by: str,
+        max_document_frequency: float,
+        keywords: Optional[List[str]] = None
+    ) -> List[List[str]]:
+        """
+        検索結果の重なりが大きいキーワードの組の表を作成する
+
+        Args:
+            days (int): 対象期間（日）
+            top_n (int): 最大件数
+            method (str): jaccard / rank_weighted
+            by (str): url / domain
+            max_document_frequency (float): この割合より多くのキーワードに出現する列は除く
+            keywords (Optional[List[str]]): 指定した場合はそのキーワードだけを対象にする
+
+        Returns:
+            List[List[str]]: ヘッダー行を含む行データ
+        """
+        matrix = self.load_matrix(days, by=by, keywords=keywords)
+        rows_a, rows_b, scores, common = pairwise_overlap(
+            matrix,
+            method=method,
+            min_score=1e-9,
+            top_n=top_n,
+            max_document_frequency=max_document_frequency
+        )
+        rows = [["キーワードA", "キーワードB", "スコア", "共通数"]]
+        for a, b, score, count in zip(rows_a, rows_b, scores, common):
+            rows.append([str(matrix.keywords[a]), str(matrix.keywords[b]), f"{score:.3f}", str(count)])
+        return rows
+
+    def cluster_table(
+        self,
+        days: int,
+        threshold: float,
+        method: str,
+        by: str,
+        max_document_frequency: float,
+        max_rows: int
+    ) -> List[List[str]]:
+        """
+        キーワードのクラスタの表を作成する
+
+        Args:
+            days (int): 対象期間（日）
+            threshold (float): クラスタとしてつなぐ重なりスコアの下限
+            method (str): jaccard / rank_weighted
+            by (str): url / domain
+            max_document_frequency (float): この割合より多くのキーワードに出現する列は除く
+            max_rows (int): 最大行数
+
+        Returns:
+            List[List[str]]: ヘッダー行を含む行データ
+        """
+        matrix = self.load_matrix(days, by=by)
+        clusters = cluster_keywords(
+            matrix,
+            threshold=threshold,
+            method=method,
+            max_document_frequency=max_document_frequency
+        )
+        rows = [["クラスタ番号", "クラスタサイズ", "キーワード"]]
+        for number, cluster in enumerate(clusters, start=1):
+            for keyword in cluster:
+                if len(rows) > max_rows:
+                    return rows
+                rows.append([str(number), str(len(cluster)), keyword])
+        return rows
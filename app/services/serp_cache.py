@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from app.config import get_settings
+from app.utils import json_codec
+from app.utils.keywords import normalize_keyword
+from app.utils.logger import logger
+
+
+class SerpCache:
+    """
+    Zenserpの検索結果を保持する2段構成のキャッシュ
+    （メモリ上のLRUと、再起動後も残るSQLiteファイル）
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        memory_max_entries: int,
+        db_path: str = "",
+        db_max_bytes: int = 0
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.memory_max_entries = max(1, memory_max_entries)
+        self.db_path = db_path
+        self.db_max_bytes = db_max_bytes
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0
+        }
+
+        if db_path:
+            self._db = self._open_db(db_path)
+
+    def _open_db(self, db_path: str) -> Optional[sqlite3.Connection]:
+        """SQLiteファイルを開き、テーブルを作成する"""
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS serp_cache ("
+                " key TEXT PRIMARY KEY,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " value TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_serp_cache_accessed_at ON serp_cache (accessed_at)")
+            logger.info(f"SERP cache database opened: {db_path}")
+            return db
+        except Exception as e:
+            # ディスクキャッシュが使えなくてもメモリキャッシュだけで動作させる
+            logger.error(f"Failed to open SERP cache database, disk tier disabled: {str(e)}")
+            return None
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """
+        検索パラメータからキャッシュキーを作成する
+
+        Args:
+            params (Dict[str, Any]): Zenserp APIに渡す検索パラメータ（qは正規化して使用）
+
+        Returns:
+            str: キャッシュキー
+        """
+        key_params = dict(params)
+        key_params["q"] = normalize_keyword(str(key_params.get("q", "")))
+        raw_key = json.dumps(key_params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュから検索結果を取得する（期限切れの場合はNone）
+
+        Args:
+            key (str): キャッシュキー
+
+        Returns:
+            Optional[Dict[str, Any]]: キャッシュされた検索結果
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT created_at, value FROM serp_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        created_at, raw_value = row
+                        if now - created_at < self.ttl_seconds:
+                            value = json_codec.loads(raw_value)
+                            self._db.execute(
+                                "UPDATE serp_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                            )
+                            self._store_memory(key, created_at, value)
+                            self._stats["disk_hits"] += 1
+                            return value
+                        self._db.execute("DELETE FROM serp_cache WHERE key = ?", (key,))
+                except Exception as e:
+                    logger.error(f"Failed to read SERP cache database: {str(e)}")
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        検索結果をキャッシュに保存する
+
+        Args:
+            key (str): キャッシュキー
+            value (Dict[str, Any]): 検索結果
+        """
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, now, value)
+            self._stats["writes"] += 1
+
+            if self._db is not None:
+                try:
+                    raw_value = json_codec.dumps(value)
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO serp_cache (key, created_at, accessed_at, size, value)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        (key, now, now, len(raw_value.encode("utf-8")), raw_value)
+                    )
+                    self._evict_disk()
+                except Exception as e:
+                    logger.error(f"Failed to write SERP cache database: {str(e)}")
+
+    def _store_memory(self, key: str, created_at: float, value: Dict[str, Any]) -> None:
+        """メモリキャッシュに保存し、上限を超えた分を古い順に削除する（ロック取得済みで呼ぶこと）"""
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
+
+    def _evict_disk(self) -> None:
+        """期限切れのエントリと、容量上限を超えた分を最終アクセスの古い順に削除する（ロック取得済みで呼ぶこと）"""
+        cursor = self._db.execute(
+            "DELETE FROM serp_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        )
+        self._stats["disk_evictions"] += max(cursor.rowcount, 0)
+
+        if self.db_max_bytes <= 0:
+            return
+
+        total_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM serp_cache").fetchone()[0]
+        if total_size <= self.db_max_bytes:
+            return
+
+        for key, size in self._db.execute(
+            "SELECT key, size FROM serp_cache ORDER BY accessed_at"
+        ).fetchall():
+            if total_size <= self.db_max_bytes:
+                break
+            self._db.execute("DELETE FROM serp_cache WHERE key = ?", (key,))
+            total_size -= size
+            self._stats["disk_evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット数・ミス数などの統計情報を返す"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_enabled"] = self._db is not None
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+@lru_cache()
+def get_serp_cache() -> Optional[SerpCache]:
+    """プロセス全体で共有する検索結果キャッシュを取得する（無効化されている場合はNone）"""
+    settings = get_settings()
+    if not settings.SERP_CACHE_ENABLED:
+        return None
+    return SerpCache(
+        ttl_seconds=settings.SERP_CACHE_TTL_SECONDS,
+        memory_max_entries=settings.SERP_CACHE_MEMORY_MAX_ENTRIES,
+        db_path=settings.SERP_CACHE_DB_PATH,
+        db_max_bytes=settings.SERP_CACHE_DB_MAX_BYTES
+    )
@@ -0,0 +1,193 @@
+from typing import Any, Dict, FrozenSet, List, Optional
+
+# タイトル・説明・URLを持つ検索結果の種類（Zenserpのキー -> SearchDataの属性）
+ITEM_SECTIONS = {
+    "organic": "organic_results",
+    "videos": "videos",
+    "ads": "ads",
+}
+
+# 文字列のリストとして取り出す種類（Zenserpのキー -> (SearchDataの属性, 項目内の文字列のキー)）
+TEXT_SECTIONS = {
+    "suggested_searches": ("suggested_searches", "query"),
+    "related_searches": ("related_searches", "query"),
+    "people_also_ask": ("related_questions", "question"),
+}
+
+# 中身を加工せずに扱うSERP機能（既定では出現したかどうかだけを残し、中身は破棄する）
+RAW_SECTIONS = ("rich_results", "knowledge_panel", "local_pack", "featured_snippets")
+
+
+def _text(value: Any) -> str:
+    """値を文字列に変換する（Noneは空文字。文字列はそのまま返す）"""
+    if type(value) is str:
+        return value
+    return "" if value is None else str(value)
+
+
+class SerpItem:
+    """タイトル・説明・URL・順位を持つ検索結果1件（辞書と同じくget・[]で値を取得できる）"""
+    __slots__ = ("title", "description", "url", "position")
+
+    def __init__(self, title: str, description: str, url: str, position: Optional[int] = None):
+        self.title = title
+        self.description = description
+        self.url = url
+        self.position = position
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.__slots__:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSONに変換できる辞書を返す（順位のない結果はpositionを含めない）"""
+        data = {"title": self.title, "description": self.description, "url": self.url}
+        if self.position is not None:
+            data["position"] = self.position
+        return data
+
+    def __repr__(self) -> str:
+        return f"SerpItem(position={self.position!r}, url={self.url!r})"
+
+
+class SearchData:
+    """
+    Zenserpの検索結果から抽出したデータ（辞書と同じくget・[]で値を取得できる）
+    （生データの辞書を持ち続けないように、必要な値だけを保持する）
+    """
+    __slots__ = (
+        "organic_results", "suggested_searches", "related_searches", "vertical_searches",
+        "related_questions", "videos", "ads", "features", "sections", "deep_serp"
+    )
+
+    def __init__(self):
+        self.organic_results: List[SerpItem] = []
+        self.suggested_searches: List[str] = []
+        self.related_searches: List[str] = []
+        self.vertical_searches: List[str] = []
+        self.related_questions: List[str] = []
+        self.videos: List[SerpItem] = []
+        self.ads: List[SerpItem] = []
+        # 出現したSERP機能（RAW_SECTIONSのうち空でないもの）
+        self.features: FrozenSet[str] = frozenset()
+        # 中身を残したSERP機能（keep_sectionsを指定した場合のみ）
+        self.sections: Optional[Dict[str, Any]] = None
+        # 複数ページをまとめた結果の取得状況
+        self.deep_serp: Optional[Dict[str, Any]] = None
+
+    def has_feature(self, name: str) -> bool:
+        """
+        SERP機能が出現したかどうかを返す
+
+        Args:
+            name (str): RAW_SECTIONSの名前、またはrelated_questions / videos / adsなどの属性名
+
+        Returns:
+            bool: 出現した場合はTrue
+        """
+        if name in RAW_SECTIONS:
+            return name in self.features
+        return bool(self.get(name))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in RAW_SECTIONS:
+            value = self.sections.get(key) if self.sections is not None else None
+        elif key in self.__slots__:
+            value = getattr(self, key)
+        else:
+            value = None
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSONに変換できる辞書を返す（中身を残していないSERP機能は出現したかどうかだけを含める）"""
+        data: Dict[str, Any] = {
+            "organic_results": [item.to_dict() for item in self.organic_results],
+            "suggested_searches": self.suggested_searches,
+            "related_searches": self.related_searches,
+            "vertical_searches": self.vertical_searches,
+            "related_questions": self.related_questions,
+            "videos": [item.to_dict() for item in self.videos],
+            "ads": [item.to_dict() for item in self.ads],
+            "features": sorted(self.features),
+        }
+        if self.sections is not None:
+            data.update(self.sections)
+        if self.deep_serp is not None:
+            data["deep_serp"] = self.deep_serp
+        return data
+
+
+def extract(search_result: Dict[str, Any], keep_sections: bool = False) -> SearchData:
+    """
+    Zenserpの検索結果を1回の走査でSearchDataに変換する
+
+    Args:
+        search_result (Dict[str, Any]): Zenserp APIの検索結果
+        keep_sections (bool): rich_results / knowledge_panel / local_pack / featured_snippets の中身も残すかどうか
+
+    Returns:
+        SearchData: 抽出したデータ
+    """
+    data = SearchData()
+    features = []
+    sections: Optional[Dict[str, Any]] = None
+    if keep_sections:
+        # 以前の抽出結果と同じく、出現しなかった機能も既定値で含める
+        sections = {"rich_results": [], "knowledge_panel": None, "local_pack": None, "featured_snippets": []}
+
+    for key, value in search_result.items():
+        attribute = ITEM_SECTIONS.get(key)
+        if attribute is not None:
+            if not isinstance(value, list):
+                continue
+            items = []
+            append = items.append
+            ranked = key == "organic"
+            for rank, result in enumerate(value, start=1):
+                if not isinstance(result, dict):
+                    result = {}
+                append(SerpItem(
+                    _text(result.get("title")),
+                    _text(result.get("description")),
+                    _text(result.get("link")),
+                    # 複数ページをまとめた結果では全体での絶対順位
+                    result.get("position", rank) if ranked else None
+                ))
+            setattr(data, attribute, items)
+            continue
+
+        text_section = TEXT_SECTIONS.get(key)
+        if text_section is not None:
+            if isinstance(value, list):
+                attribute, field = text_section
+                setattr(data, attribute, [
+                    item.get(field, "") if isinstance(item, dict) else str(item)
+                    for item in value
+                ])
+            continue
+
+        if key in RAW_SECTIONS:
+            if value:
+                features.append(key)
+            if sections is not None:
+                sections[key] = value
+        elif key == "deep_serp":
+            data.deep_serp = value
+
+    data.features = frozenset(features)
+    data.sections = sections
+    return data
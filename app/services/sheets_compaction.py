@@ -0,0 +1,156 @@
+import argparse
+import datetime
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Set, Tuple
+from app.config import get_settings
+from app.services.sheets_service import RESULT_HEADERS, SheetsService
+from app.utils.logger import logger
+
+settings = get_settings()
+
+# キーワード別シート・一括シートの名前（例: キーワード_20240101_120000、bulk_10件_20240101_120000_2）
+_TIMESTAMPED_SHEET_RE = re.compile(r"^.+_(?P<date>\d{8})_(?P<time>\d{6})(?:_\d+)?$")
+
+# 統合先シートのヘッダー行（元のシート名を最後の列に記録する）
+ARCHIVE_HEADERS = RESULT_HEADERS + ["元シート名"]
+
+# 元シート名の列（A1表記）
+_SOURCE_COLUMN = chr(ord("A") + len(RESULT_HEADERS))
+
+
+def find_compactable_sheets(sheets: List[Dict[str, Any]], older_than: datetime.datetime) -> List[Tuple[str, datetime.datetime]]:
+    """
+    シート名のタイムスタンプが指定日時より古いキーワード別シートを探す
+    （31文字制限でタイムスタンプが切れたシートは日時が分からないため対象外）
+
+    Args:
+        sheets (List[Dict[str, Any]]): シートのプロパティ一覧
+        older_than (datetime.datetime): この日時より前に作成されたシートを対象にする
+
+    Returns:
+        List[Tuple[str, datetime.datetime]]: シート名と作成日時の組（古い順）
+    """
+    candidates = []
+    for properties in sheets:
+        title = properties.get("title", "")
+        match = _TIMESTAMPED_SHEET_RE.match(title)
+        if match is None:
+            continue
+        try:
+            created_at = datetime.datetime.strptime(match.group("date") + match.group("time"), "%Y%m%d%H%M%S")
+        except ValueError:
+            continue
+        if created_at < older_than:
+            candidates.append((title, created_at))
+    return sorted(candidates, key=lambda item: item[1])
+
+
+def compact_keyword_sheets(
+    sheets_service: SheetsService,
+    older_than_days: int,
+    dry_run: bool = False,
+    batch_size: int = 50
+) -> Dict[str, Any]:
+    """
+    古いキーワード別シートの内容を月ごとのアーカイブシートに統合し、元のシートを削除する
+    （アーカイブシートの元シート名の列に記録済みのシートは追記せずに削除だけ行うため、
+    削除の前に中断した場合も再実行で行が二重に追記されない）
+
+    Args:
+        sheets_service (SheetsService): スプレッドシートサービス
+        older_than_days (int): 何日より前のシートを対象にするか
+        dry_run (bool): Trueの場合は対象の一覧だけを返し、変更は行わない
+        batch_size (int): 1回のリクエストでまとめて処理するシート数
+
+    Returns:
+        Dict[str, Any]: 処理結果の集計
+    """
+    older_than = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+    candidates = find_compactable_sheets(sheets_service.list_sheets(refresh=True), older_than)
+    summary = {
+        "dry_run": dry_run,
+        "older_than": older_than.isoformat(timespec="seconds"),
+        "candidates": len(candidates),
+        "archived_sheets": 0,
+        "archived_rows": 0,
+        "already_archived_sheets": 0,
+        "deleted_sheets": 0
+    }
+    logger.info(f"Found {len(candidates)} sheets to compact (older than {older_than_days} days)")
+
+    if dry_run:
+        summary["sheets"] = [title for title, _ in candidates]
+        return summary
+
+    # アーカイブシート名 -> 記録済みの元シート名（初めて使うときに読み込む）
+    archived_titles: Dict[str, Set[str]] = {}
+
+    for start in range(0, len(candidates), batch_size):
+        chunk = candidates[start:start + batch_size]
+        chunk_archives = {
+            title: f"{settings.SHEETS_ARCHIVE_SHEET_PREFIX}_{created_at.strftime('%Y%m')}"
+            for title, created_at in chunk
+        }
+        _load_archived_titles(sheets_service, set(chunk_archives.values()), archived_titles)
+
+        # 前回の実行で追記済み（削除前に中断した）シートは追記しない
+        pending = [(title, created_at) for title, created_at in chunk if title not in archived_titles[chunk_archives[title]]]
+        values = sheets_service.get_values([title for title, _ in pending])
+
+        # 作成月ごとのアーカイブシートにまとめる
+        archives: "OrderedDict[str, List[List[str]]]" = OrderedDict()
+        for title, _ in pending:
+            rows = archives.setdefault(chunk_archives[title], [])
+            for row in values.get(title, [])[1:]:
+                padded = list(row[:len(RESULT_HEADERS)]) + [""] * (len(RESULT_HEADERS) - len(row))
+                rows.append(padded + [title])
+
+        archived_rows = 0
+        for archive_title, rows in archives.items():
+            if rows:
+                sheets_service.append_rows(rows, title=archive_title, header=ARCHIVE_HEADERS)
+            archived_rows += len(rows)
+        for title, _ in pending:
+            archived_titles[chunk_archives[title]].add(title)
+
+        # 統合が成功したシートだけを削除する（集計は削除まで終わってから加える）
+        deleted = sheets_service.delete_sheets([title for title, _ in chunk])
+        summary["archived_sheets"] += len(pending)
+        summary["archived_rows"] += archived_rows
+        summary["already_archived_sheets"] += len(chunk) - len(pending)
+        summary["deleted_sheets"] += deleted
+        logger.info(f"Compacted {len(chunk)} sheets into {len(archives)} archive sheets ({len(chunk) - len(pending)} already archived)")
+
+    return summary
+
+
+def _load_archived_titles(sheets_service: SheetsService, archive_titles: Set[str], archived_titles: Dict[str, Set[str]]) -> None:
+    """
+    アーカイブシートの元シート名の列を読み込み、記録済みの元シート名を追加する（読み込み済み・未作成のシートは読まない）
+
+    Args:
+        sheets_service (SheetsService): スプレッドシートサービス
+        archive_titles (Set[str]): 使用するアーカイブシート名
+        archived_titles (Dict[str, Set[str]]): アーカイブシート名ごとの記録済みの元シート名（読み込んだ内容を追加する）
+    """
+    existing = {properties.get("title") for properties in sheets_service.list_sheets()}
+    to_load = sorted(title for title in archive_titles if title not in archived_titles and title in existing)
+    values = sheets_service.get_values(to_load, columns=f"{_SOURCE_COLUMN}:{_SOURCE_COLUMN}")
+    for archive_title in archive_titles:
+        if archive_title not in archived_titles:
+            # 先頭はヘッダー行
+            archived_titles[archive_title] = {row[0] for row in values.get(archive_title, [])[1:] if row}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="古いキーワード別シートをアーカイブシートに統合して削除する")
+    parser.add_argument("--older-than-days", type=int, default=30, help="何日より前のシートを対象にするか")
+    parser.add_argument("--dry-run", action="store_true", help="対象の一覧だけを表示する")
+    args = parser.parse_args()
+
+    service = SheetsService()
+    try:
+        print(compact_keyword_sheets(service, args.older_than_days, dry_run=args.dry_run))
+    finally:
+        service.close()
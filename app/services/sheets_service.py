@@ -1,20 +1,81 @@
 import gspread
+import google.auth.transport.requests
 from google.oauth2.service_account import Credentials
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional, Tuple, TypeVar
 from app.config import get_settings
-from app.utils.logger import logger
+from app.services.resilience import TRANSIENT_REASONS, CircuitOpenError, call_with_retry, get_circuit_breaker
+from app.utils.logger import SAMPLED, logger
+from app.utils.metrics import stage
 import datetime
 import os
+import random
+import threading
 
 settings = get_settings()
 
+T = TypeVar("T")
+
+# 検索結果シートのヘッダー行
+RESULT_HEADERS = ["検索キーワード", "データ種別", "タイトル", "説明", "URL", "その他情報"]
+
+# 書き込みを再試行するHTTPステータス（処理されなかったことが分かるもの。タイムアウトなどは反映済みの可能性があり、
+# 再送するとシートや行が二重に作成されるため再試行しない）
+WRITE_RETRY_REASONS = frozenset({"429", "503"})
+
+def a1_sheet_name(title: str) -> str:
+    """A1表記の範囲指定で使えるようにシート名を引用符で囲む"""
+    return "'" + title.replace("'", "''") + "'"
+
 class SheetsService:
     """Google Sheets APIを使用してデータを記録するサービスクラス"""
 
     def __init__(self):
         self.credentials_file = settings.GOOGLE_SHEETS_CREDENTIALS_FILE
         self.spreadsheet_id = settings.GOOGLE_SHEETS_SPREADSHEET_ID
+        self.credentials: Optional[Credentials] = None
         self.client = self._get_client()
+        # 応答しないAPIを待ち続けないようにタイムアウトを設定する（gspreadの既定はタイムアウトなし）
+        self.client.set_timeout((settings.SHEETS_CONNECT_TIMEOUT, settings.SHEETS_READ_TIMEOUT))
+        # 障害時に呼び出しを遮断するサーキットブレーカー（プロセス全体で共有）
+        self.breaker = get_circuit_breaker("sheets")
+
+        # スプレッドシートのハンドルとシート情報（シート名 -> プロパティ）のキャッシュ
+        self._spreadsheet: Optional[gspread.Spreadsheet] = None
+        self._sheet_properties: Dict[str, Dict[str, Any]] = {}
+        self._metadata_lock = threading.Lock()
+
+        # アクセストークンの期限切れ前にバックグラウンドで更新する
+        self._refresh_stop = threading.Event()
+        self._refresh_thread = threading.Thread(
+            target=self._credential_refresh_loop,
+            name="sheets-credential-refresh",
+            daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _call(self, stage_name: str, func: Callable[[], T], idempotent: bool = False) -> T:
+        """
+        サーキットブレーカーを通してGoogle Sheets APIを呼び出し、一時的なエラーの場合は再試行する
+
+        Args:
+            stage_name (str): 処理段階の名前（メトリクス用）
+            func (Callable[[], T]): APIを呼び出す処理
+            idempotent (bool): 再送しても結果が変わらない呼び出しかどうか
+                （Falseの場合は、処理されなかったことが分かる429・503だけを再試行する）
+
+        Returns:
+            T: funcの戻り値
+        """
+        def attempt() -> T:
+            with stage(stage_name, upstream="sheets"):
+                return func()
+
+        return call_with_retry(
+            self.breaker,
+            attempt,
+            settings.SHEETS_MAX_RETRIES,
+            TRANSIENT_REASONS if idempotent else WRITE_RETRY_REASONS
+        )
 
     def _get_client(self) -> gspread.Client:
         """Google Sheets APIクライアントを取得する"""
@@ -31,12 +92,214 @@ class SheetsService:
                 self.credentials_file, scopes=scope
             )
             client = gspread.authorize(credentials)
+            self.credentials = credentials
             logger.info("Google Sheets client initialized successfully")
             return client
         except Exception as e:
             logger.error(f"Failed to initialize Google Sheets client: {str(e)}")
             raise
 
+    def _credential_refresh_loop(self) -> None:
+        """アクセストークンの有効期限を定期的に確認し、期限が近ければ更新する"""
+        while True:
+            try:
+                self._refresh_credentials_if_needed()
+            except Exception as e:
+                logger.error(f"Failed to refresh Google Sheets credentials: {str(e)}")
+            if self._refresh_stop.wait(settings.SHEETS_CREDENTIAL_CHECK_INTERVAL_SECONDS):
+                break
+
+    def _refresh_credentials_if_needed(self) -> None:
+        """アクセストークンが未取得または期限が近い場合に更新する"""
+        credentials = self.credentials
+        if credentials is None:
+            return
+
+        if credentials.valid and credentials.expiry is not None:
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            remaining = (credentials.expiry - now).total_seconds()
+            if remaining > settings.SHEETS_CREDENTIAL_REFRESH_MARGIN_SECONDS:
+                return
+
+        credentials.refresh(google.auth.transport.requests.Request())
+        logger.info(f"Google Sheets credentials refreshed (expires at {credentials.expiry})")
+
+    def _get_spreadsheet(self) -> gspread.Spreadsheet:
+        """
+        キャッシュしたスプレッドシートのハンドルを取得する（初回のみAPIからメタデータを取得）
+
+        Returns:
+            gspread.Spreadsheet: スプレッドシート
+        """
+        with self._metadata_lock:
+            if self._spreadsheet is None:
+                def open_spreadsheet() -> Tuple[gspread.Spreadsheet, Dict[str, Any]]:
+                    spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+                    return spreadsheet, spreadsheet.fetch_sheet_metadata()
+
+                spreadsheet, metadata = self._call("sheets_open", open_spreadsheet, idempotent=True)
+                self._sheet_properties = {
+                    sheet["properties"]["title"]: sheet["properties"]
+                    for sheet in metadata.get("sheets", [])
+                }
+                self._spreadsheet = spreadsheet
+                logger.info(f"Cached spreadsheet metadata ({len(self._sheet_properties)} sheets)")
+            return self._spreadsheet
+
+    def warm_up(self) -> None:
+        """アクセストークンの取得とシート情報の取得を先に済ませておく（初回の書き込みを速くする）"""
+        self._refresh_credentials_if_needed()
+        self._get_spreadsheet()
+
+    def invalidate_cache(self) -> None:
+        """キャッシュしたスプレッドシートのハンドルとシート情報を破棄する"""
+        with self._metadata_lock:
+            self._spreadsheet = None
+            self._sheet_properties = {}
+        logger.info("Spreadsheet metadata cache invalidated")
+
+    def _is_stale_metadata_error(self, error: Exception) -> bool:
+        """キャッシュしたシート情報が古いことが原因のエラーかどうかを判定する"""
+        if not isinstance(error, gspread.exceptions.APIError):
+            return False
+        message = str(error).lower()
+        return (
+            getattr(error.response, "status_code", None) == 404
+            or "already exists" in message
+            or "no grid with id" in message
+            or "no sheet with id" in message
+            or "invalid sheetid" in message
+        )
+
+    def _reserve_sheets(self, titles: List[str]) -> List[Tuple[str, int]]:
+        """
+        キャッシュしたシート情報と重複しないシート名とシートIDを確保する
+
+        Args:
+            titles (List[str]): 作成したいシート名
+
+        Returns:
+            List[Tuple[str, int]]: 確保したシート名とシートIDの組
+        """
+        reserved = []
+        with self._metadata_lock:
+            used_ids = {properties["sheetId"] for properties in self._sheet_properties.values()}
+            for title in titles:
+                unique_title = title
+                suffix = 2
+                while unique_title in self._sheet_properties:
+                    tail = f"_{suffix}"
+                    unique_title = title[:31 - len(tail)] + tail
+                    suffix += 1
+
+                sheet_id = random.randint(1, 2**31 - 1)
+                while sheet_id in used_ids:
+                    sheet_id = random.randint(1, 2**31 - 1)
+                used_ids.add(sheet_id)
+
+                self._sheet_properties[unique_title] = {
+                    "sheetId": sheet_id,
+                    "title": unique_title,
+                    "index": len(self._sheet_properties)
+                }
+                reserved.append((unique_title, sheet_id))
+        return reserved
+
+    def _release_sheets(self, titles: List[str]) -> None:
+        """作成に失敗したシートの予約を取り消す"""
+        with self._metadata_lock:
+            for title in titles:
+                self._sheet_properties.pop(title, None)
+
+    def _first_worksheet(self) -> gspread.Worksheet:
+        """キャッシュしたシート情報から先頭のシートを取得する（APIは呼ばない）"""
+        spreadsheet = self._get_spreadsheet()
+        with self._metadata_lock:
+            if not self._sheet_properties:
+                return spreadsheet.sheet1
+            properties = min(self._sheet_properties.values(), key=lambda p: p.get("index", 0))
+        return gspread.Worksheet(spreadsheet, dict(properties))
+
+    def list_sheets(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        スプレッドシート内のシートのプロパティ一覧を返す
+
+        Args:
+            refresh (bool): Trueの場合はキャッシュを破棄してAPIから取り直す
+
+        Returns:
+            List[Dict[str, Any]]: シートのプロパティ（sheetId / title / index など）
+        """
+        if refresh:
+            self.invalidate_cache()
+        self._get_spreadsheet()
+        with self._metadata_lock:
+            return [dict(properties) for properties in self._sheet_properties.values()]
+
+    def get_values(self, titles: List[str], columns: Optional[str] = None) -> Dict[str, List[List[str]]]:
+        """
+        複数シートの値を1回のリクエストで取得する
+
+        Args:
+            titles (List[str]): シート名
+            columns (Optional[str]): 取得する列の範囲（例: "G:G"。省略時はシート全体）
+
+        Returns:
+            Dict[str, List[List[str]]]: シート名ごとの値
+        """
+        if not titles:
+            return {}
+        spreadsheet = self._get_spreadsheet()
+        suffix = f"!{columns}" if columns else ""
+        response = self._call(
+            "sheets_read",
+            lambda: spreadsheet.values_batch_get([a1_sheet_name(title) + suffix for title in titles]),
+            idempotent=True
+        )
+        value_ranges = response.get("valueRanges", [])
+        return {title: value_range.get("values", []) for title, value_range in zip(titles, value_ranges)}
+
+    def delete_sheets(self, titles: List[str]) -> int:
+        """
+        複数シートを1回のbatchUpdateで削除する
+
+        Args:
+            titles (List[str]): 削除するシート名
+
+        Returns:
+            int: 削除したシート数
+        """
+        with self._metadata_lock:
+            sheet_ids = {
+                title: self._sheet_properties[title]["sheetId"]
+                for title in titles if title in self._sheet_properties
+            }
+        if not sheet_ids:
+            return 0
+
+        spreadsheet = self._get_spreadsheet()
+        self._call("sheets_delete", lambda: spreadsheet.batch_update({
+            "requests": [{"deleteSheet": {"sheetId": sheet_id}} for sheet_id in sheet_ids.values()]
+        }))
+        self._release_sheets(list(sheet_ids))
+        return len(sheet_ids)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """キャッシュと認証情報の状態を返す"""
+        with self._metadata_lock:
+            stats = {
+                "spreadsheet_cached": self._spreadsheet is not None,
+                "cached_sheets": len(self._sheet_properties)
+            }
+        credentials = self.credentials
+        stats["credentials_valid"] = bool(credentials is not None and credentials.valid)
+        stats["credentials_expiry"] = credentials.expiry.isoformat() if credentials is not None and credentials.expiry else None
+        return stats
+
+    def close(self) -> None:
+        """バックグラウンドの認証情報更新を停止する"""
+        self._refresh_stop.set()
+
     def write_search_results(self, keyword: str, search_data: Dict[str, Any]) -> str:
         """
         検索結果をスプレッドシートに書き込む
@@ -49,39 +312,380 @@ class SheetsService:
             str: スプレッドシートのURL
         """
         try:
-            # スプレッドシートを開く
-            spreadsheet = self.client.open_by_key(self.spreadsheet_id)
+            # スプレッドシートを開く（キャッシュしたハンドルを使用）
+            spreadsheet = self._get_spreadsheet()
             
             # タイムスタンプ付きのシート名を作成
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             sheet_name = f"{keyword}_{timestamp}"[:31]  # Googleシートのシート名は31文字制限
+
+            # 書き込む行データを先に組み立てる（失敗した場合はエラー情報を書き込んでから例外を送出する）
+            rows, build_error = self._build_rows_or_error(keyword, search_data)
+
+            # ローリング方式の場合は日付ごとの結果シートに追記する
+            if settings.SHEETS_STORAGE_MODE == "rolling":
+                url = self.append_rows(rows[1:])
+                if build_error is not None:
+                    raise build_error
+                return url
             
             try:
-                # 新しいシートを作成
-                sheet = spreadsheet.add_worksheet(
-                    title=sheet_name,
-                    rows=1000,
-                    cols=10
-                )
+                # シート作成とデータ書き込みを1回のbatchUpdateで実行
+                self._add_sheets([(sheet_name, rows)])
+            except CircuitOpenError:
+                # 遮断中は既存のシートへの書き込みも行わずにすぐ失敗させる
+                raise
             except Exception as e:
                 # シート作成に失敗した場合は、既存のシートを使用
                 logger.warning(f"Failed to create new sheet, using first sheet: {str(e)}")
-                sheet = spreadsheet.sheet1
+                sheet = self._first_worksheet()
+                self._write_data_to_sheet(sheet, keyword, search_data)
 
-            # データを書き込む
-            self._write_data_to_sheet(sheet, keyword, search_data)
+            if build_error is not None:
+                raise build_error
 
             # スプレッドシートのURLを返す
-            logger.info(f"Successfully wrote data to Google Sheets for keyword: {keyword}")
+            logger.info("Successfully wrote %d rows to Google Sheets for keyword: %s", len(rows), keyword, extra=SAMPLED)
             return spreadsheet.url
 
         except Exception as e:
             logger.error(f"Failed to write to Google Sheets: {str(e)}")
+            if self._is_stale_metadata_error(e):
+                self.invalidate_cache()
             raise
 
+    def write_bulk_results(
+        self,
+        results: List[Tuple[str, Dict[str, Any]]],
+        errors: List[Tuple[str, str]],
+        per_keyword_tabs: bool = False
+    ) -> Tuple[str, List[Tuple[str, str]]]:
+        """
+        複数キーワードの検索結果を1回のbatchUpdateでスプレッドシートに書き込む
+        （行データを作成できなかったキーワードは失敗として扱い、エラー内容の行に書き込む）
+
+        Args:
+            results (List[Tuple[str, Dict[str, Any]]]): キーワードと抽出済みデータの組
+            errors (List[Tuple[str, str]]): 取得に失敗したキーワードとエラー内容の組
+            per_keyword_tabs (bool): Trueの場合はキーワードごとにシートを作成し、
+                Falseの場合はすべての結果を1つのシートにまとめる
+
+        Returns:
+            Tuple[str, List[Tuple[str, str]]]: スプレッドシートのURLと、失敗したキーワードとエラー内容の組
+                （errorsに行データを作成できなかったキーワードを加えたもの）
+        """
+        try:
+            spreadsheet = self._get_spreadsheet()
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            total = len(results) + len(errors)
+
+            # 行データを先に組み立て、作成できなかったキーワードは失敗に加える
+            built: List[Tuple[str, List[List[str]]]] = []
+            errors = list(errors)
+            for keyword, data in results:
+                rows, build_error = self._build_rows_or_error(keyword, data)
+                if build_error is None:
+                    built.append((keyword, rows))
+                else:
+                    errors.append((keyword, str(build_error)))
+
+            if settings.SHEETS_STORAGE_MODE == "rolling":
+                # ローリング方式の場合は日付ごとの結果シートにまとめて追記する
+                rows = []
+                for keyword, keyword_rows in built:
+                    rows.extend(keyword_rows[1:])
+                rows.extend(self._build_bulk_error_rows(errors))
+                url = self.append_rows(rows)
+                logger.info(f"Successfully appended bulk results to rolling sheet: {len(built)} keywords, {len(errors)} errors")
+                return url, errors
+
+            if per_keyword_tabs:
+                sheets = [(f"{keyword}_{timestamp}"[:31], keyword_rows) for keyword, keyword_rows in built]
+                if errors:
+                    sheets.append((f"errors_{timestamp}", self._build_bulk_error_rows(errors, header=True)))
+            else:
+                rows = []
+                for keyword, keyword_rows in built:
+                    # ヘッダー行は先頭の1回だけにする
+                    rows.extend(keyword_rows if not rows else keyword_rows[1:])
+                if not rows:
+                    rows.append(list(RESULT_HEADERS))
+                rows.extend(self._build_bulk_error_rows(errors))
+                sheets = [(f"bulk_{total}件_{timestamp}"[:31], rows)]
+
+            self._add_sheets(sheets)
+
+            logger.info(f"Successfully wrote bulk results to Google Sheets: {len(built)} keywords, {len(errors)} errors, {len(sheets)} sheets")
+            return spreadsheet.url, errors
+
+        except Exception as e:
+            logger.error(f"Failed to write bulk results to Google Sheets: {str(e)}")
+            raise
+
+    def write_table(self, name: str, rows: List[List[Any]]) -> str:
+        """
+        分析結果などの表を新しいシートに書き込む
+
+        Args:
+            name (str): シート名の接頭辞（後ろに作成日時を付ける）
+            rows (List[List[Any]]): ヘッダー行を含む行データ
+
+        Returns:
+            str: 作成したシートのURL
+        """
+        # キーワードごとのシートの圧縮対象（名前_YYYYMMDD_HHMMSS）にならない形式にする
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        sheet_ids = self._add_sheets([(f"{name}_{timestamp}"[:31], rows)])
+        logger.info(f"Successfully wrote table with {len(rows)} rows to Google Sheets: {name}")
+        return f"{self._get_spreadsheet().url}#gid={sheet_ids[0]}"
+
+    def _build_bulk_error_rows(self, errors: List[Tuple[str, str]], header: bool = False) -> List[List[str]]:
+        """取得に失敗したキーワードの行データを作成する"""
+        rows = [list(RESULT_HEADERS)] if header else []
+        for keyword, message in errors:
+            rows.append([keyword, "エラー", "", "", "", message])
+        return rows
+
+    def append_rows(
+        self,
+        rows: List[List[str]],
+        title: Optional[str] = None,
+        header: Optional[List[str]] = None
+    ) -> str:
+        """
+        結果シートの末尾に行データを1回のリクエストで追記する
+        （シートがなければヘッダー行だけのサイズで作成し、追記に合わせて行を増やす）
+
+        Args:
+            rows (List[List[str]]): 追記する行データ（ヘッダー行は含めない）
+            title (Optional[str]): 追記先のシート名（省略時は日付ごとのローリング結果シート）
+            header (Optional[List[str]]): シートを作成する場合のヘッダー行（省略時は検索結果のヘッダー）
+
+        Returns:
+            str: 追記先シートを開くURL
+        """
+        try:
+            title = title or self.rolling_sheet_title()
+            sheet_id = self._ensure_sheet(title, [list(header or RESULT_HEADERS)])
+            spreadsheet = self._get_spreadsheet()
+            self._call("sheets_append", lambda: spreadsheet.values_append(
+                f"{a1_sheet_name(title)}!A1",
+                {"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+                {"values": rows}
+            ))
+            return f"{spreadsheet.url}#gid={sheet_id}"
+
+        except Exception as e:
+            logger.error(f"Failed to append rows to Google Sheets: {str(e)}")
+            if self._is_stale_metadata_error(e):
+                self.invalidate_cache()
+            raise
+
+    def rolling_sheet_title(self, date: Optional[datetime.date] = None) -> str:
+        """
+        ローリング結果シートのシート名を返す（日単位または月単位で分割）
+
+        Args:
+            date (Optional[datetime.date]): 対象日（省略時は今日）
+
+        Returns:
+            str: シート名（例: results_20240101 / results_202401）
+        """
+        date = date or datetime.date.today()
+        date_format = "%Y%m" if settings.SHEETS_ROLLING_PARTITION == "monthly" else "%Y%m%d"
+        return f"{settings.SHEETS_ROLLING_SHEET_PREFIX}_{date.strftime(date_format)}"
+
+    def _ensure_sheet(self, title: str, header_rows: List[List[str]]) -> int:
+        """
+        指定した名前のシートがなければヘッダー行付きで作成し、シートIDを返す
+
+        Args:
+            title (str): シート名
+            header_rows (List[List[str]]): 作成時に書き込む行データ
+
+        Returns:
+            int: シートID
+        """
+        self._get_spreadsheet()
+        with self._metadata_lock:
+            properties = self._sheet_properties.get(title)
+        if properties is not None:
+            return properties["sheetId"]
+
+        try:
+            return self._add_sheets_with_rows(self._get_spreadsheet(), [(title, header_rows)])[0]
+        except Exception as e:
+            if not self._is_stale_metadata_error(e):
+                raise
+            # 他のプロセスが先に作成していた場合はシート情報を取り直して使う
+            self.invalidate_cache()
+            self._get_spreadsheet()
+            with self._metadata_lock:
+                properties = self._sheet_properties.get(title)
+            if properties is None:
+                raise
+            return properties["sheetId"]
+
+    def build_rows(self, keyword: str, data: Dict[str, Any]) -> List[List[str]]:
+        """
+        抽出済みの検索結果データをシートに書き込む2次元配列に変換する（行ベースで整理）
+
+        Args:
+            keyword (str): 検索キーワード
+            data (Dict[str, Any]): extract_search_dataで抽出したデータ
+
+        Returns:
+            List[List[str]]: ヘッダー行を含む行データ
+        """
+        # ヘッダー行
+        rows = [list(RESULT_HEADERS)]
+
+        # 検索キーワード基本情報
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows.append([keyword, "基本情報", "", "", "", f"検索実行日時: {timestamp}"])
+
+        # サジェスト検索
+        for suggestion in data.get("suggested_searches", [])[:10]:  # 最大10件
+            rows.append([keyword, "サジェスト検索", suggestion, "", "", ""])
+
+        # 関連検索
+        for rel in data.get("related_searches", [])[:10]:  # 最大10件
+            rows.append([keyword, "関連検索", rel, "", "", ""])
+
+        # 通常の検索結果
+        for result in data.get("organic_results", [])[:settings.SHEETS_MAX_ORGANIC_ROWS]:
+            row = self._result_row(keyword, "オーガニック検索結果", result)
+            if result.get("position"):
+                row[5] = f"順位: {result['position']}"
+            rows.append(row)
+
+        # 動画
+        for video in data.get("videos", [])[:10]:  # 最大10件
+            rows.append(self._result_row(keyword, "動画", video))
+
+        # 広告
+        for ad in data.get("ads", [])[:10]:  # 最大10件
+            rows.append(self._result_row(keyword, "広告", ad))
+
+        return rows
+
+    def _result_row(self, keyword: str, data_type: str, result: Dict[str, Any]) -> List[str]:
+        """タイトル・説明・URLを持つ検索結果を1行に変換する"""
+        return [
+            keyword,
+            data_type,
+            result.get("title", "")[:500],  # 500文字制限
+            result.get("description", "")[:500],
+            result.get("url", ""),
+            ""
+        ]
+
+    def _build_error_rows(self, keyword: str, error: Exception) -> List[List[str]]:
+        """エラー発生時に書き込む行データを作成する"""
+        return [
+            ["検索キーワード", "エラー情報", "タイムスタンプ"],
+            [keyword, str(error), datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+        ]
+
+    def _build_rows_or_error(self, keyword: str, data: Dict[str, Any]) -> Tuple[List[List[str]], Optional[Exception]]:
+        """
+        行データを作成する（失敗した場合はエラー情報の行データと発生した例外を返す）
+
+        Returns:
+            Tuple[List[List[str]], Optional[Exception]]: 行データと、作成に失敗した場合の例外
+        """
+        try:
+            return self.build_rows(keyword, data), None
+        except Exception as e:
+            logger.error(f"Error building rows for sheet: {str(e)}")
+            return self._build_error_rows(keyword, e), e
+
+    def _add_sheets(self, sheets: List[Tuple[str, List[List[str]]]]) -> List[int]:
+        """
+        シートを作成してデータを書き込む（シート情報が古かった場合は再取得して1回だけ再試行する）
+
+        Args:
+            sheets (List[Tuple[str, List[List[str]]]]): シート名と行データの組
+
+        Returns:
+            List[int]: 作成したシートのID
+        """
+        try:
+            return self._add_sheets_with_rows(self._get_spreadsheet(), sheets)
+        except Exception as e:
+            if not self._is_stale_metadata_error(e):
+                raise
+            logger.warning(f"Spreadsheet metadata is stale, retrying with fresh metadata: {str(e)}")
+            self.invalidate_cache()
+            return self._add_sheets_with_rows(self._get_spreadsheet(), sheets)
+
+    def _add_sheets_with_rows(
+        self,
+        spreadsheet: gspread.Spreadsheet,
+        sheets: List[Tuple[str, List[List[str]]]]
+    ) -> List[int]:
+        """
+        複数のシートの作成とデータの書き込みをまとめて1回のbatchUpdateで行う
+
+        Args:
+            spreadsheet (gspread.Spreadsheet): 対象のスプレッドシート
+            sheets (List[Tuple[str, List[List[str]]]]): シート名と行データの組
+
+        Returns:
+            List[int]: 作成したシートのID
+        """
+        # シートIDを指定して作成することで、同じリクエスト内で書き込み先として参照できる
+        reserved = self._reserve_sheets([title for title, _ in sheets])
+        requests = []
+        for (title, sheet_id), (_, rows) in zip(reserved, sheets):
+            requests.append({
+                "addSheet": {
+                    "properties": {
+                        "sheetId": sheet_id,
+                        "title": title,
+                        # 書き込むデータに合わせたサイズで作成し、不要なセルを確保しない
+                        "gridProperties": {
+                            "rowCount": max(1, len(rows)),
+                            "columnCount": max([1] + [len(row) for row in rows])
+                        }
+                    }
+                }
+            })
+            requests.append(self._update_cells_request(sheet_id, rows))
+
+        try:
+            self._call("sheets_create", lambda: spreadsheet.batch_update({"requests": requests}))
+        except Exception:
+            self._release_sheets([title for title, _ in reserved])
+            raise
+        return [sheet_id for _, sheet_id in reserved]
+
+    def _update_cells_request(self, sheet_id: int, rows: List[List[str]]) -> Dict[str, Any]:
+        """行データをA1から書き込むupdateCellsリクエストを作成する"""
+        return {
+            "updateCells": {
+                "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+                "rows": [
+                    {"values": [{"userEnteredValue": {"stringValue": str(value)}} for value in row]}
+                    for row in rows
+                ],
+                "fields": "userEnteredValue"
+            }
+        }
+
+    def _replace_sheet_rows(self, sheet: gspread.Worksheet, rows: List[List[str]]) -> None:
+        """シートのクリアとデータの書き込みを1回のbatchUpdateで行う（同じ内容で上書きするため再送しても結果は変わらない）"""
+        self._call("sheets_write", lambda: sheet.spreadsheet.batch_update({
+            "requests": [
+                # rowsを指定しないupdateCellsはシート全体の値をクリアする
+                {"updateCells": {"range": {"sheetId": sheet.id}, "fields": "userEnteredValue"}},
+                self._update_cells_request(sheet.id, rows)
+            ]
+        }), idempotent=True)
+
     def _write_data_to_sheet(self, sheet: gspread.Worksheet, keyword: str, data: Dict[str, Any]):
         """
-        シートにデータを書き込む（行ベースで整理）
+        既存のシートにデータを書き込む（クリアと書き込みを1回のリクエストで行う）
 
         Args:
             sheet (gspread.Worksheet): 書き込み先のシート
@@ -89,79 +693,15 @@ class SheetsService:
             data (Dict[str, Any]): 書き込むデータ
         """
         try:
-            # シートをクリア
-            sheet.clear()
-            
-            # ヘッダー行を書き込む
-            headers = [
-                "検索キーワード", "データ種別", "タイトル", "説明", "URL", "その他情報"
-            ]
-            sheet.append_row(headers)
-
-            # 検索キーワード基本情報
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            sheet.append_row([keyword, "基本情報", "", "", "", f"検索実行日時: {timestamp}"])
-
-            # サジェスト検索
-            suggestions = data.get("suggested_searches", [])
-            if suggestions:
-                for suggestion in suggestions[:10]:  # 最大10件
-                    sheet.append_row([keyword, "サジェスト検索", suggestion, "", "", ""])
-
-            # 関連検索
-            related = data.get("related_searches", [])
-            if related:
-                for rel in related[:10]:  # 最大10件
-                    sheet.append_row([keyword, "関連検索", rel, "", "", ""])
-
-            # 通常の検索結果
-            organic_results = data.get("organic_results", [])
-            if organic_results:
-                for result in organic_results[:20]:  # 最大20件
-                    sheet.append_row([
-                        keyword, 
-                        "オーガニック検索結果", 
-                        result.get("title", "")[:500],  # 500文字制限
-                        result.get("description", "")[:500], 
-                        result.get("url", ""), 
-                        ""
-                    ])
-
-            # 動画
-            videos = data.get("videos", [])
-            if videos:
-                for video in videos[:10]:  # 最大10件
-                    sheet.append_row([
-                        keyword, 
-                        "動画", 
-                        video.get("title", "")[:500], 
-                        video.get("description", "")[:500], 
-                        video.get("url", ""), 
-                        ""
-                    ])
-
-            # 広告
-            ads = data.get("ads", [])
-            if ads:
-                for ad in ads[:10]:  # 最大10件
-                    sheet.append_row([
-                        keyword, 
-                        "広告", 
-                        ad.get("title", "")[:500], 
-                        ad.get("description", "")[:500], 
-                        ad.get("url", ""), 
-                        ""
-                    ])
-
-            logger.info(f"Successfully wrote {len(organic_results)} organic results, {len(videos)} videos, {len(ads)} ads to sheet")
+            rows = self.build_rows(keyword, data)
+            self._replace_sheet_rows(sheet, rows)
+            logger.info(f"Successfully wrote {len(rows)} rows to sheet")
 
         except Exception as e:
             logger.error(f"Error writing data to sheet: {str(e)}")
             # エラーが発生してもシステム全体を止めないよう、基本情報だけでも書き込む
             try:
-                sheet.clear()
-                sheet.append_row(["検索キーワード", "エラー情報", "タイムスタンプ"])
-                sheet.append_row([keyword, str(e), datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+                self._replace_sheet_rows(sheet, self._build_error_rows(keyword, e))
             except:
                 pass
             raise
@@ -0,0 +1,155 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils.logger import logger
+
+
+class SheetsWriteBuffer:
+    """
+    複数ジョブの行データをメモリに溜め、一定間隔または一定行数ごとに
+    1回の追記リクエストでスプレッドシートに書き込むクラス（ライトビハインド）
+    """
+
+    def __init__(
+        self,
+        sheets_service,
+        flush_interval_seconds: float,
+        flush_max_rows: int,
+        max_buffered_rows: int,
+        put_timeout_seconds: float
+    ):
+        self.sheets_service = sheets_service
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_max_rows = max(1, flush_max_rows)
+        self.max_buffered_rows = max(self.flush_max_rows, max_buffered_rows)
+        self.put_timeout_seconds = put_timeout_seconds
+
+        self._pending: List[Tuple[List[List[str]], Future]] = []
+        self._pending_rows = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._stats = {
+            "flushes": 0,
+            "flushed_rows": 0,
+            "failed_flushes": 0,
+            "rejected": 0
+        }
+
+        self._thread = threading.Thread(target=self._flush_loop, name="sheets-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: List[List[str]]) -> Future:
+        """
+        行データをバッファに追加する（バッファが満杯の場合は空くまで待機する）
+
+        Args:
+            rows (List[List[str]]): 追記する行データ
+
+        Returns:
+            Future: 書き込みが確定するとスプレッドシートのURLが設定されるFuture
+        """
+        future: Future = Future()
+        deadline = time.monotonic() + self.put_timeout_seconds
+
+        with self._condition:
+            # バッファが満杯の間は呼び出し元を待たせて流入を抑える
+            while not self._closed and self._pending_rows + len(rows) > self.max_buffered_rows and self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["rejected"] += 1
+                    raise Exception("スプレッドシートへの書き込みが混み合っています。しばらく経ってから再度お試しください。")
+                self._condition.notify_all()
+                self._condition.wait(remaining)
+
+            if self._closed:
+                raise Exception("スプレッドシートへの書き込みを停止しています。")
+
+            self._pending.append((rows, future))
+            self._pending_rows += len(rows)
+            if self._pending_rows >= self.flush_max_rows:
+                self._condition.notify_all()
+
+        return future
+
+    def _flush_loop(self) -> None:
+        """一定間隔または一定行数ごとにバッファを書き込む"""
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval_seconds
+                while not self._closed and self._pending_rows < self.flush_max_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                closed = self._closed
+                batch = self._take_batch()
+
+            if batch:
+                self._flush(batch)
+
+            if closed:
+                with self._condition:
+                    if not self._pending:
+                        break
+
+    def _take_batch(self) -> List[Tuple[List[List[str]], Future]]:
+        """書き込む分をバッファから取り出す（ロック取得済みで呼ぶこと）"""
+        batch = []
+        rows = 0
+        while self._pending and (not batch or rows + len(self._pending[0][0]) <= self.flush_max_rows):
+            item = self._pending.pop(0)
+            batch.append(item)
+            rows += len(item[0])
+        self._pending_rows -= rows
+        # 空きができたので待機中の呼び出し元を再開させる
+        self._condition.notify_all()
+        return batch
+
+    def _flush(self, batch: List[Tuple[List[List[str]], Future]]) -> None:
+        """
+        取り出した行データを1回の追記リクエストで書き込み、各Futureに結果を設定する
+
+        Args:
+            batch (List[Tuple[List[List[str]], Future]]): 行データとFutureの組
+        """
+        rows = [row for item_rows, _ in batch for row in item_rows]
+        try:
+            url = self.sheets_service.append_rows(rows)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(rows)} buffered rows to Google Sheets: {str(e)}")
+            with self._condition:
+                self._stats["failed_flushes"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._condition:
+            self._stats["flushes"] += 1
+            self._stats["flushed_rows"] += len(rows)
+        logger.info(f"Flushed {len(rows)} buffered rows from {len(batch)} jobs to Google Sheets")
+        for _, future in batch:
+            future.set_result(url)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        新しい書き込みの受け付けを止め、バッファに残っている行を書き込んでから停止する
+
+        Args:
+            timeout (Optional[float]): 書き込み完了を待つ最大秒数
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        logger.info("Sheets write-behind buffer stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        """バッファの状態を返す"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats["buffered_rows"] = self._pending_rows
+            stats["buffered_jobs"] = len(self._pending)
+            stats["max_buffered_rows"] = self.max_buffered_rows
+        return stats
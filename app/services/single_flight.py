@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.utils.logger import SAMPLED, logger
+
+
+class _Call:
+    """実行中または直近に完了した呼び出し"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.finished_at: Optional[float] = None
+
+
+class SingleFlight:
+    """
+    同じキーの処理が同時に要求された場合に、1回の実行結果を全員で共有するクラス
+    （完了後もwindow_seconds秒間は結果を共有する）
+    """
+
+    def __init__(self, window_seconds: float = 0.0):
+        self.window_seconds = window_seconds
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        キーごとに1回だけfuncを実行し、その結果を返す
+
+        Args:
+            key (str): 処理をまとめるためのキー
+            func (Callable[[], Any]): 実行する処理
+
+        Returns:
+            Tuple[Any, bool]: 実行結果と、他の呼び出しの結果を共有したかどうか
+        """
+        with self._lock:
+            self._purge(time.monotonic())
+            call = self._calls.get(key)
+            if call is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            logger.info("Joined in-flight request for key: %s", key, extra=SAMPLED)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                call.finished_at = time.monotonic()
+                # 失敗した結果は共有し続けず、次の要求で再実行させる
+                if call.error is not None or self.window_seconds <= 0:
+                    self._calls.pop(key, None)
+            call.done.set()
+
+        return call.result, False
+
+    def _purge(self, now: float) -> None:
+        """共有期間を過ぎた結果を削除する（ロック取得済みで呼ぶこと）"""
+        expired = [
+            key for key, call in self._calls.items()
+            if call.finished_at is not None and now - call.finished_at >= self.window_seconds
+        ]
+        for key in expired:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """実行回数と共有回数を返す"""
+        with self._lock:
+            return {
+                "in_flight": sum(1 for call in self._calls.values() if call.finished_at is None),
+                "executed": self._executed,
+                "coalesced": self._coalesced,
+                "window_seconds": self.window_seconds
+            }
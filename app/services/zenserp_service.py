@@ -1,8 +1,27 @@
-import requests
-from typing import Dict, Any, Optional
-from app.config import get_settings
-from app.utils.logger import logger
+import asyncio
+import contextvars
+import httpx
+import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from app.config import get_settings
+from app.utils.logger import SAMPLED, logger
+from app.utils.http_timing import RequestTimings
+from app.utils.metrics import UPSTREAM_RETRIES, classify_error, record_upstream_error, record_upstream_success, stage, timed
+from app.services.serp_cache import get_serp_cache
+from app.services.rate_limiter import QuotaExceededError, get_quota_budget, get_rate_limiter
+from app.services.resilience import (
+    FAILURE_REASONS,
+    backoff_delay,
+    get_circuit_breaker,
+    hedged_call,
+    hedged_call_async,
+    parse_retry_after
+)
+from app.services.serp_records import SearchData, extract
+from app.utils import json_codec
+from app.utils.urls import normalize_url
 
 settings = get_settings()
 
@@ -11,164 +30,670 @@ class ZenserpService:
 
     def __init__(self):
         self.api_key = settings.ZENSERP_API_KEY
-        self.base_url = "https://app.zenserp.com/api/v2/search"
+        self.base_url = settings.ZENSERP_BASE_URL
         self.headers = {
             "apikey": self.api_key
         }
+        self.cache = get_serp_cache()
+        self.rate_limiter = get_rate_limiter()
+        self.quota = get_quota_budget()
+        # 障害時に呼び出しを遮断するサーキットブレーカー（プロセス全体で共有）
+        self.breaker = get_circuit_breaker("zenserp")
+
+        # 接続を使い回すための長寿命クライアント（Keep-Alive有効）
+        self.timeout = httpx.Timeout(
+            settings.ZENSERP_READ_TIMEOUT,
+            connect=settings.ZENSERP_CONNECT_TIMEOUT
+        )
+        self.limits = httpx.Limits(
+            max_connections=settings.ZENSERP_POOL_SIZE,
+            max_keepalive_connections=settings.ZENSERP_POOL_SIZE,
+            keepalive_expiry=settings.ZENSERP_KEEPALIVE_EXPIRY
+        )
+        self.client = httpx.Client(headers=self.headers, timeout=self.timeout, limits=self.limits)
+        # 非同期クライアントはイベントループ上で初めて使うときに作成する
+        self._async_client: Optional[httpx.AsyncClient] = None
+        # ヘッジするリクエストを実行するスレッドプール（ヘッジを有効にした場合に初めて使うときに作成する）
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+
+        # APIから新しく取得した検索結果を受け取るリスナー（キャッシュヒット時は呼ばれない）
+        self.fetch_listeners: List[Callable[[str, Dict[str, Any], Dict[str, Any]], None]] = []
+
+    def build_params(self, keyword: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Zenserp APIに渡す検索パラメータを作成する
+
+        Args:
+            keyword (str): 検索キーワード
+            options (Optional[Dict[str, Any]]): 既定値を上書きするパラメータ（gl / hl / num / deviceなど）
+
+        Returns:
+            Dict[str, Any]: 検索パラメータ
+        """
+        params = {
+            "q": keyword,
+            "gl": "jp",  # 日本向けの検索結果
+            "hl": "ja",  # 日本語の結果
+            "num": 20,   # 20件の結果を取得
+            "device": "desktop",  # デスクトップ版の結果
+        }
+        if options:
+            params.update({key: value for key, value in options.items() if value is not None})
+        return params
+
+    def search(
+        self,
+        keyword: str,
+        force_refresh: bool = False,
+        options: Optional[Dict[str, Any]] = None,
+        pages: int = 1
+    ) -> Dict[str, Any]:
+        """
+        Google検索を実行し、結果を取得する（キャッシュがあればキャッシュから返す）
+
+        Args:
+            keyword (str): 検索キーワード
+            force_refresh (bool): Trueの場合はキャッシュを使わずにAPIから再取得する
+            options (Optional[Dict[str, Any]]): 既定値を上書きする検索パラメータ
+            pages (int): 取得するページ数（2以上の場合は各ページを並行取得して1つの結果にまとめる）
+
+        Returns:
+            Dict[str, Any]: 検索結果
+        """
+        params = self.build_params(keyword, options)
+        pages = self._page_count(pages)
+
+        if self.cache is None:
+            return self._fetch_pages(keyword, params, pages)
+
+        cache_key = self.cache.make_key(self._cache_params(params, pages))
+        if not force_refresh:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("Zenserp cache hit for keyword: %s", keyword, extra=SAMPLED)
+                return cached
+
+        data = self._fetch_pages(keyword, params, pages)
+        # 一部のページが欠けた結果はキャッシュせず、次回は改めてすべてのページを取得する
+        if not self._is_partial(data):
+            self.cache.set(cache_key, data)
+        return data
+
+    async def search_async(
+        self,
+        keyword: str,
+        force_refresh: bool = False,
+        options: Optional[Dict[str, Any]] = None,
+        pages: int = 1
+    ) -> Dict[str, Any]:
+        """
+        searchの非同期版（スレッドを使わずにイベントループ上で複数の検索を並行実行できる）
+
+        Args:
+            keyword (str): 検索キーワード
+            force_refresh (bool): Trueの場合はキャッシュを使わずにAPIから再取得する
+            options (Optional[Dict[str, Any]]): 既定値を上書きする検索パラメータ
+            pages (int): 取得するページ数（2以上の場合は各ページを並行取得して1つの結果にまとめる）
+
+        Returns:
+            Dict[str, Any]: 検索結果
+        """
+        params = self.build_params(keyword, options)
+        pages = self._page_count(pages)
+
+        if self.cache is None:
+            return await self._fetch_pages_async(keyword, params, pages)
+
+        cache_key = self.cache.make_key(self._cache_params(params, pages))
+        if not force_refresh:
+            # ディスクキャッシュの読み込みでイベントループを止めないようにする
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                logger.info("Zenserp cache hit for keyword: %s", keyword, extra=SAMPLED)
+                return cached
+
+        data = await self._fetch_pages_async(keyword, params, pages)
+        if not self._is_partial(data):
+            await asyncio.to_thread(self.cache.set, cache_key, data)
+        return data
+
+    def _page_count(self, pages: int) -> int:
+        """取得するページ数を上限の範囲に収める"""
+        return min(max(1, pages), settings.ZENSERP_DEEP_MAX_PAGES)
+
+    def _cache_params(self, params: Dict[str, Any], pages: int) -> Dict[str, Any]:
+        """キャッシュキーに使うパラメータ（複数ページの結果は1ページの結果と区別する）"""
+        return dict(params, pages=pages) if pages > 1 else params
+
+    def _page_params(self, params: Dict[str, Any], pages: int) -> List[Dict[str, Any]]:
+        """各ページの検索パラメータ（startで開始位置をずらす）を作成する"""
+        return [dict(params, start=page * int(params["num"])) for page in range(pages)]
+
+    def _is_partial(self, data: Dict[str, Any]) -> bool:
+        """一部のページの取得に失敗した結果かどうか"""
+        return bool(data.get("deep_serp", {}).get("partial"))
+
+    def _fetch_pages(self, keyword: str, params: Dict[str, Any], pages: int) -> Dict[str, Any]:
+        """
+        複数のページを並行して取得し、1つの検索結果にまとめる
+        （各ページのリクエストは共有のレート制限と月間利用枠に従う）
+
+        Args:
+            keyword (str): 検索キーワード
+            params (Dict[str, Any]): 1ページ目の検索パラメータ
+            pages (int): ページ数
 
-    def search(self, keyword: str) -> Dict[str, Any]:
+        Returns:
+            Dict[str, Any]: まとめた検索結果
         """
-        Google検索を実行し、結果を取得する
+        if pages == 1:
+            return self._fetch(keyword, params)
+
+        workers = min(pages, settings.ZENSERP_DEEP_CONCURRENCY)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zenserp-page") as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._fetch, keyword, page_params, False)
+                for page_params in self._page_params(params, pages)
+            ]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+
+        data = self._merge_pages(keyword, params, results)
+        self._notify_fetched(keyword, self._cache_params(params, pages), data)
+        return data
+
+    async def _fetch_pages_async(self, keyword: str, params: Dict[str, Any], pages: int) -> Dict[str, Any]:
+        """
+        _fetch_pagesの非同期版
 
         Args:
             keyword (str): 検索キーワード
+            params (Dict[str, Any]): 1ページ目の検索パラメータ
+            pages (int): ページ数
+
+        Returns:
+            Dict[str, Any]: まとめた検索結果
+        """
+        if pages == 1:
+            return await self._fetch_async(keyword, params)
+
+        semaphore = asyncio.Semaphore(settings.ZENSERP_DEEP_CONCURRENCY)
+
+        async def fetch_page(page_params: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._fetch_async(keyword, page_params, False)
+
+        results = await asyncio.gather(
+            *(fetch_page(page_params) for page_params in self._page_params(params, pages)),
+            return_exceptions=True
+        )
+        data = self._merge_pages(keyword, params, list(results))
+        self._notify_fetched(keyword, self._cache_params(params, pages), data)
+        return data
+
+    def _merge_pages(self, keyword: str, params: Dict[str, Any], results: List[Any]) -> Dict[str, Any]:
+        """
+        ページごとの検索結果を、重複を除いた1つの通常検索結果のリストにまとめる
+        （順位は全体での絶対順位。取得に失敗したページの分は欠番になる）
+
+        Args:
+            keyword (str): 検索キーワード（ログ出力用）
+            params (Dict[str, Any]): 1ページ目の検索パラメータ
+            results (List[Any]): ページ順の検索結果（失敗したページは例外）
+
+        Returns:
+            Dict[str, Any]: まとめた検索結果
+        """
+        failed_pages = [page for page, result in enumerate(results, start=1) if isinstance(result, BaseException)]
+        fetched = [(page, result) for page, result in enumerate(results, start=1) if not isinstance(result, BaseException)]
+        if not fetched:
+            raise results[0]
+
+        # 通常検索結果以外（広告・関連検索など）は取得できた最初のページのものを使う
+        merged = dict(fetched[0][1])
+        organic = []
+        seen = set()
+        page_size = int(params["num"])
+        for page, result in fetched:
+            for rank, item in enumerate(result.get("organic") or [], start=1):
+                if not isinstance(item, dict):
+                    continue
+                # 前後のページで同じURLが出た場合は上位のものだけを残す
+                url = item.get("link") or item.get("url") or ""
+                if url:
+                    key = normalize_url(url)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                organic.append(dict(item, position=(page - 1) * page_size + rank))
+        merged["organic"] = organic
+        merged["deep_serp"] = {
+            "pages_requested": len(results),
+            "pages_fetched": len(fetched),
+            "failed_pages": failed_pages,
+            "partial": bool(failed_pages)
+        }
+
+        if failed_pages:
+            logger.warning(f"Deep SERP for keyword {keyword} is partial: failed pages {failed_pages}")
+        logger.info(f"Merged {len(fetched)}/{len(results)} pages into {len(organic)} organic results for keyword: {keyword}")
+        return merged
+
+    def _fetch(self, keyword: str, params: Dict[str, Any], notify: bool = True) -> Dict[str, Any]:
+        """
+        Zenserp APIを呼び出して検索結果を取得する
+
+        Args:
+            keyword (str): 検索キーワード（ログ出力用）
+            params (Dict[str, Any]): 検索パラメータ
+            notify (bool): 取得した結果をリスナーに渡すかどうか（ページごとの取得ではまとめた後に渡す）
 
         Returns:
             Dict[str, Any]: 検索結果
         """
+        # 遮断中の場合はAPIを呼ばずにすぐ失敗させる
+        self.breaker.before_call()
+
+        attempt = 0
         try:
-            params = {
-                "q": keyword,
-                "gl": "jp",  # 日本向けの検索結果
-                "hl": "ja",  # 日本語の結果
-                "num": 20,   # 20件の結果を取得
-                "device": "desktop",  # デスクトップ版の結果
-            }
-
-            logger.info(f"Starting Zenserp API request for keyword: {keyword}")
-            
-            # レート制限を考慮して少し待機
-            time.sleep(1)
-            
-            response = requests.get(
-                self.base_url,
-                headers=self.headers,
-                params=params,
-                timeout=30  # 30秒タイムアウト
+            logger.info("Starting Zenserp API request for keyword: %s", keyword, extra=SAMPLED)
+
+            while True:
+                # 再試行も1回のリクエストとして月間の利用枠を消費する（超えている場合はAPIを呼ばずに失敗させる）
+                self.quota.consume()
+                # プロセス全体で共有するレート制限に従って待機
+                self.rate_limiter.acquire()
+
+                try:
+                    response, timings = self._send(params)
+                except httpx.TransportError as e:
+                    delay = self._retry_delay(attempt, error=e)
+                    if delay is None:
+                        raise
+                    self._refund_unbilled(error=e)
+                else:
+                    delay = self._retry_delay(attempt, response=response)
+                    if delay is None:
+                        break
+                    self._refund_unbilled(response=response)
+                attempt += 1
+                if delay > 0:
+                    time.sleep(delay)
+
+            data = self._parse_response(keyword, response, timings)
+
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            raise self._translate_error(keyword, e, attempt)
+
+        if notify:
+            self._notify_fetched(keyword, params, data)
+        return data
+
+    async def _fetch_async(self, keyword: str, params: Dict[str, Any], notify: bool = True) -> Dict[str, Any]:
+        """
+        _fetchの非同期版
+
+        Args:
+            keyword (str): 検索キーワード（ログ出力用）
+            params (Dict[str, Any]): 検索パラメータ
+            notify (bool): 取得した結果をリスナーに渡すかどうか
+
+        Returns:
+            Dict[str, Any]: 検索結果
+        """
+        self.breaker.before_call()
+
+        attempt = 0
+        try:
+            logger.info("Starting async Zenserp API request for keyword: %s", keyword, extra=SAMPLED)
+
+            while True:
+                self.quota.consume()
+                wait = self.rate_limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                try:
+                    response, timings = await self._send_async(params)
+                except httpx.TransportError as e:
+                    delay = self._retry_delay(attempt, error=e)
+                    if delay is None:
+                        raise
+                    self._refund_unbilled(error=e)
+                else:
+                    delay = self._retry_delay(attempt, response=response)
+                    if delay is None:
+                        break
+                    self._refund_unbilled(response=response)
+                attempt += 1
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            data = self._parse_response(keyword, response, timings)
+
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            raise self._translate_error(keyword, e, attempt)
+
+        if notify:
+            self._notify_fetched(keyword, params, data)
+        return data
+
+    def _notify_fetched(self, keyword: str, params: Dict[str, Any], data: Dict[str, Any]) -> None:
+        """新しく取得した検索結果をリスナーに渡す（リスナーの失敗は検索結果に影響させない）"""
+        for listener in self.fetch_listeners:
+            try:
+                listener(keyword, params, data)
+            except Exception as e:
+                logger.error(f"Fetch listener failed: {str(e)}")
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """非同期クライアントを取得する（初回のみ作成）"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=self.limits)
+        return self._async_client
+
+    def _send(self, params: Dict[str, Any]) -> Tuple[httpx.Response, RequestTimings]:
+        """
+        リクエストを1回送信する（ヘッジを有効にした場合は、応答が遅ければ同じリクエストをもう1つ送る）
+
+        Args:
+            params (Dict[str, Any]): 検索パラメータ
+
+        Returns:
+            Tuple[httpx.Response, RequestTimings]: 先に返ったレスポンスと所要時間
+        """
+        if settings.ZENSERP_HEDGE_AFTER_SECONDS <= 0:
+            return self._request(params)
+        return hedged_call(
+            self._get_hedge_executor(),
+            lambda: self._request(params),
+            settings.ZENSERP_HEDGE_AFTER_SECONDS,
+            self._reserve_hedge,
+            "zenserp"
+        )
+
+    async def _send_async(self, params: Dict[str, Any]) -> Tuple[httpx.Response, RequestTimings]:
+        """_sendの非同期版（遅れた方のリクエストはキャンセルする）"""
+        if settings.ZENSERP_HEDGE_AFTER_SECONDS <= 0:
+            return await self._request_async(params)
+        return await hedged_call_async(
+            lambda: self._request_async(params),
+            settings.ZENSERP_HEDGE_AFTER_SECONDS,
+            self._reserve_hedge,
+            "zenserp"
+        )
+
+    def _request(self, params: Dict[str, Any]) -> Tuple[httpx.Response, RequestTimings]:
+        """
+        Zenserp APIにリクエストを送信し、結果をサーキットブレーカーに記録する
+
+        Args:
+            params (Dict[str, Any]): 検索パラメータ
+
+        Returns:
+            Tuple[httpx.Response, RequestTimings]: レスポンスと所要時間
+        """
+        timings = RequestTimings()
+        started = time.perf_counter()
+        try:
+            with stage("zenserp_fetch"):
+                response = self.client.get(
+                    self.base_url,
+                    params=params,
+                    extensions={"trace": timings.trace}
+                )
+        except Exception as e:
+            self.breaker.record(classify_error(e), time.perf_counter() - started)
+            raise
+        timings.finish()
+        self.breaker.record(self._failure_reason(response), time.perf_counter() - started)
+        return response, timings
+
+    async def _request_async(self, params: Dict[str, Any]) -> Tuple[httpx.Response, RequestTimings]:
+        """_requestの非同期版"""
+        timings = RequestTimings()
+        started = time.perf_counter()
+        try:
+            with stage("zenserp_fetch"):
+                response = await self._get_async_client().get(
+                    self.base_url,
+                    params=params,
+                    extensions={"trace": timings.async_trace}
+                )
+        except asyncio.CancelledError:
+            # ヘッジで先に結果が返ったためにキャンセルした場合は、成否を記録しない
+            raise
+        except Exception as e:
+            self.breaker.record(classify_error(e), time.perf_counter() - started)
+            raise
+        timings.finish()
+        self.breaker.record(self._failure_reason(response), time.perf_counter() - started)
+        return response, timings
+
+    def _refund_unbilled(self, response: Optional[httpx.Response] = None, error: Optional[Exception] = None) -> None:
+        """
+        再試行する失敗のうち、APIの利用回数に数えられないもの（接続できなかった・429）の分の利用枠を戻す
+        （最後の失敗の分は_translate_errorで戻す）
+
+        Args:
+            response (Optional[httpx.Response]): APIのレスポンス
+            error (Optional[Exception]): リクエストで発生した例外
+        """
+        if response is not None and response.status_code == 429:
+            self.quota.refund()
+        elif isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            self.quota.refund()
+
+    def _failure_reason(self, response: httpx.Response) -> Optional[str]:
+        """レスポンスのHTTPステータスをサーキットブレーカーに記録する形式にする（成功した場合はNone）"""
+        return str(response.status_code) if response.status_code >= 400 else None
+
+    def _reserve_hedge(self) -> bool:
+        """
+        ヘッジするリクエストの分のレート制限と月間利用枠を確保する
+        （遮断の判定中、またはすぐに送れない場合はヘッジしない）
+
+        Returns:
+            bool: 確保できた場合はTrue
+        """
+        if not self.breaker.allows_retry() or not self.rate_limiter.try_acquire():
+            return False
+        try:
+            self.quota.consume()
+        except QuotaExceededError:
+            return False
+        logger.info(f"Zenserp API response is slow, sending a hedged request after {settings.ZENSERP_HEDGE_AFTER_SECONDS}s")
+        return True
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """ヘッジするリクエストを実行するスレッドプールを取得する（初回のみ作成）"""
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=settings.ZENSERP_POOL_SIZE * 2,
+                thread_name_prefix="zenserp-hedge"
             )
-            
-            # HTTPエラーチェック
-            response.raise_for_status()
-
-            data = response.json()
-            
-            # APIレスポンスの基本チェック
-            if "error" in data:
-                raise Exception(f"Zenserp API error: {data['error']}")
-            
-            logger.info(f"Zenserp API request successful for keyword: {keyword}")
+        return self._hedge_executor
+
+    def _retry_delay(
+        self,
+        attempt: int,
+        response: Optional[httpx.Response] = None,
+        error: Optional[Exception] = None
+    ) -> Optional[float]:
+        """
+        再試行する場合は待機秒数を返す
+        （429はRetry-Afterに従ってレート制限で待機させ、タイムアウト・接続エラー・5xxは
+        遮断されていなければ、ばらつかせた指数的な待機時間で再試行する）
+
+        Args:
+            attempt (int): これまでの再試行回数
+            response (Optional[httpx.Response]): APIのレスポンス
+            error (Optional[Exception]): リクエストで発生した例外
+
+        Returns:
+            Optional[float]: この場で待機する秒数（再試行しない場合はNone）
+        """
+        if response is not None and response.status_code == 429:
+            if attempt >= settings.ZENSERP_MAX_RETRIES_ON_429:
+                return None
+            delay = self._retry_after(response, attempt)
+            if delay is None:
+                # Retry-Afterが上限を超える場合はその場で待たずに失敗させる（ジョブキューの再試行に任せる）
+                return None
+            logger.warning(f"Zenserp API rate limited, retrying in {delay:.1f}s (attempt {attempt + 1})")
+            # 待機はレート制限で行う（他のリクエストも同じ時間だけ止める）
+            self.rate_limiter.on_throttled(delay)
+            record_upstream_error("zenserp", "429")
+            return 0.0
+
+        reason = self._failure_reason(response) if response is not None else classify_error(error)
+        if (
+            reason not in FAILURE_REASONS
+            or attempt >= settings.ZENSERP_MAX_RETRIES_ON_ERROR
+            or not self.breaker.allows_retry()
+        ):
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        delay = backoff_delay(attempt, settings.UPSTREAM_RETRY_BASE_SECONDS, settings.UPSTREAM_RETRY_MAX_SECONDS, retry_after)
+        if delay is None:
+            return None
+        logger.warning(f"Zenserp API request failed ({reason}), retrying in {delay:.1f}s (attempt {attempt + 1})")
+        record_upstream_error("zenserp", reason)
+        UPSTREAM_RETRIES.inc("zenserp", reason)
+        return delay
+
+    def _parse_response(self, keyword: str, response: httpx.Response, timings: RequestTimings) -> Dict[str, Any]:
+        """
+        レスポンスをチェックして検索結果を取り出す
+
+        Args:
+            keyword (str): 検索キーワード（ログ出力用）
+            response (httpx.Response): APIのレスポンス
+            timings (RequestTimings): リクエストの所要時間
+
+        Returns:
+            Dict[str, Any]: 検索結果
+        """
+        # HTTPエラーチェック
+        response.raise_for_status()
+        self.rate_limiter.on_success()
+        record_upstream_success("zenserp")
+
+        # orjsonがあれば使い、大きなレスポンスの変換を速くする
+        data = json_codec.loads(response.content)
+        
+        # APIレスポンスの基本チェック
+        if "error" in data:
+            raise Exception(f"Zenserp API error: {data['error']}")
+        
+        # 件数が多いため、間引かれた場合や出力しないレベルの場合はメッセージを組み立てない
+        logger.info("Zenserp API request successful for keyword: %s (%s)", keyword, timings, extra=SAMPLED)
+        if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f"Response keys: {list(data.keys())}")
-            
-            return data
+        
+        return data
 
-        except requests.exceptions.Timeout:
+    def _translate_error(self, keyword: str, error: Exception, attempt: int) -> Exception:
+        """
+        HTTPクライアントの例外をユーザー向けのメッセージを持つ例外に変換する
+
+        Args:
+            keyword (str): 検索キーワード（ログ出力用）
+            error (Exception): 発生した例外
+            attempt (int): これまでの再試行回数
+
+        Returns:
+            Exception: 呼び出し元に送出する例外
+        """
+        record_upstream_error("zenserp", classify_error(error))
+        if isinstance(error, httpx.TimeoutException):
             logger.error(f"Zenserp API request timeout for keyword: {keyword}")
-            raise Exception("検索APIのタイムアウトが発生しました。しばらく経ってから再度お試しください。")
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 401:
+            if isinstance(error, httpx.ConnectTimeout):
+                self.quota.refund()
+            return Exception("検索APIのタイムアウトが発生しました。しばらく経ってから再度お試しください。")
+        if isinstance(error, httpx.HTTPStatusError):
+            if error.response.status_code == 401:
                 logger.error("Zenserp API authentication failed")
-                raise Exception("API認証に失敗しました。APIキーを確認してください。")
-            elif e.response.status_code == 429:
+                self.quota.refund()
+                return Exception("API認証に失敗しました。APIキーを確認してください。")
+            elif error.response.status_code == 429:
                 logger.error("Zenserp API rate limit exceeded")
-                raise Exception("API利用制限に達しました。しばらく経ってから再度お試しください。")
+                # Retry-Afterが上限を超える場合も、他のリクエストを止めるのは上限の秒数までにする
+                delay = self._retry_after(error.response, attempt)
+                self.rate_limiter.on_throttled(settings.UPSTREAM_RETRY_MAX_SECONDS if delay is None else delay)
+                self.quota.refund()
+                return Exception("API利用制限に達しました。しばらく経ってから再度お試しください。")
             else:
-                logger.error(f"Zenserp API HTTP error: {e}")
-                raise Exception(f"検索APIでエラーが発生しました: {e}")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Zenserp API request failed: {str(e)}")
-            raise Exception("検索APIへの接続に失敗しました。ネットワーク接続を確認してください。")
+                logger.error(f"Zenserp API HTTP error: {error}")
+                return Exception(f"検索APIでエラーが発生しました: {error}")
+        if isinstance(error, httpx.ConnectError):
+            logger.error(f"Zenserp API connection failed: {str(error)}")
+            self.quota.refund()
+            return Exception("検索APIへの接続に失敗しました。ネットワーク接続を確認してください。")
+        if isinstance(error, httpx.RequestError):
+            logger.error(f"Zenserp API request failed: {str(error)}")
+            return Exception("検索APIへの接続に失敗しました。ネットワーク接続を確認してください。")
+        return error
 
-    def extract_search_data(self, search_result: Dict[str, Any]) -> Dict[str, Any]:
+    def _retry_after(self, response: httpx.Response, attempt: int) -> Optional[float]:
         """
-        検索結果から必要なデータを抽出する
+        429レスポンスから次のリクエストまでの待機秒数を求める
 
         Args:
-            search_result (Dict[str, Any]): Zenserp APIの検索結果
+            response (httpx.Response): 429レスポンス
+            attempt (int): これまでの再試行回数
 
         Returns:
-            Dict[str, Any]: 抽出されたデータ
-        """
-        extracted_data = {
-            "organic_results": [],
-            "suggested_searches": [],
-            "related_searches": [],
-            "vertical_searches": [],
-            "related_questions": [],
-            "videos": [],
-            "ads": [],
-            "rich_results": [],
-            "knowledge_panel": None,
-            "local_pack": None,
-            "featured_snippets": []
-        }
+            Optional[float]: 待機秒数（Retry-Afterがない場合は指数的に増やし、ばらつかせる。
+            UPSTREAM_RETRY_MAX_SECONDSを超える場合は、その場では再試行しないためNone）
+        """
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        return backoff_delay(attempt, settings.ZENSERP_429_BACKOFF_SECONDS, settings.UPSTREAM_RETRY_MAX_SECONDS, retry_after)
 
-        try:
-            # 通常の検索結果
-            if "organic" in search_result and isinstance(search_result["organic"], list):
-                for result in search_result["organic"]:
-                    extracted_data["organic_results"].append({
-                        "title": self._safe_get(result, "title"),
-                        "description": self._safe_get(result, "description"),
-                        "url": self._safe_get(result, "link")
-                    })
-
-            # サジェスト検索
-            if "suggested_searches" in search_result and isinstance(search_result["suggested_searches"], list):
-                extracted_data["suggested_searches"] = [
-                    item.get("query", "") if isinstance(item, dict) else str(item)
-                    for item in search_result["suggested_searches"]
-                ]
-
-            # 関連検索
-            if "related_searches" in search_result and isinstance(search_result["related_searches"], list):
-                extracted_data["related_searches"] = [
-                    item.get("query", "") if isinstance(item, dict) else str(item)
-                    for item in search_result["related_searches"]
-                ]
-
-            # 関連する質問
-            if "people_also_ask" in search_result and isinstance(search_result["people_also_ask"], list):
-                extracted_data["related_questions"] = [
-                    item.get("question", "") if isinstance(item, dict) else str(item)
-                    for item in search_result["people_also_ask"]
-                ]
-
-            # 動画
-            if "videos" in search_result and isinstance(search_result["videos"], list):
-                for video in search_result["videos"]:
-                    extracted_data["videos"].append({
-                        "title": self._safe_get(video, "title"),
-                        "description": self._safe_get(video, "description"),
-                        "url": self._safe_get(video, "link")
-                    })
-
-            # 広告
-            if "ads" in search_result and isinstance(search_result["ads"], list):
-                for ad in search_result["ads"]:
-                    extracted_data["ads"].append({
-                        "title": self._safe_get(ad, "title"),
-                        "description": self._safe_get(ad, "description"),
-                        "url": self._safe_get(ad, "link")
-                    })
-
-            # その他のデータも安全に抽出
-            for key in ["rich_results", "knowledge_panel", "local_pack", "featured_snippets"]:
-                if key in search_result:
-                    extracted_data[key] = search_result[key]
-
-            logger.info(f"Extracted data: {len(extracted_data['organic_results'])} organic results, "
-                       f"{len(extracted_data['videos'])} videos, {len(extracted_data['ads'])} ads")
+    def close(self) -> None:
+        """HTTPクライアントの接続を閉じる"""
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+        self.client.close()
+
+    async def aclose(self) -> None:
+        """非同期クライアントを含むすべての接続を閉じる"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
 
+    @timed("extract")
+    def extract_search_data(self, search_result: Dict[str, Any], keep_sections: bool = False) -> SearchData:
+        """
+        検索結果から必要なデータを抽出する（生データは1回だけ走査し、結果は__slots__のレコードに保持する）
+
+        Args:
+            search_result (Dict[str, Any]): Zenserp APIの検索結果
+            keep_sections (bool): rich_results / knowledge_panel / local_pack / featured_snippets の中身も残すかどうか
+                （Falseの場合は出現したかどうかだけを残す）
+
+        Returns:
+            SearchData: 抽出されたデータ
+        """
+        try:
+            extracted_data = extract(search_result, keep_sections=keep_sections)
         except Exception as e:
             logger.error(f"Error extracting search data: {str(e)}")
-            # エラーが発生してもデータ抽出は続行
+            # エラーが発生しても空の結果で処理を続行
+            return SearchData()
 
+        logger.info(
+            "Extracted data: %d organic results, %d videos, %d ads",
+            len(extracted_data.organic_results), len(extracted_data.videos), len(extracted_data.ads),
+            extra=SAMPLED
+        )
         return extracted_data
-
-    def _safe_get(self, data: Dict[str, Any], key: str, default: str = "") -> str:
-        """安全にディクショナリから値を取得する"""
-        try:
-            value = data.get(key, default)
-            return str(value) if value is not None else default
-        except:
-            return default
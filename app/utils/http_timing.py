@@ -0,0 +1,68 @@
+import time
+from typing import Any, Dict, Optional
+
+# httpcoreのトレースイベント名（プロトコル部分を除いたもの）と計測区間の対応
+_PHASES = {
+    "connect_tcp": "connect",                # 名前解決を含むTCP接続
+    "start_tls": "tls",                      # TLSハンドシェイク
+    "send_request_headers": "send",
+    "send_request_body": "send",
+    "receive_response_headers": "wait",      # 最初のバイトが届くまで
+    "receive_response_body": "transfer",     # レスポンス本文の受信
+}
+
+
+class RequestTimings:
+    """
+    httpxのtrace拡張を使って1回のリクエストの所要時間を区間ごとに記録するクラス
+    （名前解決はhttpcoreのconnect_tcpに含まれるため、connectに合算される）
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.reused_connection = True
+        self._open: Dict[str, float] = {}
+
+    def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """同期クライアント用のトレースコールバック"""
+        now = time.perf_counter()
+        # 例: "connection.connect_tcp.started" / "http11.receive_response_body.complete"
+        parts = event_name.split(".")
+        if len(parts) != 3:
+            return
+        _, step, state = parts
+        phase = _PHASES.get(step)
+        if phase is None:
+            return
+        if step == "connect_tcp":
+            self.reused_connection = False
+        if state == "started":
+            self._open[step] = now
+        elif step in self._open:
+            self.phases[phase] = self.phases.get(phase, 0.0) + now - self._open.pop(step)
+
+    async def async_trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """非同期クライアント用のトレースコールバック"""
+        self.trace(event_name, info)
+
+    def finish(self) -> None:
+        """計測を終了する"""
+        self.finished_at = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """区間ごとの所要時間（ミリ秒）を返す"""
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        result = {phase: round(self.phases.get(phase, 0.0) * 1000, 1) for phase in ("connect", "tls", "send", "wait", "transfer")}
+        result["total"] = round((end - self.started_at) * 1000, 1)
+        result["reused_connection"] = self.reused_connection
+        return result
+
+    def __str__(self) -> str:
+        values = self.as_dict()
+        return (
+            f"connect={values['connect']}ms tls={values['tls']}ms send={values['send']}ms "
+            f"wait={values['wait']}ms transfer={values['transfer']}ms total={values['total']}ms "
+            f"reused={values['reused_connection']}"
+        )
@@ -0,0 +1,47 @@
+import json
+from typing import Any, Union
+
+# orjsonがインストールされている場合は、Zenserpのレスポンスなど大きなJSONの変換に使う（標準のjsonより数倍速い）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    JSONを読み込む
+
+    Args:
+        data (Union[bytes, str]): UTF-8のバイト列または文字列
+
+    Returns:
+        Any: 変換した値
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """
+    値をUTF-8のJSONに変換する（非ASCII文字はエスケープしない）
+
+    Args:
+        value (Any): 変換する値（キーが文字列の辞書・リストなどJSONに変換できる値）
+
+    Returns:
+        bytes: UTF-8のJSON
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def dumps(value: Any) -> str:
+    """値をJSONの文字列に変換する（非ASCII文字はエスケープしない）"""
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False)
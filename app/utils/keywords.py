@@ -0,0 +1,31 @@
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# 正規化方式
+# full: 全角・半角の統一、大文字・小文字の統一、連続する空白の圧縮
+# whitespace: 連続する空白の圧縮のみ
+# exact: 前後の空白の除去のみ
+
+
+def normalize_keyword(keyword: str, mode: str = "full") -> str:
+    """
+    キャッシュキーなどに使うためにキーワードを正規化する
+
+    Args:
+        keyword (str): 元のキーワード
+        mode (str): 正規化方式（full / whitespace / exact）
+
+    Returns:
+        str: 正規化したキーワード
+    """
+    if mode == "exact":
+        return keyword.strip()
+
+    if mode == "whitespace":
+        return _WHITESPACE_RE.sub(" ", keyword).strip()
+
+    normalized = unicodedata.normalize("NFKC", keyword)
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip()
+    return normalized.casefold()
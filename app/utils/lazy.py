@@ -0,0 +1,59 @@
+import threading
+from typing import Any, Callable, Optional
+
+
+class lazy_property:
+    """
+    初回のアクセス時に値を作成し、以降は同じ値を返すプロパティ
+    （複数のスレッドから同時にアクセスされても作成は1回だけ行い、作成に失敗した場合は次のアクセスで再試行する）
+
+    使用例:
+        class LineHandler:
+            @lazy_property
+            def sheets_service(self) -> SheetsService:
+                return SheetsService()
+    """
+
+    def __init__(self, func: Callable[[Any], Any]):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+        self._lock = threading.Lock()
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # 作成済みの値はインスタンスの属性として保持しているため、2回目以降はこのメソッドを通らない
+        values = instance.__dict__
+        if self.name in values:
+            return values[self.name]
+
+        with self._lock:
+            locks = values.setdefault("_lazy_property_locks", {})
+            lock = locks.setdefault(self.name, threading.Lock())
+        with lock:
+            if self.name not in values:
+                values[self.name] = self.func(instance)
+            return values[self.name]
+
+
+def get_if_initialized(instance: Any, name: str) -> Optional[Any]:
+    """
+    lazy_propertyの値を作成済みの場合のみ返す（未作成の場合は作成せずにNoneを返す）
+
+    Args:
+        instance (Any): lazy_propertyを持つインスタンス
+        name (str): プロパティ名
+
+    Returns:
+        Optional[Any]: 作成済みの値、または None
+    """
+    return instance.__dict__.get(name)
+
+
+def is_initialized(instance: Any, name: str) -> bool:
+    """lazy_propertyの値を作成済みかどうかを返す"""
+    return name in instance.__dict__
@@ -1,46 +1,203 @@
+import atexit
+import contextvars
+import copy
+import datetime
+import json
 import logging
+import queue
+import random
 import sys
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
 from app.config import get_settings
 
 # 設定を取得（エラー時は默认値を使用）
 try:
     settings = get_settings()
     log_level = settings.LOG_LEVEL
+    log_format = settings.LOG_FORMAT
+    log_async = settings.LOG_ASYNC
+    log_queue_max_size = settings.LOG_QUEUE_MAX_SIZE
+    log_info_sample_rate = settings.LOG_INFO_SAMPLE_RATE
 except:
     log_level = "INFO"
+    log_format = "text"
+    log_async = False
+    log_queue_max_size = 10000
+    log_info_sample_rate = 1.0
+
+# 件数の多いINFOログに指定するextra（LOG_INFO_SAMPLE_RATEの割合だけ出力する）
+# 使用例: logger.info("Zenserp cache hit for keyword: %s", keyword, extra=SAMPLED)
+SAMPLED = {"sampled": True}
+
+_TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
+
+# ログに付ける処理の識別子（webhookEventId・ジョブID・キーワードなど）。スレッド・タスクごとに保持する
+_log_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """
+    ブロック内で出力するログに処理の識別子を付ける（外側で指定した値に追加する）
+
+    使用例:
+        with log_context(event_id=event_id, keyword=keyword):
+            ...
+
+    Args:
+        **fields: ログに付ける値（Noneの値は付けない）
+    """
+    token = _log_context.set({**_log_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    """
+    呼び出し元のスレッドで処理の識別子をログに付け、件数の多いINFOログを間引くフィルター
+    （ロガーに設定し、キューに入れる前に判定する）
+    """
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if (
+            self.sample_rate < 1.0
+            and record.levelno == logging.INFO
+            and getattr(record, "sampled", False)
+            and random.random() >= self.sample_rate
+        ):
+            return False
+        record.context = _log_context.get()
+        return True
+
+
+class _TextFormatter(logging.Formatter):
+    """従来のテキスト形式（処理の識別子がある場合は末尾に付ける）"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        # 例外のトレースバックより前（メッセージの直後）に付ける
+        text = super().formatMessage(record)
+        context = getattr(record, "context", None)
+        if context:
+            text += " [" + " ".join(f"{key}={value}" for key, value in context.items()) + "]"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1件のJSON形式（ログ収集サービスで処理の識別子ごとに検索できる）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    ログをキューに入れるだけで戻るハンドラー（書式化と出力はQueueListenerのスレッドで行う）
+    キューが満杯の場合は待たずに破棄し、件数を記録する
+    """
+
+    def __init__(self, log_queue: "queue.Queue[Optional[logging.LogRecord]]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 標準のQueueHandlerはここでメッセージを書式化するが、同じプロセス内のキューのため書式化もリスナーに任せる
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[_NonBlockingQueueHandler] = None
+
 
 def setup_logger():
     """ロガーの設定を行う"""
+    global _listener, _queue_handler
     logger = logging.getLogger("keyword_analyze")
-    
+
     # ログレベルの設定
     try:
         level = getattr(logging, log_level.upper())
     except AttributeError:
         level = logging.INFO
-        
+
     logger.setLevel(level)
 
     # 既存のハンドラをクリア（重複を避けるため）
     logger.handlers.clear()
+    logger.filters.clear()
+    logger.addFilter(_ContextFilter(log_info_sample_rate))
 
     # コンソールハンドラの設定
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
 
     # フォーマッタの設定
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-    )
+    if log_format.lower() == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = _TextFormatter(_TEXT_FORMAT)
     console_handler.setFormatter(formatter)
 
     # ハンドラの追加
-    logger.addHandler(console_handler)
+    if log_async:
+        # 標準出力への書き込みはバックグラウンドのスレッドで行い、リクエストの処理を待たせない
+        _queue_handler = _NonBlockingQueueHandler(queue.Queue(maxsize=max(1, log_queue_max_size)))
+        _listener = QueueListener(_queue_handler.queue, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logger)
+        logger.addHandler(_queue_handler)
+    else:
+        logger.addHandler(console_handler)
 
     # 親ロガーへの伝播を防ぐ
     logger.propagate = False
 
     return logger
 
+
+def shutdown_logger() -> None:
+    """キューに残っているログをすべて出力してから、出力用のスレッドを停止する"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def logger_stats() -> Dict[str, Any]:
+    """ログ出力の状態を返す（キューを使わない場合は破棄件数などを含まない）"""
+    stats: Dict[str, Any] = {"format": log_format, "async": _queue_handler is not None, "info_sample_rate": log_info_sample_rate}
+    if _queue_handler is not None:
+        stats["queued"] = _queue_handler.queue.qsize()
+        stats["dropped"] = _queue_handler.dropped
+    return stats
+
 # ロガーのインスタンスを作成
 logger = setup_logger()
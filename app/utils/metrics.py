@@ -0,0 +1,332 @@
+import bisect
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 処理時間のヒストグラムのバケット（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 連続してこの回数失敗した外部サービスは/healthで異常とみなす
+UNHEALTHY_CONSECUTIVE_FAILURES = 3
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """ラベルをPrometheusのテキスト形式に変換する"""
+    pairs = [
+        f'{name}="{_escape_label_value(str(value))}"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape_label_value(value: str) -> str:
+    """ラベルの値に含まれる特殊文字をエスケープする"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    """数値をPrometheusのテキスト形式に変換する"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """ラベルの値ごとに値を持つメトリクスの基底クラス"""
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    """増加のみするカウンター"""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    """増減する値（同時実行数など）"""
+    metric_type = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1.0) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values: str, value: float) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    """値の分布（処理時間など）をバケットごとの件数で記録する"""
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルの値 -> [バケットごとの件数..., 上限なしの件数], 合計
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(label_values)
+            if counts is None:
+                counts = self._counts[label_values] = [0] * (len(self.buckets) + 1)
+                self._sums[label_values] = 0.0
+            counts[index] += 1
+            self._sums[label_values] += value
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """ラベルの値ごとの件数と合計を返す"""
+        with self._lock:
+            return {labels: (sum(counts), self._sums[labels]) for labels, counts in self._counts.items()}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((labels, list(counts), self._sums[labels]) for labels, counts in self._counts.items())
+        lines = self.header()
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.label_names, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {repr(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "keyword_analyze_stage_duration_seconds",
+    "Latency of each processing stage in seconds.",
+    ["stage"]
+)
+STAGE_IN_FLIGHT = Gauge(
+    "keyword_analyze_stage_in_flight",
+    "Number of operations currently running in each processing stage.",
+    ["stage"]
+)
+STAGE_ERRORS = Counter(
+    "keyword_analyze_stage_errors_total",
+    "Number of processing stage executions that raised an error.",
+    ["stage"]
+)
+UPSTREAM_ERRORS = Counter(
+    "keyword_analyze_upstream_errors_total",
+    "Errors returned by upstream services, by HTTP status or error kind (timeout / connection / other).",
+    ["upstream", "reason"]
+)
+REPLY_DELIVERIES = Counter(
+    "keyword_analyze_reply_deliveries_total",
+    "How keyword results were delivered: as the reply within the deadline (reply) or as a push after an interim reply (push).",
+    ["outcome"]
+)
+UPSTREAM_RETRIES = Counter(
+    "keyword_analyze_upstream_retries_total",
+    "Upstream calls retried after a transient error, by HTTP status or error kind.",
+    ["upstream", "reason"]
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "keyword_analyze_circuit_breaker_state",
+    "Circuit breaker state of each upstream (0 = closed, 1 = half-open, 2 = open).",
+    ["upstream"]
+)
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "keyword_analyze_circuit_breaker_rejected_total",
+    "Upstream calls rejected without being sent because the circuit breaker was open.",
+    ["upstream"]
+)
+HEDGED_REQUESTS = Counter(
+    "keyword_analyze_hedged_requests_total",
+    "Hedged upstream requests sent after the first one was slow (launched), and how many finished first (won).",
+    ["upstream", "outcome"]
+)
+ADMISSION_REJECTIONS = Counter(
+    "keyword_analyze_admission_rejected_total",
+    "LINE messages rejected before queuing because the user or group exceeded its rate (rate) or in-flight limit (concurrency).",
+    ["reason"]
+)
+
+_METRICS: List[_Metric] = [
+    STAGE_DURATION, STAGE_IN_FLIGHT, STAGE_ERRORS, UPSTREAM_ERRORS, REPLY_DELIVERIES,
+    UPSTREAM_RETRIES, CIRCUIT_BREAKER_STATE, CIRCUIT_BREAKER_REJECTIONS, HEDGED_REQUESTS,
+    ADMISSION_REJECTIONS
+]
+
+# 外部サービスごとの直近の成否（/healthの判定に使う）
+_upstream_lock = threading.Lock()
+_upstream_state: Dict[str, Dict[str, Any]] = {}
+
+# /metricsの出力時に値を集める関数（名前、種類、説明、値の組を返す）
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+
+class stage:
+    """
+    処理段階の所要時間・同時実行数・エラー数を記録するコンテキストマネージャー
+    （upstreamを指定した場合は外部サービスの成否も記録する）
+
+    使用例:
+        with stage("sheets_append", upstream="sheets"):
+            spreadsheet.values_append(...)
+    """
+    __slots__ = ("name", "upstream", "started")
+
+    def __init__(self, name: str, upstream: Optional[str] = None):
+        self.name = name
+        self.upstream = upstream
+
+    def __enter__(self) -> "stage":
+        STAGE_IN_FLIGHT.inc(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        STAGE_DURATION.observe(time.perf_counter() - self.started, self.name)
+        STAGE_IN_FLIGHT.dec(self.name)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(self.name)
+            if self.upstream is not None:
+                record_upstream_error(self.upstream, classify_error(exc))
+        elif self.upstream is not None:
+            record_upstream_success(self.upstream)
+
+
+def timed(stage_name: str, upstream: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    関数の呼び出しを処理段階として記録するデコレーター
+
+    Args:
+        stage_name (str): 処理段階の名前
+        upstream (Optional[str]): 外部サービスの名前（zenserp / sheets / line）
+
+    Returns:
+        Callable[[Callable], Callable]: デコレーター
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name, upstream):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    外部サービスのエラーをHTTPステータスまたはエラーの種類に分類する
+
+    Args:
+        error (BaseException): 発生した例外
+
+    Returns:
+        str: HTTPステータス（例: "401" / "429"）または timeout / connection / other
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return str(status)
+    name = type(error).__name__.lower()
+    if "timeout" in name:
+        return "timeout"
+    if "connect" in name:
+        return "connection"
+    return "other"
+
+
+def record_upstream_error(upstream: str, reason: str) -> None:
+    """外部サービスのエラーを記録する"""
+    UPSTREAM_ERRORS.inc(upstream, reason)
+    with _upstream_lock:
+        state = _upstream_state.setdefault(upstream, {"consecutive_failures": 0, "last_error": None, "last_success_at": None})
+        state["consecutive_failures"] += 1
+        state["last_error"] = reason
+
+
+def record_upstream_success(upstream: str) -> None:
+    """外部サービスの呼び出しが成功したことを記録する"""
+    with _upstream_lock:
+        state = _upstream_state.setdefault(upstream, {"consecutive_failures": 0, "last_error": None, "last_success_at": None})
+        state["consecutive_failures"] = 0
+        state["last_success_at"] = time.time()
+
+
+def upstream_health(upstream: str) -> Dict[str, Any]:
+    """
+    外部サービスの直近の成否を返す（まだ呼び出していない場合は正常とみなす）
+
+    Args:
+        upstream (str): 外部サービスの名前
+
+    Returns:
+        Dict[str, Any]: healthy / consecutive_failures / last_error / last_success_at
+    """
+    with _upstream_lock:
+        state = dict(_upstream_state.get(upstream) or {"consecutive_failures": 0, "last_error": None, "last_success_at": None})
+    state["healthy"] = state["consecutive_failures"] < UNHEALTHY_CONSECUTIVE_FAILURES
+    return state
+
+
+def register_collector(collector: Callable[[], Iterable[Tuple[str, str, str, float]]]) -> None:
+    """
+    /metricsの出力時に呼び出して値を集める関数を登録する
+
+    Args:
+        collector: (メトリクス名, 種類(counter / gauge), 説明, 値) の組を返す関数
+    """
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """
+    すべてのメトリクスをPrometheusのテキスト形式で返す
+
+    Returns:
+        str: Prometheusのテキスト形式（version 0.0.4）
+    """
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, metric_type, documentation, value in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
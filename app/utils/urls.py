@@ -0,0 +1,45 @@
+from urllib.parse import urlsplit
+
+
+def extract_domain(url: str) -> str:
+    """
+    URLからドメインを取り出す（小文字化し、先頭の「www.」は除く）
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: ドメイン（取り出せない場合は空文字）
+    """
+    try:
+        hostname = urlsplit(url.strip()).hostname or ""
+    except ValueError:
+        return ""
+    hostname = hostname.lower()
+    return hostname[4:] if hostname.startswith("www.") else hostname
+
+
+def normalize_url(url: str) -> str:
+    """
+    同じページのURLを同一とみなせるように正規化する
+    （スキーム・先頭の「www.」・フラグメント・末尾の「/」を除き、ホスト名を小文字にする）
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: 正規化したURL（解析できない場合は前後の空白を除いた元のURL）
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        hostname = (parts.hostname or "").lower()
+    except ValueError:
+        return url
+    if not hostname:
+        return url
+    if hostname.startswith("www."):
+        hostname = hostname[4:]
+    path = parts.path.rstrip("/")
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{hostname}{path}{query}"
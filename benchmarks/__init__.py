@@ -0,0 +1,4 @@
+"""
+外部サービス（Zenserp / Google Sheets / LINE）をローカルの代替に置き換えて
+処理時間とスループットを計測するベンチマーク
+"""
@@ -0,0 +1,408 @@
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+if TYPE_CHECKING:
+    import gspread
+
+SHEETS_API_ORIGIN = "https://sheets.googleapis.com/"
+
+
+def build_serp(keyword: str, num: int, start: int, description_length: int = 160, features: bool = False) -> Dict[str, Any]:
+    """
+    Zenserpのレスポンスと同じ形の検索結果を作成する（同じキーワードとページには同じ結果を返す）
+
+    Args:
+        keyword (str): 検索キーワード
+        num (int): 1ページあたりの件数
+        start (int): 取得を始める位置（0始まり）
+        description_length (int): 検索結果1件あたりの説明文の文字数
+        features (bool): 強調スニペット・ナレッジパネル・動画・広告などのSERP機能も含めるかどうか
+
+    Returns:
+        Dict[str, Any]: 検索結果
+    """
+    seed = zlib.crc32(keyword.encode("utf-8"))
+    description = ("ベンチマーク用の説明文です。" * (description_length // 14 + 1))[:description_length]
+    organic = []
+    for position in range(start + 1, start + num + 1):
+        domain = (seed + position * 7) % 50
+        organic.append({
+            "position": position,
+            "title": f"{keyword} - 結果{position}",
+            "link": f"https://site{domain}.example.com/{quote(keyword)}/{position}",
+            "description": description
+        })
+    result = {
+        "query": {"q": keyword, "num": num, "start": start},
+        "organic": organic,
+        "related_searches": [{"query": f"{keyword} {suffix}"} for suffix in ("比較", "おすすめ", "とは", "評判", "料金")],
+        "people_also_ask": [{"question": f"{keyword}とは何ですか？"}, {"question": f"{keyword}の選び方は？"}],
+        "ads": []
+    }
+    if features:
+        link = f"https://site{seed % 50}.example.com/{quote(keyword)}"
+        result.update({
+            "featured_snippets": [{"title": f"{keyword}とは", "description": description * 2, "link": link, "position": 1}],
+            "knowledge_panel": {
+                "title": keyword,
+                "description": description * 3,
+                "facts": [{"label": f"項目{i}", "value": description[:40]} for i in range(8)],
+                "images": [f"{link}/image{i}.jpg" for i in range(6)]
+            },
+            "rich_results": [{"title": f"{keyword} - 評価{i}", "rating": 4.5, "reviews": 120 + i, "link": f"{link}/review{i}"} for i in range(5)],
+            "local_pack": {"places": [{"title": f"{keyword} 店舗{i}", "address": description[:60], "rating": 4.0} for i in range(3)]},
+            "videos": [{"title": f"{keyword} 動画{i}", "description": description, "link": f"https://video.example.com/{i}"} for i in range(4)],
+            "ads": [{"title": f"{keyword} 広告{i}", "description": description, "link": f"https://ads.example.com/{i}"} for i in range(3)]
+        })
+    return result
+
+
+class _FakeServer:
+    """ローカルのポートで待ち受けるHTTPサーバーの基底クラス（リクエストごとにスレッドで処理する）"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-Aliveで接続を使い回せるようにする
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                fake._dispatch(self, "GET")
+
+            def do_POST(self):
+                fake._dispatch(self, "POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _dispatch(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        status, headers, payload = self.handle(method, request.path, body)
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        try:
+            request.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # ヘッジで先に結果が返り、クライアントが接続を閉じた場合
+            pass
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, str], Any]:
+        raise NotImplementedError
+
+
+class FakeZenserpServer(_FakeServer):
+    """
+    Zenserpの検索APIの代替サーバー
+    （応答の遅延・429/503の発生率・まれに遅い応答の割合・結果1件あたりの説明文の長さを指定できる）
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.3,
+        jitter: float = 0.1,
+        rate_limit_ratio: float = 0.0,
+        retry_after: float = 1.0,
+        error_ratio: float = 0.0,
+        slow_ratio: float = 0.0,
+        slow_latency: float = 5.0,
+        description_length: int = 160,
+        seed: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        super().__init__(host, port)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.error_ratio = error_ratio
+        self.slow_ratio = slow_ratio
+        self.slow_latency = slow_latency
+        self.description_length = description_length
+        self._random = random.Random(seed)
+        self._requests: Counter = Counter()
+        self._rate_limited: Counter = Counter()
+        self._errors = 0
+        self._slow = 0
+        self._bytes_sent = 0
+
+    @property
+    def url(self) -> str:
+        return super().url + "/api/v2/search"
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, str], Any]:
+        query = {key: values[0] for key, values in parse_qs(urlsplit(path).query).items()}
+        keyword = query.get("q", "")
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            rate_limited = self._random.random() < self.rate_limit_ratio
+            failed = not rate_limited and self._random.random() < self.error_ratio
+            if self._random.random() < self.slow_ratio:
+                delay += self.slow_latency
+                self._slow += 1
+            self._requests[keyword] += 1
+            if rate_limited:
+                self._rate_limited[keyword] += 1
+            if failed:
+                self._errors += 1
+        time.sleep(delay)
+
+        if rate_limited:
+            return 429, {"Retry-After": f"{self.retry_after:g}"}, {"error": "rate limit exceeded"}
+        if failed:
+            return 503, {}, {"error": "service unavailable"}
+
+        payload = self.build_result(keyword, int(query.get("num", 10)), int(query.get("start", 0)))
+        with self._lock:
+            self._bytes_sent += len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        return 200, {}, payload
+
+    def build_result(self, keyword: str, num: int, start: int) -> Dict[str, Any]:
+        """
+        Zenserpのレスポンスと同じ形の検索結果を作成する（同じキーワードとページには同じ結果を返す）
+
+        Args:
+            keyword (str): 検索キーワード
+            num (int): 1ページあたりの件数
+            start (int): 取得を始める位置（0始まり）
+
+        Returns:
+            Dict[str, Any]: 検索結果
+        """
+        return build_serp(keyword, num, start, self.description_length)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": sum(self._requests.values()),
+                "rate_limited": sum(self._rate_limited.values()),
+                "errors": self._errors,
+                "slow": self._slow,
+                "keywords": len(self._requests),
+                "max_requests_per_keyword": max(self._requests.values(), default=0),
+                "response_bytes": self._bytes_sent
+            }
+
+
+class FakeLineServer(_FakeServer):
+    """
+    LINE Messaging APIの返信・プッシュ送信の代替サーバー
+    （受け取ったメッセージはlistenerに渡す）
+    """
+
+    def __init__(self, latency: float = 0.02, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port)
+        self.latency = latency
+        # (種類(reply / push), 返信トークンまたは送信先, 本文, 受信時刻) を受け取る関数
+        self.listener: Optional[Callable[[str, str, str, float], None]] = None
+        self._calls: Counter = Counter()
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, str], Any]:
+        received_at = time.perf_counter()
+        if path.startswith("/v2/bot/message/reply"):
+            kind, target_key = "reply", "replyToken"
+        elif path.startswith("/v2/bot/message/push"):
+            kind, target_key = "push", "to"
+        else:
+            return 404, {}, {"message": "Not found"}
+
+        request = json.loads(body or b"{}")
+        with self._lock:
+            self._calls[kind] += 1
+        time.sleep(self.latency)
+
+        listener = self.listener
+        if listener is not None:
+            text = "\n".join(message.get("text", "") for message in request.get("messages", []))
+            listener(kind, request.get(target_key, ""), text, received_at)
+        return 200, {"X-Line-Request-Id": f"bench-{received_at:.6f}"}, {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"reply": self._calls["reply"], "push": self._calls["push"]}
+
+
+class FakeSheetsAdapter(BaseAdapter):
+    """
+    Google Sheets API（v4）の代替としてgspreadのセッションに登録するアダプター
+    （シートの一覧と書き込まれた行数だけをメモリ上に保持する）
+    """
+
+    def __init__(self, latency: float = 0.1, spreadsheet_title: str = "benchmark"):
+        super().__init__()
+        self.latency = latency
+        self.spreadsheet_title = spreadsheet_title
+        self._lock = threading.Lock()
+        # シート名 -> プロパティ
+        self._sheets: Dict[str, Dict[str, Any]] = {}
+        self._next_sheet_id = 1
+        self._calls: Counter = Counter()
+        self._rows_written = 0
+        self._add_sheet({"title": "Sheet1", "sheetId": 0})
+
+    def build_client(self) -> "gspread.Client":
+        """このアダプターを経由してAPIを呼び出すgspreadのクライアントを作成する"""
+        import gspread
+        from google.auth.credentials import AnonymousCredentials
+
+        client = gspread.Client(auth=AnonymousCredentials())
+        client.session.mount(SHEETS_API_ORIGIN, self)
+        return client
+
+    def send(self, request, **kwargs) -> requests.Response:
+        time.sleep(self.latency)
+        path = unquote(urlsplit(request.url).path)
+        body = json.loads(request.body) if request.body else {}
+        resource = path.split("/v4/spreadsheets/", 1)[-1]
+
+        with self._lock:
+            if request.method == "GET" and resource.endswith("/values:batchGet"):
+                self._calls["values_batch_get"] += 1
+                status, payload = 200, {"valueRanges": []}
+            elif request.method == "GET" and "/" not in resource:
+                self._calls["metadata"] += 1
+                status, payload = 200, self._metadata(resource)
+            elif request.method == "POST" and resource.endswith(":batchUpdate"):
+                self._calls["batch_update"] += 1
+                status, payload = self._batch_update(body.get("requests", []))
+            elif request.method == "POST" and resource.endswith(":append"):
+                self._calls["values_append"] += 1
+                status, payload = self._append(resource, body.get("values", []))
+            else:
+                self._calls["unsupported"] += 1
+                status, payload = 404, {"error": {"code": 404, "message": f"Unsupported request: {request.method} {path}", "status": "NOT_FOUND"}}
+        return self._response(request, status, payload)
+
+    def close(self) -> None:
+        pass
+
+    def _metadata(self, spreadsheet_id: str) -> Dict[str, Any]:
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "properties": {"title": self.spreadsheet_title},
+            "sheets": [{"properties": dict(properties)} for properties in self._sheets.values()]
+        }
+
+    def _add_sheet(self, properties: Dict[str, Any]) -> Dict[str, Any]:
+        sheet_id = properties.get("sheetId")
+        if sheet_id is None:
+            sheet_id = self._next_sheet_id
+        self._next_sheet_id = max(self._next_sheet_id, sheet_id + 1)
+        properties = {
+            "sheetId": sheet_id,
+            "title": properties["title"],
+            "index": len(self._sheets),
+            "sheetType": "GRID",
+            "gridProperties": properties.get("gridProperties") or {"rowCount": 1000, "columnCount": 26}
+        }
+        self._sheets[properties["title"]] = properties
+        return properties
+
+    def _batch_update(self, requests_: List[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        replies: List[Dict[str, Any]] = []
+        for item in requests_:
+            if "addSheet" in item:
+                properties = item["addSheet"].get("properties", {})
+                title = properties.get("title", f"Sheet{self._next_sheet_id}")
+                if title in self._sheets:
+                    return self._error(400, f'Invalid requests[0].addSheet: A sheet with the name "{title}" already exists.')
+                if any(sheet["sheetId"] == properties.get("sheetId") for sheet in self._sheets.values()):
+                    return self._error(400, f"Invalid requests[0].addSheet: Sheet with id {properties['sheetId']} already exists.")
+                replies.append({"addSheet": {"properties": self._add_sheet(dict(properties, title=title))}})
+            elif "deleteSheet" in item:
+                sheet_id = item["deleteSheet"].get("sheetId")
+                title = next((title for title, sheet in self._sheets.items() if sheet["sheetId"] == sheet_id), None)
+                if title is None:
+                    return self._error(400, f"Invalid requests[0].deleteSheet: No sheet with id: {sheet_id}")
+                del self._sheets[title]
+                replies.append({})
+            else:
+                for key in ("updateCells", "appendCells"):
+                    if key in item:
+                        self._rows_written += len(item[key].get("rows", []))
+                replies.append({})
+        return 200, {"spreadsheetId": "benchmark", "replies": replies}
+
+    def _append(self, resource: str, values: List[List[Any]]) -> Tuple[int, Dict[str, Any]]:
+        sheet_range = resource.split("/values/", 1)[-1].rsplit(":append", 1)[0]
+        title = sheet_range.rsplit("!", 1)[0]
+        if title.startswith("'") and title.endswith("'"):
+            title = title[1:-1].replace("''", "'")
+        if title not in self._sheets:
+            return self._error(400, f"Unable to parse range: {sheet_range}")
+        self._rows_written += len(values)
+        return 200, {"spreadsheetId": "benchmark", "updates": {"updatedRange": sheet_range, "updatedRows": len(values)}}
+
+    def _error(self, code: int, message: str) -> Tuple[int, Dict[str, Any]]:
+        return code, {"error": {"code": code, "message": message, "status": "INVALID_ARGUMENT"}}
+
+    def _response(self, request, status: int, payload: Dict[str, Any]) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.reason = "OK" if status == 200 else "Error"
+        response.headers = CaseInsensitiveDict({"Content-Type": "application/json; charset=UTF-8"})
+        response._content = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._calls)
+            stats["requests"] = sum(self._calls.values())
+            stats["rows_written"] = self._rows_written
+            stats["sheets"] = len(self._sheets)
+        return stats
+
+
+def install_fake_sheets(adapter: FakeSheetsAdapter) -> None:
+    """
+    LineHandlerが作成するSheetsServiceのクライアントを、代替のアダプターを経由するものに差し替える
+    （gspreadなどはアプリケーションと同じく初回の利用時に読み込む）
+    """
+    from app.line.handler import LineHandler
+    from app.utils.lazy import lazy_property
+
+    def sheets_service(handler):
+        from app.services.sheets_service import SheetsService
+        SheetsService._get_client = lambda service: adapter.build_client()
+        return SheetsService()
+
+    LineHandler.sheets_service = lazy_property(sheets_service)
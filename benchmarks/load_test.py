@@ -0,0 +1,393 @@
+"""
+署名付きのWebhookを /webhook に送り続け、検索結果の通知までの処理時間・スループット・
+外部サービスの呼び出し回数を計測する負荷試験
+
+Zenserp・LINEはローカルの代替サーバー、Google Sheetsはgspreadに登録する代替アダプターに置き換えるため、
+実際のAPIの利用枠やスプレッドシートは消費しない。
+
+使用例:
+    python -m benchmarks.load_test --requests 500 --concurrency 50 --keywords 100
+    python -m benchmarks.load_test --output before.json
+    python -m benchmarks.load_test --baseline before.json
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import math
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fakes import FakeLineServer, FakeSheetsAdapter, FakeZenserpServer, install_fake_sheets
+
+CHANNEL_SECRET = "benchmark-channel-secret"
+
+# 比較の際に表示する指標（結果のキー、表示名、値が小さいほど良いかどうか）
+COMPARED_METRICS = [
+    ("throughput_per_second", "スループット(件/秒)", False),
+    ("e2e_p50_ms", "通知まで p50(ms)", True),
+    ("e2e_p95_ms", "通知まで p95(ms)", True),
+    ("e2e_p99_ms", "通知まで p99(ms)", True),
+    ("ack_p95_ms", "Webhook応答 p95(ms)", True),
+    ("zenserp_calls_per_keyword", "Zenserp呼び出し/件", True),
+    ("sheets_calls_per_keyword", "Sheets呼び出し/件", True),
+    ("line_calls_per_keyword", "LINE呼び出し/件", True),
+]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ローカルの代替サーバーを使った負荷試験")
+    parser.add_argument("--requests", type=int, default=200, help="送信するWebhookの件数")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時に送信するWebhookの数")
+    parser.add_argument("--rate", type=float, default=0.0, help="1秒あたりの送信数（0で上限なし）")
+    parser.add_argument("--keywords", type=int, default=50, help="送信するキーワードの種類数（同じキーワードを繰り返し送信する）")
+    parser.add_argument("--deep", action="store_true", help="深掘りモード（複数ページの取得）で送信する")
+    parser.add_argument("--timeout", type=float, default=120.0, help="すべての通知を待つ最大秒数")
+    parser.add_argument("--zenserp-latency", type=float, default=0.3, help="Zenserpの応答までの秒数")
+    parser.add_argument("--zenserp-jitter", type=float, default=0.1, help="Zenserpの応答に加えるばらつきの最大秒数")
+    parser.add_argument("--zenserp-429-ratio", type=float, default=0.0, help="Zenserpが429を返す割合（0〜1）")
+    parser.add_argument("--zenserp-retry-after", type=float, default=1.0, help="429のRetry-Afterの秒数")
+    parser.add_argument("--zenserp-error-ratio", type=float, default=0.0, help="Zenserpが503を返す割合（0〜1）")
+    parser.add_argument("--zenserp-slow-ratio", type=float, default=0.0, help="Zenserpの応答が大きく遅れる割合（0〜1。ヘッジの効果の確認用）")
+    parser.add_argument("--zenserp-slow-latency", type=float, default=5.0, help="遅れる場合に追加する秒数")
+    parser.add_argument("--zenserp-description-length", type=int, default=160, help="検索結果1件あたりの説明文の文字数")
+    parser.add_argument("--sheets-latency", type=float, default=0.15, help="Google Sheets APIの応答までの秒数")
+    parser.add_argument("--line-latency", type=float, default=0.02, help="LINE Messaging APIの応答までの秒数")
+    parser.add_argument("--seed", type=int, default=None, help="429の発生と遅延のばらつきの乱数シード")
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    parser.add_argument("--baseline", help="比較する過去の結果（--outputで保存したJSON）")
+    return parser.parse_args(argv)
+
+
+def configure_environment(zenserp_url: str, line_url: str, data_dir: str) -> None:
+    """
+    アプリケーションの設定を読み込む前に、外部サービスの接続先とデータの保存先を差し替える
+    （レート制限・キャッシュなどは環境変数で指定された値を優先する）
+    """
+    os.environ.update({
+        "ZENSERP_BASE_URL": zenserp_url,
+        "ZENSERP_API_KEY": "benchmark",
+        "ZENSERP_MONTHLY_QUOTA": "0",
+        "ZENSERP_QUOTA_STATE_PATH": os.path.join(data_dir, "zenserp_quota.json"),
+        "LINE_API_ENDPOINT": line_url,
+        "LINE_CHANNEL_ACCESS_TOKEN": "benchmark",
+        "LINE_CHANNEL_SECRET": CHANNEL_SECRET,
+        "GOOGLE_SHEETS_CREDENTIALS_FILE": "benchmark",
+        "GOOGLE_SHEETS_SPREADSHEET_ID": "benchmark",
+        "HISTORY_DB_PATH": os.path.join(data_dir, "serp_history.sqlite3"),
+        "TRACKING_DB_PATH": os.path.join(data_dir, "rank_tracking.sqlite3"),
+        "SERP_CACHE_DB_PATH": os.path.join(data_dir, "serp_cache.sqlite3"),
+        "JOB_QUEUE_DB_PATH": os.path.join(data_dir, "job_queue.sqlite3"),
+    })
+    for name, value in {
+        "ZENSERP_RATE_PER_SECOND": "1000",
+        "ZENSERP_BURST": "100",
+        "SERP_CACHE_ENABLED": "false",
+        "TRACKING_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }.items():
+        os.environ.setdefault(name, value)
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """最近接順位法でパーセンタイルを求める"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def sign(body: bytes) -> str:
+    """LINEプラットフォームと同じ方式でWebhookの署名を作成する"""
+    digest = hmac.new(CHANNEL_SECRET.encode("utf-8"), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def build_webhook(index: int, run_id: str, text: str) -> Dict[str, Any]:
+    """1件のテキストメッセージを含むWebhookのリクエストボディを作成する"""
+    return {
+        "destination": "Ubenchmark",
+        "events": [{
+            "type": "message",
+            "mode": "active",
+            "timestamp": int(time.time() * 1000),
+            "webhookEventId": f"BENCH{run_id}{index:08d}",
+            "deliveryContext": {"isRedelivery": False},
+            "replyToken": f"reply-{run_id}-{index}",
+            "source": {"type": "user", "userId": f"Ubench{run_id}{index:08d}"},
+            "message": {"id": str(index), "type": "text", "quoteToken": f"q{index}", "text": text}
+        }]
+    }
+
+
+class RequestTracker:
+    """送信したWebhookごとに、送信時刻と最終的な通知を受け取った時刻を記録する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent_at: Dict[str, float] = {}
+        self.ack_ms: List[float] = []
+        self.ack_errors = 0
+        # ユーザーID -> (結果(ok / error / busy), 通知を受け取った時刻)
+        self.completed: Dict[str, Any] = {}
+        self._reply_tokens: Dict[str, str] = {}
+
+    def register(self, user_id: str, reply_token: str, sent_at: float) -> None:
+        with self._lock:
+            self.sent_at[user_id] = sent_at
+            self._reply_tokens[reply_token] = user_id
+
+    def on_line_message(self, kind: str, target: str, text: str, received_at: float) -> None:
+        """代替LINEサーバーが受け取ったメッセージから、各Webhookの処理が終わったかどうかを判定する"""
+        with self._lock:
+            # 結果は期限内に終わった場合はreply、それ以外はプッシュで届く
+            user_id = self._reply_tokens.get(target) if kind == "reply" else target
+            if user_id not in self.sent_at:
+                return
+            if "混み合って" in text:
+                # キューが満杯の場合は返信だけで処理が終わる
+                outcome = "busy"
+            elif text.startswith("✅"):
+                outcome = "ok"
+            elif text.startswith(("❌", "⚠️")):
+                outcome = "error"
+            else:
+                # 処理中メッセージや進捗の通知
+                return
+            self.completed.setdefault(user_id, (outcome, received_at))
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self.sent_at) - len(self.completed)
+
+
+async def send_webhooks(args: argparse.Namespace, base_url: str, tracker: RequestTracker) -> float:
+    """
+    Webhookを送信する
+
+    Returns:
+        float: 最初のWebhookを送信した時刻
+    """
+    import httpx
+
+    run_id = f"{int(time.time()) % 100000:05d}"
+    keywords = [f"ベンチマーク キーワード{i}" for i in range(max(1, args.keywords))]
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    started = time.perf_counter()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        async def send(index: int) -> None:
+            if args.rate > 0:
+                await asyncio.sleep(max(0.0, started + index / args.rate - time.perf_counter()))
+            text = keywords[index % len(keywords)]
+            if args.deep:
+                text = "!深掘り " + text
+            event = build_webhook(index, run_id, text)
+            body = json.dumps(event, ensure_ascii=False).encode("utf-8")
+            async with semaphore:
+                sent_at = time.perf_counter()
+                tracker.register(event["events"][0]["source"]["userId"], event["events"][0]["replyToken"], sent_at)
+                try:
+                    response = await client.post("/webhook", content=body, headers={
+                        "Content-Type": "application/json",
+                        "X-Line-Signature": sign(body)
+                    })
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                tracker.ack_ms.append((time.perf_counter() - sent_at) * 1000)
+                if not ok:
+                    tracker.ack_errors += 1
+
+        await asyncio.gather(*(send(i) for i in range(args.requests)))
+    return started
+
+
+async def wait_for_completion(tracker: RequestTracker, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while tracker.pending() > 0 and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def summarize(
+    args: argparse.Namespace,
+    tracker: RequestTracker,
+    started: float,
+    zenserp: FakeZenserpServer,
+    sheets: FakeSheetsAdapter,
+    line: FakeLineServer
+) -> Dict[str, Any]:
+    """計測結果を集計する"""
+    from app.utils.metrics import REPLY_DELIVERIES, STAGE_DURATION
+
+    e2e_ms = [
+        (received_at - tracker.sent_at[user_id]) * 1000
+        for user_id, (outcome, received_at) in tracker.completed.items()
+        if outcome == "ok"
+    ]
+    outcomes = [outcome for outcome, _ in tracker.completed.values()]
+    finished = max((received_at for _, received_at in tracker.completed.values()), default=started)
+    elapsed = max(finished - started, 1e-9)
+    zenserp_stats, sheets_stats, line_stats = zenserp.stats(), sheets.stats(), line.stats()
+    processed = max(1, len(tracker.completed))
+
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value, 1)
+
+    return {
+        "requests": args.requests,
+        "completed": outcomes.count("ok"),
+        "errors": outcomes.count("error"),
+        "busy": outcomes.count("busy"),
+        "timed_out": tracker.pending(),
+        "webhook_errors": tracker.ack_errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(outcomes.count("ok") / elapsed, 2),
+        "e2e_p50_ms": rounded(percentile(e2e_ms, 50)),
+        "e2e_p95_ms": rounded(percentile(e2e_ms, 95)),
+        "e2e_p99_ms": rounded(percentile(e2e_ms, 99)),
+        "e2e_max_ms": rounded(max(e2e_ms, default=None)),
+        "ack_p50_ms": rounded(percentile(tracker.ack_ms, 50)),
+        "ack_p95_ms": rounded(percentile(tracker.ack_ms, 95)),
+        "ack_p99_ms": rounded(percentile(tracker.ack_ms, 99)),
+        "zenserp": zenserp_stats,
+        "sheets": sheets_stats,
+        "line": line_stats,
+        "zenserp_calls_per_keyword": round(zenserp_stats["requests"] / processed, 3),
+        "sheets_calls_per_keyword": round(sheets_stats["requests"] / processed, 3),
+        "line_calls_per_keyword": round((line_stats["reply"] + line_stats["push"]) / processed, 3),
+        "results_by_reply": int(REPLY_DELIVERIES.value("reply")),
+        "results_by_push": int(REPLY_DELIVERIES.value("push")),
+        "stages_mean_ms": {
+            labels[0]: round(total / count * 1000, 2)
+            for labels, (count, total) in sorted(STAGE_DURATION.totals().items())
+            if count
+        },
+    }
+
+
+def print_report(config: Dict[str, Any], results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print("=== 負荷試験の結果 ===")
+    print(f"設定: {json.dumps(config, ensure_ascii=False)}")
+    print(
+        f"送信: {results['requests']}件 / 完了: {results['completed']}件 / エラー: {results['errors']}件 / "
+        f"混雑: {results['busy']}件 / タイムアウト: {results['timed_out']}件 / Webhookエラー: {results['webhook_errors']}件"
+    )
+    print(f"所要時間: {results['elapsed_seconds']}秒 / スループット: {results['throughput_per_second']}件/秒")
+    print(
+        f"通知までの時間(ms): p50={results['e2e_p50_ms']} p95={results['e2e_p95_ms']} "
+        f"p99={results['e2e_p99_ms']} max={results['e2e_max_ms']}"
+    )
+    print(f"Webhookの応答時間(ms): p50={results['ack_p50_ms']} p95={results['ack_p95_ms']} p99={results['ack_p99_ms']}")
+    print(f"Zenserp: {results['zenserp']} ({results['zenserp_calls_per_keyword']}回/件)")
+    print(f"Sheets: {results['sheets']} ({results['sheets_calls_per_keyword']}回/件)")
+    print(f"LINE: {results['line']} ({results['line_calls_per_keyword']}回/件)")
+    print(f"結果の送信方法: reply {results['results_by_reply']}件 / プッシュ {results['results_by_push']}件")
+    print("処理段階ごとの平均時間(ms):")
+    for name, mean in results["stages_mean_ms"].items():
+        print(f"  {name}: {mean}")
+
+    if baseline is None:
+        return
+    print("=== 前回の結果との比較 ===")
+    for key, label, lower_is_better in COMPARED_METRICS:
+        before, after = baseline.get(key), results.get(key)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        improved = (change < 0) if lower_is_better else (change > 0)
+        mark = "改善" if improved and abs(change) >= 1 else ("悪化" if abs(change) >= 1 else "変化なし")
+        print(f"  {label}: {before} -> {after} ({change:+.1f}% {mark})")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    zenserp = FakeZenserpServer(
+        latency=args.zenserp_latency,
+        jitter=args.zenserp_jitter,
+        rate_limit_ratio=args.zenserp_429_ratio,
+        retry_after=args.zenserp_retry_after,
+        error_ratio=args.zenserp_error_ratio,
+        slow_ratio=args.zenserp_slow_ratio,
+        slow_latency=args.zenserp_slow_latency,
+        description_length=args.zenserp_description_length,
+        seed=args.seed
+    )
+    line = FakeLineServer(latency=args.line_latency)
+    sheets = FakeSheetsAdapter(latency=args.sheets_latency)
+    zenserp.start()
+    line.start()
+
+    data_dir = tempfile.mkdtemp(prefix="keyword-analyze-bench-")
+    configure_environment(zenserp.url, line.url, data_dir)
+
+    # 設定を差し替えた後にアプリケーションを読み込む
+    import uvicorn
+    install_fake_sheets(sheets)
+    from app.main import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server_thread = threading.Thread(target=server.run, name="benchmark-app", daemon=True)
+    server_thread.start()
+    while not server.started:
+        if not server_thread.is_alive():
+            print("アプリケーションの起動に失敗しました", file=sys.stderr)
+            return 1
+        time.sleep(0.05)
+
+    tracker = RequestTracker()
+    line.listener = tracker.on_line_message
+
+    async def run() -> float:
+        started = await send_webhooks(args, f"http://127.0.0.1:{port}", tracker)
+        await wait_for_completion(tracker, args.timeout)
+        return started
+
+    try:
+        started = asyncio.run(run())
+        results = summarize(args, tracker, started, zenserp, sheets, line)
+    finally:
+        server.should_exit = True
+        server_thread.join(timeout=30)
+        zenserp.stop()
+        line.stop()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    config.update({
+        name: os.environ[name]
+        for name in ("ZENSERP_RATE_PER_SECOND", "ZENSERP_BURST", "SERP_CACHE_ENABLED", "COALESCE_ENABLED",
+                     "JOB_WORKER_CONCURRENCY", "JOB_QUEUE_MAX_SIZE", "SHEETS_WRITE_MODE", "REPLY_DEADLINE_SECONDS")
+        if name in os.environ
+    })
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("results")
+    print_report(config, results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Zenserpのレスポンスの読み込み（JSONの変換）と検索結果の抽出について、
+1,000件あたりのCPU時間と、抽出結果を保持し続けた場合のメモリ使用量を計測する
+
+以前の実装（標準のjsonで変換し、種類ごとに走査して1件ごとに辞書を作る）と、
+現在の実装（orjsonがあれば使い、1回の走査で__slots__のレコードに変換する）を比較する。
+
+使用例:
+    python -m benchmarks.serp_extraction
+    python -m benchmarks.serp_extraction --responses 1000 --num 100 --features
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.serp_records import extract
+from app.utils import json_codec
+from benchmarks.fakes import build_serp
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="検索結果の読み込みと抽出のCPU時間・メモリ使用量を計測する")
+    parser.add_argument("--responses", type=int, default=1000, help="計測に使うレスポンスの数")
+    parser.add_argument("--num", type=int, default=10, help="レスポンス1件あたりの通常検索結果の件数")
+    parser.add_argument("--description-length", type=int, default=160, help="検索結果1件あたりの説明文の文字数")
+    parser.add_argument("--features", action="store_true", help="強調スニペット・ナレッジパネルなどのSERP機能も含める")
+    parser.add_argument("--repeat", type=int, default=5, help="CPU時間の計測回数（最小値を表示する）")
+    return parser.parse_args(argv)
+
+
+def legacy_extract(search_result: Dict[str, Any]) -> Dict[str, Any]:
+    """以前の抽出処理（比較用。種類ごとに走査し、1件ごとに辞書を作り、SERP機能は中身をそのまま残す）"""
+    def safe_get(data: Dict[str, Any], key: str, default: str = "") -> str:
+        try:
+            value = data.get(key, default)
+            return str(value) if value is not None else default
+        except Exception:
+            return default
+
+    extracted = {
+        "organic_results": [], "suggested_searches": [], "related_searches": [], "vertical_searches": [],
+        "related_questions": [], "videos": [], "ads": [], "rich_results": [],
+        "knowledge_panel": None, "local_pack": None, "featured_snippets": []
+    }
+    if "organic" in search_result and isinstance(search_result["organic"], list):
+        for rank, result in enumerate(search_result["organic"], start=1):
+            extracted["organic_results"].append({
+                "title": safe_get(result, "title"),
+                "description": safe_get(result, "description"),
+                "url": safe_get(result, "link"),
+                "position": result.get("position", rank) if isinstance(result, dict) else rank
+            })
+    for source, target, field in (
+        ("suggested_searches", "suggested_searches", "query"),
+        ("related_searches", "related_searches", "query"),
+        ("people_also_ask", "related_questions", "question"),
+    ):
+        if source in search_result and isinstance(search_result[source], list):
+            extracted[target] = [
+                item.get(field, "") if isinstance(item, dict) else str(item)
+                for item in search_result[source]
+            ]
+    for key in ("videos", "ads"):
+        if key in search_result and isinstance(search_result[key], list):
+            for item in search_result[key]:
+                extracted[key].append({
+                    "title": safe_get(item, "title"),
+                    "description": safe_get(item, "description"),
+                    "url": safe_get(item, "link")
+                })
+    for key in ["rich_results", "knowledge_panel", "local_pack", "featured_snippets", "deep_serp"]:
+        if key in search_result:
+            extracted[key] = search_result[key]
+    return extracted
+
+
+def cpu_seconds(payloads: List[bytes], decode: Callable[[bytes], Any], extractor: Callable[[Any], Any], repeat: int) -> Dict[str, float]:
+    """変換と抽出のCPU時間（計測回数のうち最小の値）を求める"""
+    decode_times, extract_times = [], []
+    for _ in range(max(1, repeat)):
+        started = time.process_time()
+        decoded = [decode(payload) for payload in payloads]
+        decode_times.append(time.process_time() - started)
+        started = time.process_time()
+        for data in decoded:
+            extractor(data)
+        extract_times.append(time.process_time() - started)
+        del decoded
+    return {"decode": min(decode_times), "extract": min(extract_times)}
+
+
+def retained_bytes(payloads: List[bytes], decode: Callable[[bytes], Any], extractor: Callable[[Any], Any]) -> Dict[str, int]:
+    """
+    抽出結果だけを保持し続けた場合のメモリ使用量を求める
+    （一括処理・検索履歴の書き込み待ちで結果を溜めた状態を想定し、レスポンスの辞書は手放す）
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        results = [extractor(decode(payload)) for payload in payloads]
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del results
+    return {"retained": current, "peak": peak}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    payloads = [
+        json.dumps(
+            build_serp(f"キーワード{i}", args.num, 0, args.description_length, features=args.features),
+            ensure_ascii=False
+        ).encode("utf-8")
+        for i in range(args.responses)
+    ]
+    scale = 1000 / len(payloads)
+
+    variants = [
+        ("以前の実装（json・辞書）", json.loads, legacy_extract),
+        ("json・レコード", json.loads, extract),
+    ]
+    if json_codec.BACKEND == "orjson":
+        variants.append(("orjson・レコード", json_codec.loads, extract))
+    variants.append((f"{json_codec.BACKEND}・レコード（SERP機能の中身を残す）", json_codec.loads, lambda data: extract(data, keep_sections=True)))
+
+    print(
+        f"=== 検索結果の読み込みと抽出（1,000件あたり、レスポンス {len(payloads)}件・平均 "
+        f"{sum(map(len, payloads)) / len(payloads) / 1024:.1f}KB、通常検索結果 {args.num}件"
+        f"{'、SERP機能あり' if args.features else ''}） ==="
+    )
+    baseline: Optional[Dict[str, float]] = None
+    for label, decode, extractor in variants:
+        cpu = cpu_seconds(payloads, decode, extractor, args.repeat)
+        memory = retained_bytes(payloads, decode, extractor)
+        result = {
+            "decode_ms": cpu["decode"] * scale * 1000,
+            "extract_ms": cpu["extract"] * scale * 1000,
+            "retained_mb": memory["retained"] * scale / 1024 / 1024,
+            "peak_mb": memory["peak"] * scale / 1024 / 1024,
+        }
+        line = (
+            f"{label}: 変換 {result['decode_ms']:.1f}ms / 抽出 {result['extract_ms']:.1f}ms / "
+            f"保持 {result['retained_mb']:.2f}MB / ピーク {result['peak_mb']:.2f}MB"
+        )
+        if baseline is None:
+            baseline = result
+        else:
+            cpu_saved = baseline["decode_ms"] + baseline["extract_ms"] - result["decode_ms"] - result["extract_ms"]
+            line += f"（以前の実装よりCPU {cpu_saved:+.1f}ms削減 / 保持メモリ {baseline['retained_mb'] - result['retained_mb']:+.2f}MB削減）"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
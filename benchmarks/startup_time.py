@@ -0,0 +1,190 @@
+"""
+アプリケーションの読み込み時間の内訳と、起動方式（STARTUP_MODE）ごとのコールドスタートの時間を計測する
+
+1. `python -X importtime` で app.main を読み込み、時間のかかるパッケージ・モジュールを表示する
+2. 起動方式ごとに別プロセスでアプリケーションを起動し、プロセスの起動から
+   ポートが開くまで・最初のWebhookに応答するまで・最初の検索結果を通知するまでの時間を計測する
+
+使用例:
+    python -m benchmarks.startup_time
+    python -m benchmarks.startup_time --modes background --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.fakes import FakeLineServer, FakeSheetsAdapter, FakeZenserpServer, install_fake_sheets
+from benchmarks.load_test import build_webhook, configure_environment, free_port, sign
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="読み込み時間とコールドスタートの時間を計測する")
+    parser.add_argument("--modes", default="eager,background", help="計測する起動方式（カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=1, help="起動方式ごとの計測回数（中央値を表示する）")
+    parser.add_argument("--top", type=int, default=15, help="表示する読み込みの遅いパッケージ・モジュールの数")
+    parser.add_argument("--zenserp-latency", type=float, default=0.3, help="Zenserpの応答までの秒数")
+    parser.add_argument("--sheets-latency", type=float, default=0.15, help="Google Sheets APIの応答までの秒数")
+    parser.add_argument("--timeout", type=float, default=60.0, help="1回の計測で待つ最大秒数")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def serve(port: int, sheets_latency: float) -> None:
+    """代替のSheetsを組み込んでアプリケーションを起動する（計測用の子プロセスで実行する）"""
+    import uvicorn
+    install_fake_sheets(FakeSheetsAdapter(latency=sheets_latency))
+    uvicorn.run("app.main:app", host="127.0.0.1", port=port, log_level="warning")
+
+
+def import_times(env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float]], List[Tuple[str, float]]]:
+    """
+    app.mainの読み込み時間を計測する
+
+    Returns:
+        Tuple: (全体の秒数, パッケージごとの秒数, モジュールごとの累積秒数)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, capture_output=True, text=True, check=True
+    )
+    packages: Dict[str, float] = defaultdict(float)
+    modules: List[Tuple[str, float]] = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        packages[module.split(".")[0]] += int(self_us) / 1e6
+        modules.append((module, int(cumulative_us) / 1e6))
+        if module == "app.main":
+            total = int(cumulative_us) / 1e6
+    return (
+        total,
+        sorted(packages.items(), key=lambda item: item[1], reverse=True),
+        sorted(modules, key=lambda item: item[1], reverse=True)
+    )
+
+
+def cold_start(mode: str, args: argparse.Namespace, line: FakeLineServer, env: Dict[str, str]) -> Dict[str, Any]:
+    """
+    1つの起動方式でアプリケーションを起動し、各段階までの時間を計測する
+
+    Returns:
+        Dict[str, Any]: 段階ごとの秒数と、/healthから取得した起動時間の内訳
+    """
+    import httpx
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    result_received = threading.Event()
+    received: Dict[str, float] = {}
+
+    def on_message(kind: str, target: str, text: str, received_at: float) -> None:
+        if text.startswith(("✅", "❌", "⚠️")):
+            received.setdefault("result", received_at)
+            result_received.set()
+
+    line.listener = on_message
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.startup_time", "--serve", str(port), "--sheets-latency", str(args.sheets_latency)],
+        env=dict(env, STARTUP_MODE=mode, HISTORY_DB_PATH=os.path.join(tempfile.mkdtemp(prefix="keyword-analyze-bench-"), "serp_history.sqlite3"))
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=args.timeout) as client:
+            deadline = started + args.timeout
+            while True:
+                if process.poll() is not None or time.perf_counter() > deadline:
+                    raise RuntimeError(f"Application did not start (mode={mode})")
+                try:
+                    client.get("/")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.01)
+            port_ready = time.perf_counter()
+
+            body = json.dumps(build_webhook(0, "cold", "コールドスタート"), ensure_ascii=False).encode("utf-8")
+            response = client.post("/webhook", content=body, headers={
+                "Content-Type": "application/json",
+                "X-Line-Signature": sign(body)
+            })
+            response.raise_for_status()
+            acked = time.perf_counter()
+
+            result_received.wait(max(0.0, deadline - time.perf_counter()))
+            startup = client.get("/health").json().get("startup", {})
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        line.listener = None
+
+    return {
+        "port_ready_seconds": port_ready - started,
+        "first_webhook_ack_seconds": acked - started,
+        "first_result_seconds": received["result"] - started if "result" in received else None,
+        "startup": startup
+    }
+
+
+def median(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.serve is not None:
+        serve(args.serve, args.sheets_latency)
+        return 0
+
+    zenserp = FakeZenserpServer(latency=args.zenserp_latency, jitter=0.0)
+    line = FakeLineServer()
+    zenserp.start()
+    line.start()
+    configure_environment(zenserp.url, line.url, tempfile.mkdtemp(prefix="keyword-analyze-bench-"))
+    env = dict(os.environ)
+
+    try:
+        total, packages, modules = import_times(env)
+        print("=== app.mainの読み込み時間 ===")
+        print(f"合計: {total:.3f}秒")
+        print("パッケージごと（自身の読み込み時間の合計）:")
+        for name, seconds in packages[:args.top]:
+            print(f"  {name}: {seconds:.3f}秒")
+        print("モジュールごと（依存するモジュールを含む）:")
+        for name, seconds in modules[:args.top]:
+            print(f"  {name}: {seconds:.3f}秒")
+
+        print("=== コールドスタート（プロセスの起動からの秒数の中央値） ===")
+        for mode in [mode.strip() for mode in args.modes.split(",") if mode.strip()]:
+            runs = [cold_start(mode, args, line, env) for _ in range(max(1, args.repeat))]
+            print(
+                f"{mode}: ポート {median([run['port_ready_seconds'] for run in runs])}秒 / "
+                f"最初のWebhookの応答 {median([run['first_webhook_ack_seconds'] for run in runs])}秒 / "
+                f"最初の結果通知 {median([run['first_result_seconds'] for run in runs])}秒"
+            )
+            startup = runs[-1]["startup"]
+            print(
+                f"  内訳: 読み込み {startup.get('import_seconds')}秒 / 起動処理 {startup.get('startup_seconds')}秒 / "
+                f"ウォームアップ {startup.get('warm_up_seconds')}秒"
+            )
+            for name, step in (startup.get("warm_up") or {}).items():
+                status = "OK" if step["error"] is None else f"失敗: {step['error']}"
+                print(f"    {name}: {step['seconds']}秒 ({status})")
+    finally:
+        zenserp.stop()
+        line.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,8 @@
+import os
+
+# app.configの必須の設定（テストでは外部サービスに接続しない）
+os.environ.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "test-token")
+os.environ.setdefault("LINE_CHANNEL_SECRET", "test-secret")
+os.environ.setdefault("ZENSERP_API_KEY", "test-key")
+os.environ.setdefault("GOOGLE_SHEETS_CREDENTIALS_FILE", "credentials.json")
+os.environ.setdefault("GOOGLE_SHEETS_SPREADSHEET_ID", "test-spreadsheet")
@@ -0,0 +1,124 @@
+import pytest
+
+from app.services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+def _breaker(clock, failure_threshold=3, reset_seconds=10.0, slow_call_seconds=0.0):
+    breaker = CircuitBreaker("test", failure_threshold, reset_seconds, slow_call_seconds)
+    breaker._clock = clock
+    return breaker
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record("503", 0.1)
+    assert breaker.state == OPEN
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = _breaker(clock)
+
+    breaker.record("503", 0.1)
+    breaker.record("timeout", 0.1)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+    breaker.record("connection", 0.1)
+    assert breaker.state == OPEN
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = _breaker(clock)
+
+    breaker.record("503", 0.1)
+    breaker.record("503", 0.1)
+    breaker.record(None, 0.1)
+    breaker.record("503", 0.1)
+
+    assert breaker.state == CLOSED
+
+
+def test_client_errors_count_as_success(clock):
+    breaker = _breaker(clock, failure_threshold=1)
+
+    breaker.record("401", 0.1)
+    breaker.record("429", 0.1)
+
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = _breaker(clock, failure_threshold=2, slow_call_seconds=1.0)
+
+    breaker.record(None, 0.5)
+    breaker.record(None, 1.5)
+    assert breaker.state == CLOSED
+    breaker.record(None, 2.0)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["slow_calls"] == 2
+
+
+def test_open_rejects_until_reset(clock):
+    breaker = _breaker(clock)
+    _open(breaker)
+
+    clock.now += 5
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert not breaker.allows_retry()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = _breaker(clock)
+    _open(breaker)
+
+    clock.now += 10
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # 試した呼び出しの結果が記録されないまま期限が過ぎた場合は、次の1件を許可する
+    clock.now += 10
+    breaker.before_call()
+
+
+def test_successful_probe_closes(clock):
+    breaker = _breaker(clock)
+    _open(breaker)
+    clock.now += 10
+    breaker.before_call()
+
+    breaker.record(None, 0.1)
+
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _breaker(clock)
+    _open(breaker)
+    clock.now += 10
+    breaker.before_call()
+
+    breaker.record("502", 0.1)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
@@ -0,0 +1,214 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from app.services.durable_job_queue import (
+    DONE,
+    DUPLICATE,
+    ENQUEUED,
+    FAILED,
+    LEASED,
+    QUEUED,
+    REJECTED,
+    DurableJobDispatcher,
+    DurableJobQueue,
+    _owner_is_alive,
+    _process_token,
+)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    job_queue = DurableJobQueue(str(tmp_path / "jobs.db"), lease_seconds=60, max_attempts=2, retry_base_seconds=0, retry_max_seconds=0)
+    yield job_queue
+    job_queue.close()
+
+
+def _status(queue, job_id):
+    return queue._connect().execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()["status"]
+
+
+def test_claim_returns_jobs_in_order_and_leases_them(queue):
+    assert queue.enqueue("search", {"keyword": "a"}, name="a") == ENQUEUED
+    assert queue.enqueue("search", {"keyword": "b"}, name="b") == ENQUEUED
+
+    first = queue.claim("w1")
+    second = queue.claim("w2")
+
+    assert (first.payload, first.attempts) == ({"keyword": "a"}, 1)
+    assert second.payload == {"keyword": "b"}
+    assert queue.claim("w3") is None
+    assert queue.counts()[LEASED] == 2
+
+
+def test_complete_marks_job_done(queue):
+    queue.enqueue("search", {})
+    job = queue.claim("w1")
+
+    queue.complete("w1", job)
+
+    assert _status(queue, job.id) == DONE
+    assert queue.claim("w1") is None
+
+
+def test_complete_by_other_owner_is_ignored(queue):
+    queue.enqueue("search", {})
+    job = queue.claim("w1")
+
+    queue.complete("w2", job)
+
+    assert _status(queue, job.id) == LEASED
+
+
+def test_fail_retries_until_max_attempts(queue):
+    queue.enqueue("search", {})
+    job = queue.claim("w1")
+
+    assert queue.fail("w1", job, "temporary") is not None
+    assert _status(queue, job.id) == QUEUED
+
+    retried = queue.claim("w1")
+    assert retried.id == job.id and retried.is_final_attempt
+    assert queue.fail("w1", retried, "temporary") is None
+    assert _status(queue, job.id) == FAILED
+
+
+def test_fail_without_retry_fails_immediately(queue):
+    queue.enqueue("search", {})
+    job = queue.claim("w1")
+
+    assert queue.fail("w1", job, "bad request", retry=False) is None
+    assert _status(queue, job.id) == FAILED
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    job_queue = DurableJobQueue(str(tmp_path / "jobs.db"), lease_seconds=0.05, max_attempts=2)
+    job_queue.enqueue("search", {})
+    job = job_queue.claim("w1")
+    assert job_queue.claim("w2") is None
+
+    time.sleep(0.1)
+    reclaimed = job_queue.claim("w2")
+
+    assert reclaimed.id == job.id and reclaimed.attempts == 2
+    # 元の所有者の完了は記録しない
+    job_queue.complete("w1", job)
+    assert _status(job_queue, job.id) == LEASED
+
+
+def test_expired_lease_after_max_attempts_fails(tmp_path):
+    job_queue = DurableJobQueue(str(tmp_path / "jobs.db"), lease_seconds=0.05, max_attempts=1)
+    job_queue.enqueue("search", {})
+    job = job_queue.claim("w1")
+
+    time.sleep(0.1)
+
+    assert job_queue.claim("w2") is None
+    assert _status(job_queue, job.id) == FAILED
+
+
+def test_release_requeues_without_counting_attempt(queue):
+    queue.enqueue("search", {"keyword": "a"})
+    queue.enqueue("search", {"keyword": "b"})
+    first = queue.claim("w1")
+    second = queue.claim("w1")
+
+    assert queue.release("w1", [first.id]) == 1
+    assert queue.release("w2") == 0
+
+    released = queue.claim("w2")
+    assert released.id == first.id and released.attempts == 1
+    assert _status(queue, second.id) == LEASED
+
+
+def test_recover_requeues_jobs_of_dead_owners(queue):
+    queue.enqueue("search", {"keyword": "a"})
+    queue.enqueue("search", {"keyword": "b"})
+    dead = queue.claim("dead")
+    alive = queue.claim("alive")
+
+    assert queue.recover(lambda owner: owner != "dead") == 1
+
+    reclaimed = queue.claim("w1")
+    assert reclaimed.id == dead.id
+    assert queue.claim("w1") is None
+    assert _status(queue, alive.id) == LEASED
+
+
+def test_dedupe_key_rejects_duplicates_until_purged(tmp_path):
+    job_queue = DurableJobQueue(str(tmp_path / "jobs.db"), retention_seconds=0)
+    assert job_queue.enqueue("push", {}, dedupe_key="event-1") == ENQUEUED
+    assert job_queue.enqueue("push", {}, dedupe_key="event-1") == DUPLICATE
+
+    job = job_queue.claim("w1")
+    job_queue.complete("w1", job)
+    # 完了後も保持期間内は重複として扱う
+    assert job_queue.enqueue("push", {}, dedupe_key="event-1") == DUPLICATE
+
+    time.sleep(0.01)
+    assert job_queue.purge() == 1
+    assert job_queue.enqueue("push", {}, dedupe_key="event-1") == ENQUEUED
+
+
+def test_enqueue_rejects_when_queue_is_full(queue):
+    assert queue.enqueue("search", {}, max_queued=1) == ENQUEUED
+    assert queue.enqueue("search", {}, max_queued=1) == REJECTED
+
+
+def test_queue_is_shared_across_instances(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    DurableJobQueue(db_path).enqueue("search", {"keyword": "a"})
+
+    job = DurableJobQueue(db_path).claim("w1")
+
+    assert job.payload == {"keyword": "a"}
+
+
+def test_owner_is_alive_detects_restarted_process():
+    host, pid = socket.gethostname(), os.getpid()
+    token = _process_token(pid)
+    if not token:
+        pytest.skip("/proc is not available")
+
+    assert _owner_is_alive(f"{host}:{pid}:{token}:abcd1234")
+    # 同じホスト名・プロセスIDでも、起動し直したプロセスは停止したとみなす
+    assert not _owner_is_alive(f"{host}:{pid}:00000000-0:abcd1234")
+    # 以前の形式はプロセスIDの存在だけで判定する
+    assert _owner_is_alive(f"{host}:{pid}:abcd1234")
+    # 別のホストは判定できない
+    assert _owner_is_alive(f"other-host:{pid}:00000000-0:abcd1234")
+
+
+def test_shutdown_keeps_lease_of_running_job(tmp_path):
+    job_queue = DurableJobQueue(str(tmp_path / "jobs.db"), lease_seconds=0.3)
+    dispatcher = DurableJobDispatcher(job_queue, max_workers=1, max_queue_size=10, poll_interval_seconds=0.01)
+    started = threading.Event()
+    finish = threading.Event()
+
+    def slow_job(payload, job):
+        started.set()
+        finish.wait(5)
+
+    dispatcher.register("slow", slow_job)
+    dispatcher.start()
+    dispatcher.enqueue("slow", {})
+    assert started.wait(5)
+
+    began = time.monotonic()
+    dispatcher.shutdown(0.1)
+    assert time.monotonic() - began < 1
+
+    # 実行中のジョブのリースは解放せず、延長し続ける
+    other = DurableJobQueue(job_queue.db_path, lease_seconds=0.3)
+    time.sleep(0.5)
+    assert other.claim("other") is None
+
+    finish.set()
+    for _ in range(100):
+        if other.counts()[DONE] == 1:
+            break
+        time.sleep(0.05)
+    assert other.counts()[DONE] == 1